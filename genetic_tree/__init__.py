@@ -5,3 +5,7 @@ from .genetic.crosser import Crosser
 from .genetic.evaluator import Evaluator, Metric
 from .genetic.selector import Selection, Selector
 from .genetic.stopper import Stopper
+from .genetic.migrator import Migrator
+from .genetic.checkpointer import Checkpointer
+from .genetic.subsampler import Subsampler
+from .genetic.streamer import Streamer
@@ -0,0 +1,192 @@
+from threading import Thread
+import os
+import pickle
+
+import numpy as np
+
+from ..tree.tree import Tree, get_y_class_ids
+from ..tree.thresholds import get_fingerprint
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpointer:
+    """
+    Checkpointer saves the state of training every checkpoint_interval
+    generations, so the training can be resumed after it was interrupted.
+    Checkpoint contains whole population (nodes, observations assigned to
+    leaves and random states of trees), thresholds, state of Stopper, history
+    of metrics, indices of subsample and state of numpy random generator. The state is taken in the
+    main thread and it is written to file by background thread, so genetic
+    algorithm does not wait for disk. File is replaced atomically, so it
+    always contains the last complete checkpoint.
+
+    Args:
+        checkpoint_path: path of checkpoint file or None (no checkpoints)
+        checkpoint_interval: number of generations between checkpoints
+    """
+
+    def __init__(self,
+                 checkpoint_path: str = None,
+                 checkpoint_interval: int = 10,
+                 **kwargs):
+        self.checkpoint_path: str = self._check_checkpoint_path(checkpoint_path)
+        self.checkpoint_interval: int = self._check_checkpoint_interval(checkpoint_interval)
+        self._fingerprint: tuple = None
+        self._thresholds: np.ndarray = None
+        self._writer: Thread = None
+        self._writer_error: BaseException = None
+
+    def set_params(self,
+                   checkpoint_path: str = None,
+                   checkpoint_interval: int = None,
+                   **kwargs):
+        """
+        Function to set new parameters for Checkpointer
+
+        Arguments are the same as in __init__
+        """
+        if checkpoint_path is not None:
+            self.checkpoint_path = self._check_checkpoint_path(checkpoint_path)
+        if checkpoint_interval is not None:
+            self.checkpoint_interval = self._check_checkpoint_interval(checkpoint_interval)
+
+    @staticmethod
+    def _check_checkpoint_path(checkpoint_path):
+        if checkpoint_path is not None and not isinstance(checkpoint_path, (str, os.PathLike)):
+            raise TypeError(f"checkpoint_path: {checkpoint_path} should be str "
+                            f"or path. Instead it is {type(checkpoint_path)}")
+        return checkpoint_path
+
+    @staticmethod
+    def _check_checkpoint_interval(checkpoint_interval):
+        if type(checkpoint_interval) is not int:
+            raise TypeError(f"checkpoint_interval: {checkpoint_interval} should "
+                            f"be int. Instead it is {type(checkpoint_interval)}")
+        if checkpoint_interval <= 0:
+            raise ValueError(f"checkpoint_interval: {checkpoint_interval} should "
+                             f"be positive")
+        return checkpoint_interval
+
+    def start(self, X, y, sample_weight, thresholds):
+        """
+        Function called before training, it keeps data needed to make
+        checkpoints
+
+        Args:
+            X: dataset the model is trained on
+            y: proper classes of observations
+            sample_weight: weights of observations
+            thresholds: array of thresholds for the dataset
+        """
+        if self.checkpoint_path is None:
+            return
+        self._fingerprint = self._get_data_fingerprint(X, y, sample_weight)
+        self._thresholds = np.array(thresholds)
+
+    def checkpoint(self, genetic_tree, force: bool = False):
+        """
+        Saves checkpoint in background thread if checkpoint_interval
+        generations passed from the start of training
+
+        Args:
+            genetic_tree: trained GeneticTree
+            force: if save checkpoint regardless of the generation number
+        """
+        if self.checkpoint_path is None or self._fingerprint is None:
+            return
+        iteration = genetic_tree.stopper.current_iteration - 1
+        if not force and iteration % self.checkpoint_interval != 0:
+            return
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "fingerprint": self._fingerprint,
+            "trees": [tree.get_training_state() for tree in genetic_tree._trees],
+            "flat_observations": genetic_tree.initializer.flat_observations,
+            "thresholds": self._thresholds,
+            "stopper": genetic_tree.stopper.get_state(),
+            "metrics": genetic_tree._get_metrics_history(),
+            "subsample_indices": genetic_tree.subsampler.subsample_indices,
+            "random_state": np.random.get_state(),
+        }
+        self.wait()
+        self._writer = Thread(target=self._write, args=(state, self.checkpoint_path))
+        self._writer.start()
+
+    def finish(self):
+        """
+        Function called after training, it waits for the last checkpoint
+        """
+        self._fingerprint = None
+        self._thresholds = None
+        self.wait()
+
+    def _write(self, state: dict, path):
+        try:
+            temporary_path = f"{os.fspath(path)}.tmp"
+            with open(temporary_path, "wb") as file:
+                pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, path)
+        except BaseException as error:
+            self._writer_error = error
+
+    def wait(self):
+        """
+        Waits until the last checkpoint is written (and raises its error)
+        """
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._writer_error is not None:
+            error, self._writer_error = self._writer_error, None
+            raise RuntimeError("Checkpoint could not be written") from error
+
+    def restore(self, genetic_tree, X, y, sample_weight, path=None):
+        """
+        Restores state of training from checkpoint
+
+        Args:
+            genetic_tree: GeneticTree to restore
+            X: dataset the model was trained on
+            y: proper classes of observations
+            sample_weight: weights of observations
+            path: path of checkpoint (None means checkpoint_path)
+
+        Returns:
+            thresholds saved in checkpoint
+        """
+        path = self.checkpoint_path if path is None else path
+        if path is None:
+            raise ValueError("There is no checkpoint_path to resume from")
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {state.get('version')}")
+        if state["fingerprint"] != self._get_data_fingerprint(X, y, sample_weight):
+            raise ValueError("Checkpoint was made for different X, y or sample_weight")
+
+        thresholds = state["thresholds"]
+        # trees are trained on the subsample from checkpoint
+        X, y, sample_weight = genetic_tree.subsampler.start(X, y, sample_weight, thresholds,
+                                                            state.get("subsample_indices"))
+        classes = np.unique(y)
+        y_class_ids = get_y_class_ids(classes, y)
+        trees = []
+        for tree_state in state["trees"]:
+            tree: Tree = Tree(classes, X, y, sample_weight, thresholds, 0, state["flat_observations"], y_class_ids)
+            tree.set_training_state(tree_state)
+            trees.append(tree)
+        genetic_tree._trees = trees
+        genetic_tree.stopper.set_state(state["stopper"])
+        genetic_tree._set_metrics_history(state["metrics"])
+        np.random.set_state(state["random_state"])
+        return thresholds
+
+    @staticmethod
+    def _get_data_fingerprint(X, y, sample_weight) -> tuple:
+        # training state (leaves of trees) is valid only for the same data, so
+        # all values are hashed (not a sample as for the thresholds cache)
+        return (get_fingerprint(X, sample=False), get_fingerprint(np.asarray(y), sample=False),
+                get_fingerprint(np.asarray(sample_weight), sample=False))
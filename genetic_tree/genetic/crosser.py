@@ -2,7 +2,9 @@
 # from tree.crosser import cross_trees
 
 from ..tree.tree import Tree
-from ..tree.crosser import cross_trees
+from ..tree.crosser import cross_trees, draw_child_seed
+from ..tree.forest import Forest
+from .parallel import check_n_jobs, map_in_threads
 import numpy as np
 
 
@@ -14,6 +16,7 @@ class Crosser:
         cross_prob: The chance that each tree will be selected as first parent.
         cross_both: If cross first parent with second and second with first \
                        or only first with second
+        n_jobs: number of threads used to cross trees
 
     For each tree selected with cross_prob chance there will be found second
     random parent.
@@ -22,13 +25,16 @@ class Crosser:
     def __init__(self,
                  cross_prob: float = 0.6,
                  cross_both: bool = True,
+                 n_jobs: int = -1,
                  **kwargs):
         self.cross_prob: float = self._check_cross_prob(cross_prob)
         self.cross_both: bool = self._check_cross_both(cross_both)
+        self.n_jobs: int = check_n_jobs(n_jobs)
 
     def set_params(self,
                    cross_prob: float = None,
                    cross_both: bool = None,
+                   n_jobs: int = None,
                    **kwargs):
         """
         Function to set new parameters for Crosser
@@ -39,6 +45,8 @@ class Crosser:
             self.cross_prob = self._check_cross_prob(cross_prob)
         if cross_both is not None:
             self.cross_both = self._check_cross_both(cross_both)
+        if n_jobs is not None:
+            self.n_jobs = check_n_jobs(n_jobs)
 
     @staticmethod
     def _check_cross_prob(cross_prob):
@@ -66,13 +74,15 @@ class Crosser:
         Args:
             trees: List with all trees to apply crossing
         """
-        new_created_trees = []
+        crossings = []
 
         trees_number: int = len(trees)
 
         first_parents_indices: np.array = self._get_random_trees(trees_number, self.cross_prob)
         second_parents_indices: np.array = self._get_second_parents(trees_number, first_parents_indices)
 
+        # one tree can be a parent in many crossings, so all random values
+        # are drawn here and only children are created in many threads
         for i in range(first_parents_indices.shape[0]):
             first_parent: Tree = trees[first_parents_indices[i]]
             second_parent: Tree = trees[second_parents_indices[i]]
@@ -80,12 +90,33 @@ class Crosser:
             first_node_id: int = first_parent.get_random_node()
             second_node_id: int = second_parent.get_random_node()
 
-            # create children and append them to list
-            new_created_trees.append(cross_trees(first_parent, second_parent, first_node_id, second_node_id))
+            crossings.append((first_parent, second_parent, first_node_id, second_node_id,
+                              draw_child_seed(first_parent, first_node_id)))
             if self.cross_both:
-                new_created_trees.append(cross_trees(second_parent, first_parent, second_node_id, first_node_id))
+                crossings.append((second_parent, first_parent, second_node_id, first_node_id,
+                                  draw_child_seed(second_parent, second_node_id)))
 
-        return new_created_trees
+        # create children and return them as list
+        return map_in_threads(lambda crossing: cross_trees(*crossing), crossings, self.n_jobs)
+
+    def cross_forest(self, forest: Forest, racing_cut: float = 0.0) -> Forest:
+        """
+        It crosses trees of Forest in the same way as cross_population, but
+        by batch kernel of Forest (without Tree objects)
+
+        Args:
+            forest: Forest with assigned observations
+            racing_cut: child is rejected if it cannot reach this number of \
+            proper classified observations (0 means no racing)
+
+        Returns:
+            Forest with children
+        """
+        trees_number: int = len(forest)
+        first_parents_indices: np.array = self._get_random_trees(trees_number, self.cross_prob)
+        second_parents_indices: np.array = self._get_second_parents(trees_number, first_parents_indices)
+        return forest.cross(first_parents_indices, second_parents_indices, self.cross_both,
+                            racing_cut, self.n_jobs)
 
     @staticmethod
     def _get_random_trees(n_trees: int, probability: float) -> np.array:
@@ -1,23 +1,65 @@
 from ..tree.evaluation import get_accuracies, get_trees_depths, get_trees_n_leaves
+from ..tree.evaluation import get_trees_stats
+from ..tree.forest import Forest
+from collections import OrderedDict
+from threading import Lock
 import numpy as np
 
 from aenum import Enum, extend_enum
 
 
-def get_accuracy(trees: list, **kwargs) -> np.array:
-    return np.array(get_accuracies(trees))
+class PopulationStats:
+    """
+    PopulationStats keeps statistics of each tree in population as columns
+    (numpy arrays). Columns are computed in one pass over trees, so they
+    should be used instead of computing the same values many times in each
+    generation.
+
+    Args:
+        trees: List with all trees or Forest (with assigned observations)
+
+    Attributes:
+        accuracy: accuracy of each tree
+        depth: depth of each tree
+        n_leaves: number of leaves of each tree
+        node_count: number of nodes of each tree
+        metric: value of metric of each tree (set by Evaluator)
+        best_index: index of tree with the highest metric (set by Evaluator)
+    """
+
+    def __init__(self, trees: list):
+        if isinstance(trees, Forest):
+            self.accuracy, self.depth, self.node_count = trees.accuracies, trees.depths, trees.node_counts
+        else:
+            self.accuracy, self.depth, self.node_count = get_trees_stats(trees)
+        self.n_leaves: np.ndarray = (self.node_count + 1) // 2
+        self.metric: np.ndarray = None
+        self.best_index: int = None
+
+    def __len__(self):
+        return self.accuracy.shape[0]
 
 
-def get_accuracy_and_n_leaves(trees: list, n_leaves_factor: float = 0.0001, **kwargs) -> np.array:
-    accuracy = np.array(get_accuracies(trees))
-    n_leaves = np.array(get_trees_n_leaves(trees))
-    return accuracy - n_leaves_factor * n_leaves
+def _get_population_stats(trees: list, population_stats: PopulationStats) -> PopulationStats:
+    if population_stats is None:
+        return PopulationStats(trees)
+    return population_stats
 
 
-def get_accuracy_and_depth(trees: list, depth_factor: float = 0.01, **kwargs) -> np.array:
-    accuracy = np.array(get_accuracies(trees))
-    depth = np.array(get_trees_depths(trees))
-    return accuracy - depth_factor * depth
+def get_accuracy(trees: list, population_stats: PopulationStats = None, **kwargs) -> np.array:
+    return _get_population_stats(trees, population_stats).accuracy
+
+
+def get_accuracy_and_n_leaves(trees: list, n_leaves_factor: float = 0.0001,
+                              population_stats: PopulationStats = None, **kwargs) -> np.array:
+    population_stats = _get_population_stats(trees, population_stats)
+    return population_stats.accuracy - n_leaves_factor * population_stats.n_leaves
+
+
+def get_accuracy_and_depth(trees: list, depth_factor: float = 0.01,
+                           population_stats: PopulationStats = None, **kwargs) -> np.array:
+    population_stats = _get_population_stats(trees, population_stats)
+    return population_stats.accuracy - depth_factor * population_stats.depth
 
 
 class Metric(Enum):
@@ -28,6 +70,11 @@ class Metric(Enum):
         AccuracyMinusLeavesNumber -- accuracy + constant times number of nodes of tree
         AccuracyMinusDepth -- accuracy + constant times maximal depth of tree
 
+    Metric function gets list of trees and keyword arguments, one of them is
+    population_stats (PopulationStats of the trees), so function can use
+    already computed columns instead of iterating over trees. With
+    forest_population trees are passed as Forest.
+
     To add new Metric see genetic.selector.Selection
     """
     def __new__(cls, function, *args):
@@ -48,6 +95,65 @@ class Metric(Enum):
     AccuracyMinusDepth = get_accuracy_and_depth,
 
 
+class FitnessCache:
+    """
+    FitnessCache keeps number of proper classified observations of recently
+    created tree structures (identified by Tree.structure_hash). When a new
+    tree has the same structure as a tree in the cache, observations are not
+    assigned to it until they are needed (see Tree.update_fitness).
+    Depth and number of leaves are not cached, because they are computed
+    from nodes directly.
+
+    Args:
+        max_size: maximal number of structures in cache (the least recently \
+        used are removed)
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock: Lock = Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: int):
+        """
+        Returns:
+            proper_classified of tree with structure hash key or None
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: int, proper_classified: float):
+        with self._lock:
+            self._entries[key] = proper_classified
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # cache is valid only for one dataset, so it is not pickled
+        return {"max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_size"])
+
+
 class Evaluator:
     """
     Evaluator is responsible for evaluating each individuals' score
@@ -60,16 +166,28 @@ class Evaluator:
 
     Args:
         metric: a metric used to evaluate single tree
+        fitness_cache_size: maximal number of tree structures whose fitness \
+        is cached (0 means no cache)
+        racing_quantile: offspring whose accuracy cannot reach this quantile \
+        of metric of previous population are rejected before all \
+        observations are assigned to them (0 means no racing); it assumes \
+        that metric is not greater than accuracy (true for built-in metrics)
     """
 
     def __init__(self,
                  metric: Metric = Metric.AccuracyMinusDepth,
+                 fitness_cache_size: int = 0,
+                 racing_quantile: float = 0.0,
                  **kwargs):
         self.metric: Metric = self._check_metric(metric)
+        self.fitness_cache: FitnessCache = self._create_fitness_cache(fitness_cache_size)
+        self.racing_quantile: float = self._check_racing_quantile(racing_quantile)
         self._kwargs = kwargs
 
     def set_params(self,
                    metric: Metric = None,
+                   fitness_cache_size: int = None,
+                   racing_quantile: float = None,
                    **kwargs):
         """
         Function to set new parameters for Selector
@@ -78,6 +196,10 @@ class Evaluator:
         """
         if metric is not None:
             self.metric = self._check_metric(metric)
+        if fitness_cache_size is not None:
+            self.fitness_cache = self._create_fitness_cache(fitness_cache_size)
+        if racing_quantile is not None:
+            self.racing_quantile = self._check_racing_quantile(racing_quantile)
         self._kwargs = dict(self._kwargs, **kwargs)
 
     @staticmethod
@@ -89,6 +211,102 @@ class Evaluator:
             raise TypeError(f"Passed metric={metric} with type {type(metric)}, "
                             f"Needed argument with type Metric")
 
+    @staticmethod
+    def _create_fitness_cache(fitness_cache_size):
+        if type(fitness_cache_size) is not int:
+            raise TypeError(f"fitness_cache_size: {fitness_cache_size} should be "
+                            f"int. Instead it is {type(fitness_cache_size)}")
+        if fitness_cache_size < 0:
+            raise ValueError(f"fitness_cache_size: {fitness_cache_size} should be "
+                             f"non-negative")
+        if fitness_cache_size == 0:
+            return None
+        return FitnessCache(fitness_cache_size)
+
+    @staticmethod
+    def _check_racing_quantile(racing_quantile):
+        if type(racing_quantile) is not float and type(racing_quantile) is not int:
+            raise TypeError(f"racing_quantile: {racing_quantile} should be "
+                            f"float. Instead it is {type(racing_quantile)}")
+        if racing_quantile < 0 or racing_quantile >= 1:
+            raise ValueError(f"racing_quantile: {racing_quantile} should be "
+                             f"in [0, 1)")
+        return racing_quantile
+
+    def set_fitness_cache(self, trees):
+        """
+        Sets fitness cache in trees (trees created from them use the same cache)
+
+        Args:
+            trees: List with trees
+        """
+        for tree in trees:
+            tree.fitness_cache = self.fitness_cache
+
+    def clear_fitness_cache(self):
+        """
+        Clears fitness cache (it should be called when dataset is changed)
+        """
+        if self.fitness_cache is not None:
+            self.fitness_cache.clear()
+
+    def set_racing_cut(self, trees, population_stats: PopulationStats = None):
+        """
+        Sets in trees number of proper classified observations offspring of
+        the trees has to be able to reach (see get_racing_cut). Assigning observations to offspring is stopped as soon as
+        it cannot reach the cut and such offspring is marked as rejected.
+        Without racing or population_stats the cut is removed.
+
+        Args:
+            trees: List with parents of offspring
+            population_stats: PopulationStats of the trees
+        """
+        racing_cut = 0.0
+        if len(trees) > 0:
+            racing_cut = self.get_racing_cut(population_stats, trees[0].sample_weight)
+        for tree in trees:
+            tree.racing_cut = racing_cut
+
+    def get_racing_cut(self, population_stats: PopulationStats, sample_weight) -> float:
+        """
+        The cut is racing_quantile of metric of parents. Metric of offspring
+        is not greater than its accuracy (built-in metrics subtract
+        non-negative penalty of depth or leaves from accuracy), so offspring
+        whose accuracy cannot reach the cut cannot reach it with metric too.
+        For custom metric greater than accuracy racing can reject offspring
+        that would survive.
+
+        Args:
+            population_stats: PopulationStats of parents of offspring
+            sample_weight: a weight of each observation
+
+        Returns:
+            number of proper classified observations offspring has to be \
+            able to reach (0 means no racing)
+        """
+        if self.racing_quantile == 0 or population_stats is None:
+            return 0.0
+        metric = population_stats.metric
+        if metric is None:
+            metric = population_stats.accuracy
+        return max(np.quantile(metric, self.racing_quantile), 0.0) * np.sum(sample_weight)
+
+    def get_population_stats(self, trees) -> PopulationStats:
+        """
+        Function computes statistics and metric of all trees in one pass
+
+        Args:
+            trees: List with all trees to evaluate
+
+        Returns:
+            PopulationStats with metric and index of the best tree
+        """
+        population_stats = PopulationStats(trees)
+        population_stats.metric = np.asarray(self.metric.evaluate(trees, population_stats=population_stats,
+                                                                  **self._kwargs))
+        population_stats.best_index = int(np.argmax(population_stats.metric))
+        return population_stats
+
     def get_best_tree_index(self, trees) -> int:
         """
         Args:
@@ -108,7 +326,7 @@ class Evaluator:
         Args:
             trees: List with all trees to evaluate
         """
-        return self.metric.evaluate(trees, **self._kwargs)
+        return self.get_population_stats(trees).metric
 
     @staticmethod
     def get_accuracies(trees) -> np.array:
@@ -1,6 +1,7 @@
 from aenum import Enum, extend_enum
 from ..tree.builder import full_tree_builder, split_tree_builder
-from ..tree.tree import Tree
+from ..tree.tree import Tree, get_y_class_ids, initialize_observations_of_trees
+from .parallel import check_n_jobs
 import numpy as np
 import warnings
 
@@ -26,27 +27,33 @@ def _initialize(X, y, sample_weight, thresholds, initializer, tree_builder, half
     trees = []
     tree: Tree
     classes: np.ndarray = np.unique(y)
+    y_class_ids: np.ndarray = get_y_class_ids(classes, y)
     kwargs = {}
     if tree_builder == split_tree_builder:
         kwargs = {"split_prob": initializer.split_prob}
 
     for tree_index in range(initializer.n_trees):
         if tree_index % 2 == 0 or not half:
-            tree: Tree = Tree(classes, X, y, sample_weight, thresholds, np.random.randint(10 ** 8))
+            tree: Tree = Tree(classes, X, y, sample_weight, thresholds, np.random.randint(10 ** 8),
+                              initializer.flat_observations, y_class_ids)
             tree.resize_by_initial_depth(initializer.initial_depth)
             tree_builder(tree, initializer.initial_depth, **kwargs)
-            tree.initialize_observations()
             trees.append(tree)
         else:
             if initializer.initial_depth > 1:
                 depth = np.random.randint(low=1, high=initializer.initial_depth)
             else:
                 depth = initializer.initial_depth
-            tree: Tree = Tree(classes, X, y, sample_weight, thresholds, np.random.randint(10 ** 8))
+            tree: Tree = Tree(classes, X, y, sample_weight, thresholds, np.random.randint(10 ** 8),
+                              initializer.flat_observations, y_class_ids)
             tree.resize_by_initial_depth(depth)
             tree_builder(tree, depth, **kwargs)
-            tree.initialize_observations()
             trees.append(tree)
+
+    # observations are assigned after building all trees to not change the
+    # order of drawing random numbers
+    if initializer.assign_observations:
+        initialize_observations_of_trees(trees, initializer.n_jobs)
     return trees
 
 
@@ -145,17 +152,32 @@ class Initializer:
         initialization: how to initialize trees
         split_prob: probability of creating a decision node during initialization (only viable for the split
         initialization method)
+        n_jobs: number of threads used to assign observations to created trees
+        flat_observations: if observations of all leaves of tree should be kept \
+        in one buffer (FlatObservations) instead of separate array for each leaf
     """
 
     def __init__(self,
                  n_trees: int = 400, initial_depth: int = 1,
                  initialization: Initialization = Initialization.Split,
                  split_prob: float = 0.7,
+                 n_jobs: int = -1,
+                 flat_observations: bool = False,
                  **kwargs):
         self.n_trees: int = self._check_n_trees(n_trees)
         self.initial_depth: int = self._check_initial_depth(initial_depth)
         self.initialization: Initialization = self._check_initialization(initialization)
         self.split_prob: float = self._check_split_prob(split_prob)
+        self.n_jobs: int = check_n_jobs(n_jobs)
+        self.flat_observations: bool = self._check_flat_observations(flat_observations)
+        self.assign_observations: bool = True
+
+    @staticmethod
+    def _check_flat_observations(flat_observations):
+        if type(flat_observations) is not bool:
+            raise TypeError(f"flat_observations: {flat_observations} should be "
+                            f"bool. Instead it is {type(flat_observations)}")
+        return flat_observations
 
     @staticmethod
     def _check_initialization(initialization):
@@ -191,6 +213,8 @@ class Initializer:
 
     def set_params(self, initial_depth: int = None,
                    initialization: Initialization = None,
+                   n_jobs: int = None,
+                   flat_observations: bool = None,
                    **kwargs):
         """
         Function to set new parameters for Initializer
@@ -201,8 +225,12 @@ class Initializer:
             self.initial_depth = initial_depth
         if initialization is not None:
             self.initialization = initialization
+        if n_jobs is not None:
+            self.n_jobs = check_n_jobs(n_jobs)
+        if flat_observations is not None:
+            self.flat_observations = self._check_flat_observations(flat_observations)
 
-    def initialize(self, X, y, sample_weight, threshold):
+    def initialize(self, X, y, sample_weight, threshold, assign_observations: bool = True):
         """
         Function to initialize forest
 
@@ -211,9 +239,12 @@ class Initializer:
             y: proper class of each observation as vector of shape [n_observations]
             sample_weight: a weight of each observation or None (meaning each observation have the same weight)
             thresholds: array of thresholds for particular dataset
+            assign_observations: if observations should be assigned to trees \
+            (not needed when trees are only copied to Forest)
 
         Returns:
             An array of an initial population of trees
         """
+        self.assign_observations = assign_observations
         return self.initialization.initialize(X, y, sample_weight, threshold, self)
 
@@ -0,0 +1,346 @@
+from multiprocessing import Pipe, Process, shared_memory
+import copy
+import traceback
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+from ..tree.forest import Forest
+from ..tree._utils import set_buffer_pool_size
+from .parallel import get_n_threads, map_in_threads
+
+
+def _share_array(array, shared_memories: list) -> tuple:
+    """
+    Copies array to new block of shared memory
+
+    Args:
+        array: numpy array to share between processes
+        shared_memories: list to which created SharedMemory is appended
+
+    Returns:
+        descriptor of array that allows to attach it in other process
+    """
+    array = np.ascontiguousarray(array)
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared_memories.append(memory)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+    return memory.name, array.shape, array.dtype.str
+
+
+def _attach_array(descriptor: tuple, shared_memories: list) -> np.ndarray:
+    """
+    Maps array shared by other process (without copying it)
+
+    Args:
+        descriptor: descriptor returned by _share_array
+        shared_memories: list to which attached SharedMemory is appended
+
+    Returns:
+        numpy array with buffer in shared memory
+    """
+    name, shape, dtype = descriptor
+    memory = shared_memory.SharedMemory(name=name)
+    shared_memories.append(memory)
+    return np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def share_data(X, y, sample_weight, thresholds, shared_memories: list) -> dict:
+    """
+    Copies training data to shared memory. Dense X is shared as one block,
+    sparse X as three blocks (data, indices and indptr of csr matrix).
+
+    Args:
+        X: dataset to train model on as matrix of shape [n_observations x n_features]
+        y: proper class of each observation as vector of shape [n_observations]
+        sample_weight: a weight of each observation
+        thresholds: array of thresholds for particular dataset
+        shared_memories: list to which created SharedMemory objects are appended
+
+    Returns:
+        dict with descriptors of arrays to pass to attach_data
+    """
+    descriptors = {
+        "y": _share_array(y, shared_memories),
+        "sample_weight": _share_array(sample_weight, shared_memories),
+        "thresholds": _share_array(thresholds, shared_memories),
+    }
+    if issparse(X):
+        descriptors["X"] = ("csr", X.shape,
+                            _share_array(X.data, shared_memories),
+                            _share_array(X.indices, shared_memories),
+                            _share_array(X.indptr, shared_memories))
+    else:
+        descriptors["X"] = ("dense", X.shape,
+                            _share_array(X, shared_memories))
+    return descriptors
+
+
+def attach_data(descriptors: dict, shared_memories: list) -> tuple:
+    """
+    Maps training data shared by share_data
+
+    Args:
+        descriptors: dict returned by share_data
+        shared_memories: list to which attached SharedMemory objects are appended
+
+    Returns:
+        tuple (X, y, sample_weight, thresholds)
+    """
+    y = _attach_array(descriptors["y"], shared_memories)
+    sample_weight = _attach_array(descriptors["sample_weight"], shared_memories)
+    thresholds = _attach_array(descriptors["thresholds"], shared_memories)
+    X_descriptor = descriptors["X"]
+    if X_descriptor[0] == "csr":
+        X = csr_matrix((_attach_array(X_descriptor[2], shared_memories),
+                        _attach_array(X_descriptor[3], shared_memories),
+                        _attach_array(X_descriptor[4], shared_memories)),
+                       shape=X_descriptor[1], copy=False)
+    else:
+        X = _attach_array(X_descriptor[2], shared_memories)
+    return X, y, sample_weight, thresholds
+
+
+def _run_island(connection, genetic_tree, descriptors: dict, seed: int,
+                n_jobs: int, nodes: Forest, is_population: bool):
+    """
+    Main function of island process. It creates population and then it executes
+    commands sent by Migrator:
+    -- ("run", n_iter) - run n_iter generations and send back migrants
+    -- ("migrate", forest) - replace the worst trees by migrants
+    -- ("finish", None) - send back population and metrics history
+    """
+    shared_memories = []
+    try:
+        np.random.seed(seed)
+        genetic_tree.set_params(n_jobs=n_jobs)
+        set_buffer_pool_size(genetic_tree._buffer_pool_size * 2**20)
+        X, y, sample_weight, thresholds = attach_data(descriptors, shared_memories)
+        X, y, sample_weight = genetic_tree.subsampler.start(X, y, sample_weight, thresholds)
+
+        flat_observations = genetic_tree.initializer.flat_observations
+        trees = nodes.to_trees(X, y, sample_weight, thresholds, n_jobs, flat_observations)
+        if not is_population:
+            trees = genetic_tree.initializer.initialize(X, y, sample_weight, thresholds) + trees
+        genetic_tree._trees = trees
+        genetic_tree._append_metrics(genetic_tree.evaluator.get_population_stats(trees))
+
+        while True:
+            command, argument = connection.recv()
+            if command == "run":
+                stopped = genetic_tree._growth_trees(argument)
+                migrants = genetic_tree.migrator.get_migrants(genetic_tree)
+                connection.send(("ok", (stopped, migrants)))
+            elif command == "migrate":
+                migrants = argument.to_trees(X, y, sample_weight, thresholds, n_jobs,
+                                             flat_observations)
+                genetic_tree.migrator.replace_worst(genetic_tree, migrants)
+                connection.send(("ok", None))
+            else:
+                if genetic_tree._keep_last_population:
+                    trees = genetic_tree._trees
+                else:
+                    best_tree_index = genetic_tree.evaluator.get_best_tree_index(genetic_tree._trees)
+                    trees = [genetic_tree._trees[best_tree_index]]
+                connection.send(("ok", (Forest.from_trees(trees),
+                                        genetic_tree._get_metrics_history())))
+                break
+    except BaseException:
+        try:
+            connection.send(("error", traceback.format_exc()))
+        except OSError:  # Migrator has already closed connection
+            pass
+    finally:
+        # trees keep views of shared memory, so they have to be removed first
+        genetic_tree._trees = None
+        genetic_tree.subsampler.finish()
+        trees = migrants = X = y = sample_weight = thresholds = None
+        for memory in shared_memories:
+            try:
+                memory.close()
+            except BufferError:
+                pass
+        connection.close()
+
+
+def _receive(connection):
+    status, result = connection.recv()
+    if status == "error":
+        raise RuntimeError(f"Island process failed with error:\n{result}")
+    return result
+
+
+class Migrator:
+    """
+    Migrator is responsible for the island model of genetic algorithm. Each
+    island is a separate process with its own population. Every
+    migration_interval generations n_migrants the best trees of each island
+    migrate to the next island (in a ring) and replace its worst trees.
+
+    Training data is copied once to shared memory and all islands map it
+    from there. Trees are sent between processes as Forest (nodes of all trees
+    in one array) and observations are assigned again in island they arrive to.
+
+    Args:
+        n_islands: number of islands (processes), 1 means no island model
+        migration_interval: number of generations between migrations
+        n_migrants: number of trees sent by each island during migration
+    """
+
+    def __init__(self,
+                 n_islands: int = 1,
+                 migration_interval: int = 10,
+                 n_migrants: int = 2,
+                 **kwargs):
+        self.n_islands: int = self._check_positive_int("n_islands", n_islands)
+        self.migration_interval: int = self._check_positive_int("migration_interval", migration_interval)
+        self.n_migrants: int = self._check_n_migrants(n_migrants)
+
+    def set_params(self,
+                   n_islands: int = None,
+                   migration_interval: int = None,
+                   n_migrants: int = None,
+                   **kwargs):
+        """
+        Function to set new parameters for Migrator
+
+        Arguments are the same as in __init__
+        """
+        if n_islands is not None:
+            self.n_islands = self._check_positive_int("n_islands", n_islands)
+        if migration_interval is not None:
+            self.migration_interval = self._check_positive_int("migration_interval", migration_interval)
+        if n_migrants is not None:
+            self.n_migrants = self._check_n_migrants(n_migrants)
+
+    @staticmethod
+    def _check_positive_int(name, value):
+        if type(value) is not int:
+            raise TypeError(f"{name}: {value} should be int. "
+                            f"Instead it is {type(value)}")
+        if value <= 0:
+            raise ValueError(f"{name}: {value} should be positive")
+        return value
+
+    @staticmethod
+    def _check_n_migrants(n_migrants):
+        if type(n_migrants) is not int:
+            raise TypeError(f"n_migrants: {n_migrants} should be int. "
+                            f"Instead it is {type(n_migrants)}")
+        if n_migrants < 0:
+            n_migrants = 0
+        return n_migrants
+
+    def get_migrants(self, genetic_tree) -> Forest:
+        """
+        Args:
+            genetic_tree: GeneticTree running on island
+
+        Returns:
+            Forest with n_migrants the best trees of island
+        """
+        trees = genetic_tree._trees
+        metrics = genetic_tree.evaluator.evaluate(trees)
+        best_indices = np.argsort(-metrics, kind="stable")[:self.n_migrants]
+        return Forest.from_trees([trees[index] for index in best_indices])
+
+    @staticmethod
+    def replace_worst(genetic_tree, migrants: list):
+        """
+        Replaces the worst trees of island by migrants
+
+        Args:
+            genetic_tree: GeneticTree running on island
+            migrants: trees that arrived to island
+        """
+        trees = genetic_tree._trees
+        metrics = genetic_tree.evaluator.evaluate(trees)
+        worst_indices = np.argsort(metrics, kind="stable")[:len(migrants)]
+        for index, migrant in zip(worst_indices, migrants):
+            trees[index] = migrant
+
+    def grow_islands(self, genetic_tree, X, y, sample_weight, thresholds,
+                     partial_fit: bool) -> list:
+        """
+        Runs genetic algorithm on n_islands processes
+
+        Args:
+            genetic_tree: GeneticTree which is trained
+            X: dataset to train model on as matrix of shape [n_observations x n_features]
+            y: proper class of each observation as vector of shape [n_observations]
+            sample_weight: a weight of each observation
+            thresholds: array of thresholds for particular dataset
+            partial_fit: if islands should start from trees of genetic_tree
+
+        Returns:
+            list of trees (all populations or the best tree of each island \
+            if genetic_tree should not keep last population)
+        """
+        is_population = partial_fit and genetic_tree._trees is not None
+        if is_population:
+            nodes = Forest.from_trees(genetic_tree._trees)
+        elif partial_fit and genetic_tree._best_tree is not None:
+            nodes = Forest.from_trees([genetic_tree._best_tree])
+        else:
+            nodes = Forest()
+
+        # island gets copy of model without trees and history
+        island_model = copy.copy(genetic_tree)
+        island_model._trees = None
+        island_model._best_tree = None
+        island_model._clear_metrics_history()
+        n_jobs = max(get_n_threads(genetic_tree._n_jobs) // self.n_islands, 1)
+        seeds = np.random.randint(10 ** 8, size=self.n_islands)
+
+        shared_memories = []
+        connections = []
+        processes = []
+        try:
+            descriptors = share_data(X, y, sample_weight, thresholds, shared_memories)
+            for island in range(self.n_islands):
+                connection, island_connection = Pipe()
+                process = Process(target=_run_island, daemon=True,
+                                  args=(island_connection, island_model, descriptors,
+                                        seeds[island], n_jobs,
+                                        nodes.take(np.arange(island, len(nodes), self.n_islands)),
+                                        is_population))
+                process.start()
+                island_connection.close()
+                connections.append(connection)
+                processes.append(process)
+
+            running = list(range(self.n_islands))
+            while len(running) > 0:
+                for island in running:
+                    connections[island].send(("run", self.migration_interval))
+                results = {island: _receive(connections[island]) for island in running}
+                running = [island for island in running if not results[island][0]]
+
+                migrated = []
+                for island, (_, migrants) in results.items():
+                    target = (island + 1) % self.n_islands
+                    if target in running and len(migrants) > 0:
+                        connections[target].send(("migrate", migrants))
+                        migrated.append(target)
+                for island in migrated:
+                    _receive(connections[island])
+
+            forests = []
+            histories = []
+            for connection in connections:
+                connection.send(("finish", None))
+                island_nodes, history = _receive(connection)
+                forests.append(island_nodes)
+                histories.append(history)
+        finally:
+            for connection in connections:
+                connection.close()
+            for process in processes:
+                process.join()
+            for memory in shared_memories:
+                memory.close()
+                memory.unlink()
+
+        genetic_tree._append_islands_metrics(histories)
+        return Forest.concatenate(forests).to_trees(X, y, sample_weight, thresholds, genetic_tree._n_jobs,
+                                                    genetic_tree.initializer.flat_observations)
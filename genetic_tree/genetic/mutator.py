@@ -1,11 +1,16 @@
 from ..tree.tree import Tree, copy_tree
+from ..tree.observations import FeatureIndex
 import math
 import numpy as np
+from scipy.sparse import issparse
 
 from aenum import Enum, extend_enum
 from ..tree.mutator import mutate_random_node, mutate_random_class_or_threshold
 from ..tree.mutator import mutate_random_feature, mutate_random_threshold
 from ..tree.mutator import mutate_random_class
+from ..tree.forest import Forest, MUTATE_RANDOM_NODE, MUTATE_CLASS, MUTATE_THRESHOLD
+from ..tree.forest import MUTATE_FEATURE, MUTATE_CLASS_OR_THRESHOLD
+from .parallel import check_n_jobs, is_out_of_core, map_in_threads
 
 
 class Mutation(Enum):
@@ -39,6 +44,16 @@ class Mutation(Enum):
     ClassOrThreshold = mutate_random_class_or_threshold,
 
 
+# kinds of batch mutation of Forest doing the same as mutation functions
+FOREST_MUTATION_KINDS = {
+    mutate_random_node: MUTATE_RANDOM_NODE,
+    mutate_random_class: MUTATE_CLASS,
+    mutate_random_threshold: MUTATE_THRESHOLD,
+    mutate_random_feature: MUTATE_FEATURE,
+    mutate_random_class_or_threshold: MUTATE_CLASS_OR_THRESHOLD,
+}
+
+
 class Mutator:
     """
     Mutator mutate individuals.
@@ -57,15 +72,24 @@ class Mutator:
                               and probability of this Mutation
         mutation_replace: if new trees should replace previous or should \
                              previous trees be modified directly
+        n_jobs: number of threads used to mutate trees
+        presort_features: if trees should share index of observations sorted \
+        by each feature, so threshold mutation finds observations between old \
+        and new threshold without scanning the subtree of the node (used only \
+        for dense X kept in memory)
     """
 
     def __init__(self,
                  mutation_prob: float = 0.4,
                  mutations_additional: list = None,
                  mutation_replace: bool = False,
+                 n_jobs: int = -1,
+                 presort_features: bool = False,
                  **kwargs):
         self.mutation_prob = self._check_mutation_prob(mutation_prob)
         self.mutation_replace = self._check_mutation_replace(mutation_replace)
+        self.n_jobs = check_n_jobs(n_jobs)
+        self.presort_features = self._check_presort_features(presort_features)
         if mutations_additional is not None:
             self.mutations_additional = self._check_mutations_additional(mutations_additional)
         else:
@@ -75,6 +99,8 @@ class Mutator:
                    mutation_prob: float = None,
                    mutations_additional: list = None,
                    mutation_replace: bool = None,
+                   n_jobs: int = None,
+                   presort_features: bool = None,
                    **kwargs):
         """
         Function to set new parameters for Mutator
@@ -85,6 +111,10 @@ class Mutator:
             self.mutation_prob = self._check_mutation_prob(mutation_prob)
         if mutation_replace is not None:
             self.mutation_replace = self._check_mutation_replace(mutation_replace)
+        if n_jobs is not None:
+            self.n_jobs = check_n_jobs(n_jobs)
+        if presort_features is not None:
+            self.presort_features = self._check_presort_features(presort_features)
         if mutations_additional is not None:
             self.mutations_additional = self._check_mutations_additional(mutations_additional)
 
@@ -106,6 +136,13 @@ class Mutator:
                             f"bool. Instead it is {type(mutation_replace)}")
         return mutation_replace
 
+    @staticmethod
+    def _check_presort_features(presort_features):
+        if type(presort_features) is not bool:
+            raise TypeError(f"presort_features: {presort_features} should be "
+                            f"bool. Instead it is {type(presort_features)}")
+        return presort_features
+
     @staticmethod
     def _check_mutations_additional(mutations_additional):
         if not isinstance(mutations_additional, list):
@@ -122,6 +159,37 @@ class Mutator:
             mutations_additional[i] = element
         return mutations_additional
 
+    def set_feature_index(self, trees):
+        """
+        Builds FeatureIndex of observations of trees and sets it in trees
+        (trees created from them use the same index). If the index of the
+        same X is already set, it is reused.
+
+        Args:
+            trees: List with trees
+        """
+        feature_index = None
+        X = trees[0].X if len(trees) > 0 else None
+        if (self.presort_features and X is not None and not issparse(X) and not is_out_of_core(X) and
+                X.shape[0] <= 0xFFFFFFFF):
+            feature_index = next((tree.feature_index for tree in trees if tree.feature_index is not None and
+                                  tree.feature_index.X is X), None)
+            if feature_index is None:
+                feature_index = FeatureIndex(X, self.n_jobs)
+        for tree in trees:
+            tree.feature_index = feature_index
+
+    @staticmethod
+    def clear_feature_index(trees):
+        """
+        Removes FeatureIndex from trees
+
+        Args:
+            trees: List with trees
+        """
+        for tree in trees:
+            tree.feature_index = None
+
     def mutate(self, trees):
         """
         It mutates all trees based on params
@@ -153,18 +221,70 @@ class Mutator:
         Returns:
             trees: New created trees that was mutated
         """
-        new_created_trees = []
         trees_number: int = len(trees)
         tree_ids: np.array = self._get_random_trees(trees_number, prob)
-        for tree_id in tree_ids:
-            tree: Tree = trees[tree_id]
+        trees_to_mutate: list = [trees[tree_id] for tree_id in tree_ids]
+
+        # tree_ids are unique so each thread works on other tree
+        # and each tree uses its own random generator
+        # trees selected more than once share observations, so the tree
+        # mutated in place has to get its own observations first
+        def mutate_tree(tree: Tree) -> Tree:
             if self.mutation_replace:
-                self._run_mutation_function(tree, mutation)
+                # trees mutated in place stay in population, so they are not raced
+                tree.racing_cut = 0
+                tree.materialize()
             else:
                 tree = copy_tree(tree)
-                self._run_mutation_function(tree, mutation)
-                new_created_trees.append(tree)
-        return new_created_trees
+            self._run_mutation_function(tree, mutation)
+            return tree
+
+        mutated_trees = map_in_threads(mutate_tree, trees_to_mutate, self.n_jobs)
+        if self.mutation_replace:
+            return []
+        return mutated_trees
+
+    def mutate_forest(self, forest: Forest, racing_cut: float = 0.0) -> Forest:
+        """
+        It mutates trees of Forest in the same way as mutate, but by batch
+        kernel of Forest (without Tree objects)
+
+        Args:
+            forest: Forest with assigned observations
+            racing_cut: mutated tree is rejected if it cannot reach this \
+            number of proper classified observations (0 means no racing)
+
+        Returns:
+            Forest with mutated trees (empty if mutation_replace)
+        """
+        mutated_population = [self._mutate_forest_by_mutation(forest, None, self.mutation_prob, racing_cut)]
+        for elem in self.mutations_additional:
+            mutated_population.append(self._mutate_forest_by_mutation(forest, elem[0], elem[1], racing_cut))
+        return Forest.concatenate(mutated_population)
+
+    def _mutate_forest_by_mutation(self, forest: Forest, mutation: Mutation, prob: float,
+                                   racing_cut: float) -> Forest:
+        tree_ids: np.array = self._get_random_trees(len(forest), prob)
+        kind = self.get_forest_mutation_kind(mutation)
+        if self.mutation_replace:
+            forest.mutate(tree_ids, kind, 0.0, self.n_jobs, in_place=True)
+            return forest.take([])
+        return forest.mutate(tree_ids, kind, racing_cut, self.n_jobs)
+
+    @staticmethod
+    def get_forest_mutation_kind(mutation: Mutation) -> int:
+        """
+        Args:
+            mutation: Mutation (None means mutation of random node)
+
+        Returns:
+            kind of batch mutation of Forest doing the same as mutation
+        """
+        function = mutate_random_node if mutation is None else mutation.mutate
+        if function not in FOREST_MUTATION_KINDS:
+            raise ValueError(f"Mutation {mutation} is not supported with "
+                             f"forest_population, only built-in mutations can be used")
+        return FOREST_MUTATION_KINDS[function]
 
     @staticmethod
     def _run_mutation_function(tree: Tree, mutation: Mutation):
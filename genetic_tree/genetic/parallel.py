@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+import numpy as np
+
+# out-of-core X (np.memmap) is read by blocks of rows of about this size
+ROW_BLOCK_BYTES = 64 * 2**20
+
+# pool of threads of fit running in the current thread (see acquire_thread_pool)
+_thread_pool = threading.local()
+
+
+def check_n_jobs(n_jobs):
+    """
+    Checks if n_jobs has proper type
+
+    Args:
+        n_jobs: number of threads, -1 means all processors, -2 all but one etc.
+
+    Returns:
+        n_jobs
+    """
+    if type(n_jobs) is not int:
+        raise TypeError(f"n_jobs: {n_jobs} should be int. "
+                        f"Instead it is {type(n_jobs)}")
+    if n_jobs == 0:
+        raise ValueError("n_jobs == 0 has no meaning. Use n_jobs=1 to run "
+                         "in one thread or n_jobs=-1 to use all processors")
+    return n_jobs
+
+
+def get_n_threads(n_jobs: int) -> int:
+    """
+    Converts n_jobs to the real number of threads (as in scikit-learn \
+    negative numbers mean all processors except n_jobs + 1)
+
+    Args:
+        n_jobs: number of threads
+
+    Returns:
+        number of threads (at least 1)
+    """
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    return max(n_jobs, 1)
+
+
+def map_in_threads(function, elements: list, n_jobs: int) -> list:
+    """
+    Applies function to each element of list using pool of threads
+
+    The time consuming parts of tree operations (observations assignment,
+    copying of observations) are run without GIL, so threads can run them
+    concurrently. All random numbers that are not taken from trees own random
+    generators should be drawn before calling this function to keep results
+    independent of n_jobs.
+
+    Args:
+        function: function with one argument
+        elements: list of arguments to apply function on
+        n_jobs: number of threads
+
+    Returns:
+        list with results in the same order as elements
+    """
+    n_threads = min(get_n_threads(n_jobs), len(elements))
+    if n_threads <= 1:
+        return [function(element) for element in elements]
+    executor = getattr(_thread_pool, "executor", None)
+    if executor is not None and _thread_pool.n_threads <= get_n_threads(n_jobs):
+        return list(executor.map(function, elements))
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        return list(executor.map(function, elements))
+
+
+def acquire_thread_pool(n_jobs: int):
+    """
+    Creates pool of threads used by map_in_threads called from the current
+    thread until release_thread_pool, so threads are not created in each
+    call (many times in each generation). Calls from threads of the pool
+    (and from other fits) create their own threads, so they never wait for
+    the pool they run in. Nested calls (e.g. fit of island in the same
+    thread) reuse the pool.
+
+    Args:
+        n_jobs: number of threads
+    """
+    if getattr(_thread_pool, "users", 0) > 0:
+        _thread_pool.users += 1
+        return
+    _thread_pool.users = 1
+    _thread_pool.n_threads = get_n_threads(n_jobs)
+    _thread_pool.executor = None
+    if _thread_pool.n_threads > 1:
+        _thread_pool.executor = ThreadPoolExecutor(max_workers=_thread_pool.n_threads)
+
+
+def release_thread_pool():
+    """
+    Unregisters fit registered by acquire_thread_pool, threads are stopped
+    when the last fit in the current thread ends
+    """
+    _thread_pool.users -= 1
+    if _thread_pool.users == 0:
+        executor, _thread_pool.executor = _thread_pool.executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+def is_out_of_core(X) -> bool:
+    """
+    Returns:
+        if X is dense array read from disk (np.memmap), rows of such X should \
+        be read sequentially by blocks
+    """
+    return isinstance(X, np.memmap)
+
+
+def get_row_blocks(X, step: int = 1) -> list:
+    """
+    Splits rows of X into blocks of about ROW_BLOCK_BYTES (counting only
+    every step-th row)
+
+    Args:
+        X: dense array
+        step: only every step-th row of X is read
+
+    Returns:
+        list of tuples (start, end), start of each block is multiple of step
+    """
+    row_bytes = max(X.shape[1] * X.dtype.itemsize, 1)
+    block_size = max(ROW_BLOCK_BYTES // row_bytes, 1) * step
+    return [(start, min(start + block_size, X.shape[0])) for start in range(0, X.shape[0], block_size)]
+
+
+def read_rows(X, step: int = 1) -> np.ndarray:
+    """
+    Copies every step-th row of X to memory, X is read by row blocks
+
+    Args:
+        X: dense array
+        step: only every step-th row of X is read
+
+    Returns:
+        np.ndarray with rows X[::step]
+    """
+    rows = np.empty(((X.shape[0] + step - 1) // step, X.shape[1]), dtype=X.dtype)
+    for start, end in get_row_blocks(X, step):
+        rows[start // step:(end + step - 1) // step] = X[start:end:step]
+    return rows
@@ -2,7 +2,7 @@ import numpy as np
 import warnings
 
 from aenum import Enum, extend_enum
-from ..tree.tree import copy_tree
+from ..tree.tree import share_tree
 
 
 def metrics_greater_than_zero(metrics: np.array) -> np.array:
@@ -55,16 +55,18 @@ def get_selected_indices_by_tournament_selection(metrics: np.array, n_individual
     Returns:
          np.array: array with indices of selected individuals (individuals are in random order)
     """
-    random_indices = np.empty([n_individuals, tournament_size], dtype=np.int)
+    random_indices = np.empty([n_individuals, tournament_size], dtype=np.intp)
     for i in range(tournament_size):
         random_indices[:, i] = np.random.randint(0, metrics.shape[0] - i, n_individuals)
 
-    def tournament_selection(row):
-        for j in range(1, row.shape[0]):
-            row[j] += np.sum(row[:j] <= row[j])
-        return row[np.argmax(metrics[row])]
+    # j-th contestant is drawn from individuals not chosen before, so its index
+    # is increased by the number of previous contestants with lower or equal index
+    # (all tournaments at once, contestant by contestant)
+    for j in range(1, tournament_size):
+        random_indices[:, j] += np.sum(random_indices[:, :j] <= random_indices[:, j:j + 1], axis=1)
 
-    return np.apply_along_axis(tournament_selection, 1, random_indices)
+    winners = np.argmax(metrics[random_indices], axis=1)
+    return random_indices[np.arange(n_individuals), winners]
 
 
 def get_selected_indices_by_roulette_selection(metrics: np.array, n_individuals: int, **kwargs) -> np.array:
@@ -92,21 +94,9 @@ def get_selected_indices_by_roulette_selection(metrics: np.array, n_individuals:
     random_roulette_numbers = np.random.random(n_individuals)
     random_roulette_numbers = np.sort(random_roulette_numbers)
 
-    selected_indices = np.empty(n_individuals, dtype=np.int)
-    metric_index = 0
-    roulette_index = 0
-    selected_index = 0
-
-    # the best theoretical computational complexity but in pure python
-    while roulette_index != n_individuals:
-        if random_roulette_numbers[roulette_index] <= metrics_summed[metric_index]:
-            selected_indices[selected_index] = metric_index
-            selected_index += 1
-            roulette_index += 1
-        else:
-            metric_index += 1
-
-    return selected_indices
+    # each number selects the first individual with metrics_summed not lower than it
+    selected_indices = np.searchsorted(metrics_summed, random_roulette_numbers, side="left")
+    return np.minimum(selected_indices, metrics.shape[0] - 1)
 
 
 def get_selected_indices_by_stochastic_uniform_selection(metrics: np.array, n_individuals: int, **kwargs) -> np.array:
@@ -135,20 +125,15 @@ def get_selected_indices_by_stochastic_uniform_selection(metrics: np.array, n_in
     distance = 1 / n_individuals
     random_number = np.random.random(1)[0] * distance
 
-    selected_indices = np.empty(n_individuals, dtype=np.int)
-    metric_index = 0
-    selected_index = 0
-
-    # the best theoretical computational complexity but in pure python
-    while selected_index != n_individuals:
-        if random_number <= metrics_summed[metric_index]:
-            selected_indices[selected_index] = metric_index
-            selected_index += 1
-            random_number += distance
-        else:
-            metric_index += 1
+    # points are summed one after another (not multiplied), so they are
+    # exactly the same floats as when going by distance in a loop
+    points = np.full(n_individuals, distance)
+    points[0] = random_number
+    points = np.cumsum(points)
 
-    return selected_indices
+    # each point selects the first individual with metrics_summed not lower than it
+    selected_indices = np.searchsorted(metrics_summed, points, side="left")
+    return np.minimum(selected_indices, metrics.shape[0] - 1)
 
 
 class Selection(Enum):
@@ -281,6 +266,21 @@ class Selector:
             trees: List with all trees
             trees_metrics: Metric of each tree
         """
+        indices = self.select_indices(trees_metrics)
+        new_trees = self._get_new_trees_by_indices(trees, indices)
+        return new_trees
+
+    def select_indices(self, trees_metrics) -> np.ndarray:
+        """
+        Function selects indices of parents from population (used directly
+        when population is kept in Forest)
+
+        Args:
+            trees_metrics: Metric of each tree
+
+        Returns:
+            np.array with self.n_trees indices (they can repeat)
+        """
         if trees_metrics.shape[0] < self.n_trees:
             warnings.warn(f"There are {trees_metrics.shape[0]} trees but it has "
                           f"to be selected {self.n_trees}. If algorithm will "
@@ -290,9 +290,7 @@ class Selector:
                           f"by offspring or set bigger mutation or crossing "
                           f"probability with do not replacing parents.",
                           UserWarning)
-        indices = self.selection.select(trees_metrics, self.n_trees, **self._kwargs)
-        new_trees = self._get_new_trees_by_indices(trees, indices)
-        return new_trees
+        return self.selection.select(trees_metrics, self.n_trees, **self._kwargs)
 
     @staticmethod
     def _get_new_trees_by_indices(trees, indices):
@@ -300,7 +298,7 @@ class Selector:
 
         # first get all unique indices
         unique_indices = np.unique(indices)
-        new_trees = list(np.take(np.array(trees), unique_indices))
+        new_trees = [trees[index] for index in unique_indices]
 
         # remove one copy of each index in indices
         uniques_to_remove = np.searchsorted(sorted_indices, unique_indices)
@@ -308,8 +306,10 @@ class Selector:
 
         # for each existing index copy tree and add to new_trees list
         # it is needed to not have two references for the same tree
+        # the copies share observations with the tree, which are copied only
+        # when one of the trees is mutated in place (see Tree.materialize)
         for index in removed:
-            new_trees.append(copy_tree(trees[index]))
+            new_trees.append(share_tree(trees[index]))
 
         return new_trees
 
@@ -321,10 +321,21 @@ class Selector:
             trees: List with all trees
             trees_metrics: Metric of each tree
         """
-        n_elitism = self.n_elitism
-        if n_elitism <= 0:
+        elite_indices = self.get_elite_indices(trees_metrics)
+        if elite_indices.shape[0] == 0:
             return []
-        elif n_elitism >= len(trees):
-            n_elitism = len(trees)
-        elite_indices = np.argpartition(-trees_metrics, n_elitism - 1)[:n_elitism]
         return list(np.take(np.array(trees), elite_indices))
+
+    def get_elite_indices(self, trees_metrics) -> np.ndarray:
+        """
+        Function to select indices of best n_elitism trees
+
+        Args:
+            trees_metrics: Metric of each tree
+        """
+        n_elitism = self.n_elitism
+        if n_elitism <= 0:
+            return np.empty(0, dtype=np.intp)
+        elif n_elitism >= trees_metrics.shape[0]:
+            n_elitism = trees_metrics.shape[0]
+        return np.argpartition(-trees_metrics, n_elitism - 1)[:n_elitism]
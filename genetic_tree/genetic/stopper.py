@@ -44,6 +44,25 @@ class Stopper:
         self.best_result_iteration: int = 1
         self.best_metric_hist: list = []
 
+    def get_state(self) -> dict:
+        """
+        Returns:
+            private variables of the stopper (to save them in checkpoint)
+        """
+        return {"current_iteration": self.current_iteration,
+                "best_result": self.best_result,
+                "best_result_iteration": self.best_result_iteration,
+                "best_metric_hist": list(self.best_metric_hist)}
+
+    def set_state(self, state: dict):
+        """
+        Function that restores private variables returned by get_state.
+        """
+        self.current_iteration = state["current_iteration"]
+        self.best_result = state["best_result"]
+        self.best_result_iteration = state["best_result_iteration"]
+        self.best_metric_hist = list(state["best_metric_hist"])
+
     def stop(self, metrics: list = None) -> bool:
         """
 
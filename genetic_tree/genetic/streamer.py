@@ -0,0 +1,183 @@
+import numpy as np
+from scipy.sparse import issparse
+
+from .parallel import map_in_threads
+
+
+class Streamer:
+    """
+    Streamer keeps the newest stream_window observations passed to fit and
+    partial_fit, so trees are evaluated on sliding window of data stream.
+    Observations are kept in buffers with space for next observations, so
+    partial_fit assigns only new observations to trees of last population and
+    subtracts weights of observations older than window from their leaves
+    (observations stay in leaves with zero weight). The cost of partial_fit
+    is proportional to the number of new observations, not to the window.
+    When buffers are full, observations of window are moved to new buffers
+    and assigned to trees again. Thresholds of the first fit are kept.
+
+    Trees are updated in place only when last population is kept with
+    observations (keep_last_population and not remove_variables), otherwise
+    they are evaluated on the window from scratch.
+
+    Args:
+        stream_window: number of the newest observations trees are evaluated \
+        on (0 means that each fit and partial_fit uses only observations \
+        passed to it)
+    """
+
+    def __init__(self,
+                 stream_window: int = 0,
+                 **kwargs):
+        self.stream_window: int = self._check_stream_window(stream_window)
+        self._clear_buffers()
+
+    def set_params(self,
+                   stream_window: int = None,
+                   **kwargs):
+        """
+        Function to set new parameters for Streamer
+
+        Arguments are the same as in __init__
+        """
+        if stream_window is not None:
+            self.stream_window = self._check_stream_window(stream_window)
+
+    @staticmethod
+    def _check_stream_window(stream_window):
+        if type(stream_window) is not int:
+            raise TypeError(f"stream_window: {stream_window} should be int. "
+                            f"Instead it is {type(stream_window)}")
+        if stream_window < 0:
+            raise ValueError(f"stream_window: {stream_window} should be "
+                             f"non-negative")
+        return stream_window
+
+    @property
+    def started(self) -> bool:
+        """
+        If there are observations of window from previous fit
+        """
+        return self._X is not None
+
+    @property
+    def thresholds(self) -> np.ndarray:
+        return self._thresholds
+
+    def start(self, X, y, sample_weight, thresholds, classes) -> tuple:
+        """
+        Function called at the beginning of fit, it puts the newest
+        stream_window observations to new buffers
+
+        Args:
+            X: dataset the model is trained on
+            y: proper classes of observations
+            sample_weight: weights of observations
+            thresholds: array of thresholds for the dataset
+            classes: classes of the model
+
+        Returns:
+            tuple (X, y, sample_weight) trees should be trained on
+        """
+        self._clear_buffers()
+        if self.stream_window == 0:
+            return X, y, sample_weight
+        if issparse(X):
+            raise ValueError("stream_window is supported only for dense X")
+        self._thresholds = thresholds
+        self._classes = classes
+        return self._move_to_new_buffers(X, y, sample_weight)
+
+    def append(self, genetic_tree, X, y, sample_weight) -> tuple:
+        """
+        Function called at the beginning of partial_fit, it appends observations
+        to window and removes observations older than stream_window. If it
+        is possible new observations are assigned to trees of genetic_tree
+        and expired observations are removed from them.
+
+        Args:
+            genetic_tree: trained GeneticTree
+            X: new observations
+            y: proper classes of new observations
+            sample_weight: weights of new observations
+
+        Returns:
+            tuple (X, y, sample_weight, trees_updated) - observations trees \
+            should be trained on and if trees already have them assigned
+        """
+        if issparse(X):
+            raise ValueError("stream_window is supported only for dense X")
+        n_new = X.shape[0]
+        n_window = self._end - self._start
+        if n_new >= self.stream_window or self._end + n_new > self._X.shape[0]:
+            # observations left in window are moved to the beginning of new buffers
+            n_left = max(min(self.stream_window - n_new, n_window), 0)
+            return self._move_to_new_buffers(
+                np.concatenate([self._X[self._end - n_left:self._end], X]),
+                np.concatenate([self._y[self._end - n_left:self._end], y]),
+                np.concatenate([self._sample_weight[self._end - n_left:self._end], sample_weight])) + (False,)
+
+        # weights of expired observations are set to 0 and subtracted from leaves of trees
+        n_expired = max(n_window + n_new - self.stream_window, 0)
+        expired_start = self._start
+        expired_weight = self._sample_weight[expired_start:expired_start + n_expired].copy()
+        self._sample_weight[expired_start:expired_start + n_expired] = 0
+        new_start = self._end
+        self._write(X, y, sample_weight)
+        self._start += n_expired
+        X, y, sample_weight = self._get_window()
+
+        trees = genetic_tree._trees
+        if (trees is None or genetic_tree.migrator.n_islands > 1 or genetic_tree.subsampler.subsample < 1 or
+                not all(np.array_equal(tree.classes, self._classes) for tree in trees)):
+            return X, y, sample_weight, False
+        y_class_ids = self._y_class_ids[:self._end]
+        map_in_threads(lambda tree: tree.stream_observations(X, y, sample_weight, self._thresholds, y_class_ids,
+                                                             expired_start, expired_weight, new_start),
+                       trees, genetic_tree._n_jobs)
+        return X, y, sample_weight, True
+
+    def _move_to_new_buffers(self, X, y, sample_weight) -> tuple:
+        n_observations = min(X.shape[0], self.stream_window)
+        # there is space for the whole next window, so observations are moved
+        # to new buffers at most once per stream_window new observations
+        capacity = 2 * self.stream_window
+        self._X = np.zeros((capacity, X.shape[1]), dtype=np.float32)
+        self._y = np.zeros(capacity, dtype=np.intp)
+        self._sample_weight = np.zeros(capacity, dtype=np.float32)
+        self._y_class_ids = np.zeros(capacity, dtype=np.intp)
+        self._start = 0
+        self._end = 0
+        start = X.shape[0] - n_observations
+        self._write(X[start:], y[start:], sample_weight[start:])
+        return self._get_window()
+
+    def _write(self, X, y, sample_weight):
+        end = self._end + X.shape[0]
+        self._X[self._end:end] = X
+        self._y[self._end:end] = y
+        self._sample_weight[self._end:end] = sample_weight
+        self._y_class_ids[self._end:end] = np.searchsorted(self._classes, y)
+        self._end = end
+
+    def _get_window(self) -> tuple:
+        # observations before window stay in arrays (with zero weight),
+        # so ids of observations assigned to trees do not change
+        return self._X[:self._end], self._y[:self._end], self._sample_weight[:self._end]
+
+    def _clear_buffers(self):
+        self._X: np.ndarray = None
+        self._y: np.ndarray = None
+        self._sample_weight: np.ndarray = None
+        self._y_class_ids: np.ndarray = None
+        self._thresholds: np.ndarray = None
+        self._classes: np.ndarray = None
+        self._start: int = 0
+        self._end: int = 0
+
+    def __getstate__(self):
+        # window is not pickled, partial_fit of unpickled model starts new window
+        return {"stream_window": self.stream_window}
+
+    def __setstate__(self, state):
+        self.__init__(state["stream_window"])
@@ -0,0 +1,176 @@
+import numpy as np
+
+from ..tree.tree import prepare_new_fit_of_trees
+
+
+def get_stratified_indices(y: np.array, fraction: float) -> np.array:
+    """
+    Draws the same fraction of observations of each class (at least one
+    observation of each class, so classes of subsample are the same)
+
+    Args:
+        y: proper class of each observation
+        fraction: fraction of observations to draw
+
+    Returns:
+        np.array: sorted indices of drawn observations
+    """
+    classes, y_class_ids = np.unique(y, return_inverse=True)
+    counts = np.bincount(y_class_ids)
+    n_drawn = np.maximum(np.round(counts * fraction).astype(np.intp), 1)
+
+    # observations sorted by class and in random order inside each class
+    order = np.lexsort((np.random.random(y.shape[0]), y_class_ids))
+    class_starts = np.concatenate([[0], np.cumsum(counts)[:classes.shape[0] - 1]])
+    sorted_class_ids = y_class_ids[order]
+    position_in_class = np.arange(y.shape[0]) - class_starts[sorted_class_ids]
+    return np.sort(order[position_in_class < n_drawn[sorted_class_ids]])
+
+
+class Subsampler:
+    """
+    Subsampler makes trees evaluated on stratified (by y) subsample of
+    observations instead of all observations, so mutations and crossings
+    assign only observations of subsample. Every subsample_interval
+    generations new subsample is drawn and observations of all trees are
+    assigned again. At the end of training the best trees are evaluated on
+    all observations before the best of them is chosen.
+
+    Args:
+        subsample: fraction of observations trees are evaluated on \
+        (1 means all observations, without subsampling)
+        subsample_interval: number of generations between drawing new subsample
+    """
+
+    def __init__(self,
+                 subsample: float = 1.0,
+                 subsample_interval: int = 10,
+                 **kwargs):
+        self.subsample: float = self._check_subsample(subsample)
+        self.subsample_interval: int = self._check_subsample_interval(subsample_interval)
+        self._data: tuple = None
+        self._thresholds: np.ndarray = None
+        self._indices: np.ndarray = None
+
+    def set_params(self,
+                   subsample: float = None,
+                   subsample_interval: int = None,
+                   **kwargs):
+        """
+        Function to set new parameters for Subsampler
+
+        Arguments are the same as in __init__
+        """
+        if subsample is not None:
+            self.subsample = self._check_subsample(subsample)
+        if subsample_interval is not None:
+            self.subsample_interval = self._check_subsample_interval(subsample_interval)
+
+    @staticmethod
+    def _check_subsample(subsample):
+        if type(subsample) is not float and type(subsample) is not int:
+            raise TypeError(f"subsample: {subsample} should be float. "
+                            f"Instead it is {type(subsample)}")
+        if subsample <= 0 or subsample > 1:
+            raise ValueError(f"subsample: {subsample} should be in (0, 1]")
+        return subsample
+
+    @staticmethod
+    def _check_subsample_interval(subsample_interval):
+        if type(subsample_interval) is not int:
+            raise TypeError(f"subsample_interval: {subsample_interval} should "
+                            f"be int. Instead it is {type(subsample_interval)}")
+        if subsample_interval <= 0:
+            raise ValueError(f"subsample_interval: {subsample_interval} should "
+                             f"be positive")
+        return subsample_interval
+
+    @property
+    def subsample_indices(self) -> np.ndarray:
+        """
+        Indices of observations of current subsample (None without subsampling)
+        """
+        return self._indices
+
+    def start(self, X, y, sample_weight, thresholds, subsample_indices=None) -> tuple:
+        """
+        Function called before training, it keeps all observations and draws
+        the first subsample
+
+        Args:
+            X: dataset the model is trained on
+            y: proper classes of observations
+            sample_weight: weights of observations
+            thresholds: array of thresholds for the dataset
+            subsample_indices: indices of subsample to use instead of drawing \
+            new one (e.g. restored from checkpoint)
+
+        Returns:
+            tuple (X, y, sample_weight) of subsample trees should be trained on
+        """
+        if subsample_indices is None and self.subsample >= 1:
+            return X, y, sample_weight
+        self._data = X, y, sample_weight
+        self._thresholds = thresholds
+        if subsample_indices is None:
+            subsample_indices = get_stratified_indices(y, self.subsample)
+        self._indices = np.asarray(subsample_indices, dtype=np.intp)
+        return self._get_subsample()
+
+    def rotate(self, genetic_tree) -> bool:
+        """
+        Draws new subsample if subsample_interval generations passed from the
+        start of training and assigns its observations to all trees
+
+        Args:
+            genetic_tree: trained GeneticTree
+
+        Returns:
+            True if trees were moved to new subsample (so they have new metrics)
+        """
+        if self._indices is None:
+            return False
+        iteration = genetic_tree.stopper.current_iteration - 1
+        if iteration % self.subsample_interval != 0:
+            return False
+        self._indices = get_stratified_indices(self._data[1], self.subsample)
+        X, y, sample_weight = self._get_subsample()
+        # fitness of tree structures in cache was computed on other observations
+        genetic_tree.evaluator.clear_fitness_cache()
+        prepare_new_fit_of_trees(genetic_tree._trees, X, y, sample_weight, self._thresholds, genetic_tree._n_jobs)
+        return True
+
+    def rescore(self, genetic_tree):
+        """
+        Assigns all observations to the best trees (n_elitism, at least one)
+        or to all trees if GeneticTree keeps last population. The other trees
+        are removed from population.
+
+        Args:
+            genetic_tree: trained GeneticTree
+        """
+        if self._indices is None:
+            return
+        trees = genetic_tree._trees
+        if not genetic_tree._keep_last_population:
+            metrics = genetic_tree.evaluator.evaluate(trees)
+            n_best = max(genetic_tree.selector.n_elitism, 1)
+            trees = [trees[index] for index in np.argsort(-metrics, kind="stable")[:n_best]]
+        X, y, sample_weight = self._data
+        genetic_tree.evaluator.clear_fitness_cache()
+        prepare_new_fit_of_trees(trees, X, y, sample_weight, self._thresholds, genetic_tree._n_jobs)
+        genetic_tree._trees = trees
+
+    def finish(self):
+        """
+        Function called after training, it removes references to observations
+        """
+        self._data = None
+        self._thresholds = None
+        self._indices = None
+
+    def _get_subsample(self) -> tuple:
+        X, y, sample_weight = self._data
+        return (X[self._indices],
+                np.ascontiguousarray(y[self._indices]),
+                np.ascontiguousarray(sample_weight[self._indices]))
@@ -9,9 +9,19 @@ from .genetic.selector import Selector
 from .genetic.selector import Selection
 from .genetic.evaluator import Evaluator
 from .genetic.evaluator import Metric
+from .genetic.evaluator import PopulationStats
 from .genetic.stopper import Stopper
+from .genetic.migrator import Migrator
+from .genetic.checkpointer import Checkpointer
+from .genetic.subsampler import Subsampler
+from .genetic.streamer import Streamer
+from .genetic.parallel import acquire_thread_pool, check_n_jobs, release_thread_pool
 from .tree.thresholds import prepare_thresholds_array
-from .tree.tree import Tree
+from .tree.tree import Tree, prepare_new_fit_of_trees
+from .tree.predictor import CompiledTree
+from .tree.forest import Forest
+from .model_file import save_model, load_model
+from .tree._utils import acquire_buffer_pool, release_buffer_pool
 
 from numpy import float32 as DTYPE
 from numpy import intp as SIZE
@@ -49,7 +59,57 @@ class GeneticTree:
         keep_last_population: if keep population left after last generation
         remove_variables: if remove additional variables from tree
         verbose: if algorithm should print status of training on console
-        n_jobs: number of concurrent threads when using parallelization
+        n_jobs: number of concurrent threads used to mutate, cross and assign \
+        observations to trees and to predict (-1 means using all processors)
+        flat_observations: if observations of all leaves of tree should be kept \
+        in one contiguous buffer instead of separate array for each leaf
+        n_islands: number of processes with separate populations (islands), \
+        1 means that whole population is trained in current process
+        migration_interval: number of generations between migrations of trees \
+        between islands
+        n_migrants: number of the best trees sent by each island to next one \
+        during migration
+        buffer_pool_size: maximal size (in MB) of memory of discarded trees \
+        kept during fit to be reused by new trees (0 means that memory is \
+        always freed); the pool is shared by fits running in the process at \
+        the same time, so it keeps the largest size of them
+        cache_thresholds: if thresholds found for X should be kept and reused \
+        by next fits with the same X and n_thresholds (e.g. in parameters \
+        search); X is recognized only by a sample of its rows, so values \
+        changed in other rows are not detected
+        compiled_predictor: if predictions should be made by compact \
+        inference-only copy of the best tree (CompiledTree)
+        fitness_cache_size: maximal number of tree structures with cached \
+        fitness; observations are not assigned to new trees with the same \
+        structure as cached one until it is needed (0 means no cache)
+        checkpoint_path: path of file where state of training is saved every \
+        checkpoint_interval generations (None means no checkpoints), training \
+        can be continued from it by resume (not used when n_islands > 1)
+        checkpoint_interval: number of generations between checkpoints
+        subsample: fraction of observations (stratified by classes) trees are \
+        evaluated on during training (1 means all observations), at the end \
+        the best trees are evaluated on all observations
+        subsample_interval: number of generations between drawing new subsample
+        racing_quantile: offspring are rejected (without assigning all \
+        observations to them) as soon as their accuracy cannot reach this \
+        quantile of metric of previous population (0 means that all \
+        offspring are evaluated to the end); built-in metrics are not \
+        greater than accuracy, so rejected offspring could not reach it with \
+        metric either; if population would be smaller than n_trees without \
+        rejected offspring, they are replaced by the best parents
+        stream_window: number of the newest observations passed to fit and \
+        partial_fit trees are evaluated on; partial_fit appends new \
+        observations to trees of last population and removes the oldest ones \
+        (0 means that trees are evaluated only on observations passed to fit)
+        presort_features: if ids of observations sorted by each feature \
+        should be indexed once per fit (for dense X kept in memory, the index \
+        takes as much memory as X), so threshold mutation finds observations \
+        between old and new threshold without scanning the subtree of the node
+        forest_population: if population should be kept during fit in Forest \
+        (nodes and observations of all trees in a few arrays) and changed by \
+        its batch kernels instead of Tree objects; only built-in mutations \
+        can be used and it cannot be used with n_islands > 1, checkpoints, \
+        subsample, stream_window, fitness cache and presort_features
         max_depth: maximal depth of selected trees
         kwargs: additional arguments to Selections, Metrics, Mutations and Initialization created by user
 
@@ -88,9 +148,25 @@ class GeneticTree:
                  keep_last_population: bool = False,
                  remove_variables: bool = True,
                  verbose: int = 0,
+                 n_jobs: int = -1,
+                 flat_observations: bool = False,
+                 n_islands: int = 1,
+                 migration_interval: int = 10,
+                 n_migrants: int = 2,
+                 buffer_pool_size: int = 256,
+                 cache_thresholds: bool = False,
+                 compiled_predictor: bool = False,
+                 fitness_cache_size: int = 0,
+                 checkpoint_path: str = None,
+                 checkpoint_interval: int = 10,
+                 subsample: float = 1.0,
+                 subsample_interval: int = 10,
+                 racing_quantile: float = 0.0,
+                 stream_window: int = 0,
+                 presort_features: bool = False,
+                 forest_population: bool = False,
 
                  # TODO: params not used yet:
-                 n_jobs: int = -1,
                  max_depth: int = 20,
                  **kwargs
                  ):
@@ -101,7 +177,7 @@ class GeneticTree:
         kwargs = vars()
         kwargs.pop('self')
         kwargs.pop('random_state')
-        none_arg = self._is_any_arg_none(['mutations_additional'], **kwargs)
+        none_arg = self._is_any_arg_none(['mutations_additional', 'checkpoint_path'], **kwargs)
         if none_arg:
             raise ValueError(f"The argument {none_arg} is None. "
                              f"GeneticTree does not support None arguments.")
@@ -112,24 +188,27 @@ class GeneticTree:
         self.selector = Selector(**kwargs)
         self.evaluator = Evaluator(**kwargs)
         self.stopper = Stopper(**kwargs)
+        self.migrator = Migrator(**kwargs)
+        self.checkpointer = Checkpointer(**kwargs)
+        self.subsampler = Subsampler(**kwargs)
+        self.streamer = Streamer(**kwargs)
 
         self._save_metrics = save_metrics
-        self.acc_mean = []
-        self.acc_best = []
-        self.n_leaves_mean = []
-        self.n_leaves_best = []
-        self.depth_mean = []
-        self.depth_best = []
-        self.metric_best = []
-        self.metric_mean = []
+        self._clear_metrics_history()
 
         self._keep_last_population = keep_last_population
         self._remove_variables = remove_variables
         self._leave_selected_parents = leave_selected_parents
         self._verbose = verbose
+        self._n_jobs = check_n_jobs(n_jobs)
+        self._buffer_pool_size = self._check_buffer_pool_size(buffer_pool_size)
+        self._cache_thresholds = self._check_cache_thresholds(cache_thresholds)
+        self._compiled_predictor = self._check_compiled_predictor(compiled_predictor)
+        self._forest_population = self._check_forest_population(forest_population)
 
         self._trees = None
         self._best_tree: Tree = None
+        self._predictor: CompiledTree = None
 
         self._n_features = None
         self._classes = None
@@ -162,6 +241,10 @@ class GeneticTree:
         self.selector.set_params(**kwargs)
         self.evaluator.set_params(**kwargs)
         self.stopper.set_params(**kwargs)
+        self.migrator.set_params(**kwargs)
+        self.checkpointer.set_params(**kwargs)
+        self.subsampler.set_params(**kwargs)
+        self.streamer.set_params(**kwargs)
         if kwargs.__contains__("keep_last_population"):
             self._keep_last_population = kwargs["keep_last_population"]
         if kwargs.__contains__("remove_variables"):
@@ -170,11 +253,70 @@ class GeneticTree:
             self._leave_selected_parents = kwargs["leave_selected_parents"]
         if kwargs.__contains__("verbose"):
             self._verbose = kwargs["verbose"]
+        if kwargs.__contains__("n_jobs"):
+            self._n_jobs = check_n_jobs(kwargs["n_jobs"])
+        if kwargs.__contains__("buffer_pool_size"):
+            self._buffer_pool_size = self._check_buffer_pool_size(kwargs["buffer_pool_size"])
+        if kwargs.__contains__("cache_thresholds"):
+            self._cache_thresholds = self._check_cache_thresholds(kwargs["cache_thresholds"])
+        if kwargs.__contains__("compiled_predictor"):
+            self._compiled_predictor = self._check_compiled_predictor(kwargs["compiled_predictor"])
+        if kwargs.__contains__("forest_population"):
+            self._forest_population = self._check_forest_population(kwargs["forest_population"])
         if kwargs.__contains__("random_state"):
             np.random.seed(kwargs["random_state"])
 
         return self
 
+    @staticmethod
+    def _check_buffer_pool_size(buffer_pool_size):
+        if type(buffer_pool_size) is not int:
+            raise TypeError(f"buffer_pool_size: {buffer_pool_size} should be int. "
+                            f"Instead it is {type(buffer_pool_size)}")
+        if buffer_pool_size < 0:
+            raise ValueError(f"buffer_pool_size: {buffer_pool_size} should be "
+                             f"non-negative")
+        return buffer_pool_size
+
+    @staticmethod
+    def _check_cache_thresholds(cache_thresholds):
+        if type(cache_thresholds) is not bool:
+            raise TypeError(f"cache_thresholds: {cache_thresholds} should be "
+                            f"bool. Instead it is {type(cache_thresholds)}")
+        return cache_thresholds
+
+    @staticmethod
+    def _check_compiled_predictor(compiled_predictor):
+        if type(compiled_predictor) is not bool:
+            raise TypeError(f"compiled_predictor: {compiled_predictor} should be "
+                            f"bool. Instead it is {type(compiled_predictor)}")
+        return compiled_predictor
+
+    @staticmethod
+    def _check_forest_population(forest_population):
+        if type(forest_population) is not bool:
+            raise TypeError(f"forest_population: {forest_population} should be "
+                            f"bool. Instead it is {type(forest_population)}")
+        return forest_population
+
+    def _check_forest_population_support(self):
+        if not self._forest_population:
+            return
+        unsupported = {
+            "n_islands > 1": self.migrator.n_islands > 1,
+            "checkpoint_path": self.checkpointer.checkpoint_path is not None,
+            "subsample < 1": self.subsampler.subsample < 1,
+            "stream_window > 0": self.streamer.stream_window > 0,
+            "fitness_cache_size > 0": self.evaluator.fitness_cache is not None,
+            "presort_features": self.mutator.presort_features,
+        }
+        for name, is_set in unsupported.items():
+            if is_set:
+                raise ValueError(f"forest_population cannot be used with {name}")
+        self.mutator.get_forest_mutation_kind(None)
+        for mutation, _ in self.mutator.mutations_additional:
+            self.mutator.get_forest_mutation_kind(mutation)
+
     def fit(self, X: np.array, y: np.array, *args,
             sample_weight: np.array = None, check_input: bool = True,
             **kwargs):
@@ -217,51 +359,223 @@ class GeneticTree:
 
     def _fit(self, X, y, sample_weight: np.array = None, check_input: bool = True, partial_fit: bool = False, **kwargs):
         self._can_predict = False
+        self._predictor = None
         self.set_params(**kwargs)
+        self._check_forest_population_support()
         X, y, sample_weight = self._check_input(X, y, sample_weight, check_input)
-        self._prepare_new_training(X, y, sample_weight, partial_fit)
-        self._growth_trees()
-        self._prepare_to_predict()
-
-    def _prepare_new_training(self, X, y, sample_weight, partial_fit):
         self.stopper.reset_private_variables()
+        self.evaluator.clear_fitness_cache()
+        if self._save_metrics:
+            self._reserve_metrics_history(self.stopper.max_iter + 1)
+        # buffers of trees discarded in each generation are reused by new trees
+        # during fit, the pool is shared by fits running in the process and
+        # its buffers are freed after the last of them; threads are created
+        # once for the fit (not in each parallel step of each generation)
+        buffer_pool_size = self._buffer_pool_size * 2**20
+        acquire_buffer_pool(buffer_pool_size)
+        acquire_thread_pool(self._n_jobs)
+        try:
+            trees_updated = False
+            if partial_fit and self.streamer.started and self.streamer.stream_window > 0:
+                X, y, sample_weight, trees_updated = self.streamer.append(self, X, y, sample_weight)
+                thresholds = self.streamer.thresholds
+            else:
+                thresholds = prepare_thresholds_array(self._n_thresholds, X, self._n_jobs,
+                                                      self._cache_thresholds)
+                X, y, sample_weight = self.streamer.start(X, y, sample_weight, thresholds, self._classes)
+
+            if self.migrator.n_islands > 1:
+                self._trees = self.migrator.grow_islands(self, X, y, sample_weight,
+                                                         thresholds, partial_fit)
+            else:
+                self.checkpointer.start(X, y, sample_weight, thresholds)
+                X_train, y_train, sample_weight_train = self.subsampler.start(X, y, sample_weight, thresholds)
+                if not trees_updated:
+                    self._prepare_new_training(X_train, y_train, sample_weight_train, thresholds, partial_fit)
+                self._append_metrics(self.evaluator.get_population_stats(self._trees))
+                self._growth_trees()
+                self.subsampler.rescore(self)
+            self._prepare_to_predict()
+        finally:
+            release_thread_pool()
+            release_buffer_pool(buffer_pool_size)
+            self.checkpointer.finish()
+            self.subsampler.finish()
+
+    def resume(self, X: np.array, y: np.array, *args,
+               sample_weight: np.array = None, check_input: bool = True,
+               checkpoint_path: str = None, **kwargs):
+        """
+        Function to continue training saved in checkpoint (e.g. after the
+        process was killed). Training is continued as it would be never
+        stopped, so with the same random_state the result is the same as
+        the result of fit without break.
+
+        Args:
+            X: dataset the model was trained on (the same as passed to fit)
+            y: proper class of each observation (the same as passed to fit)
+            sample_weight: a weight of each observation (the same as passed to fit)
+            check_input: if should check the input (only set to False use when you know what you does)
+            checkpoint_path: path of checkpoint (None means param checkpoint_path)
+            kwargs: additional arguments to set as params
 
-        thresholds = prepare_thresholds_array(self._n_thresholds, X)
+        Returns:
+            GeneticTree: a classifier itself (self object)
+        """
+        self._can_predict = False
+        self._predictor = None
+        self.set_params(**kwargs)
+        if self._forest_population:
+            raise ValueError("resume cannot be used with forest_population")
+        X, y, sample_weight = self._check_input(X, y, sample_weight, check_input)
+        self.evaluator.clear_fitness_cache()
+        buffer_pool_size = self._buffer_pool_size * 2**20
+        acquire_buffer_pool(buffer_pool_size)
+        acquire_thread_pool(self._n_jobs)
+        try:
+            thresholds = self.checkpointer.restore(self, X, y, sample_weight, checkpoint_path)
+            self.checkpointer.start(X, y, sample_weight, thresholds)
+            self._growth_trees()
+            self.subsampler.rescore(self)
+            self._prepare_to_predict()
+        finally:
+            release_thread_pool()
+            release_buffer_pool(buffer_pool_size)
+            self.checkpointer.finish()
+            self.subsampler.finish()
+        return self
+
+    def _prepare_new_training(self, X, y, sample_weight, thresholds, partial_fit):
+        # with forest_population trees are only copied to Forest, which
+        # assigns observations itself
+        assign_observations = not self._forest_population
         if self._trees is None or not partial_fit:  # when previously trees was removed
-            self._trees = self.initializer.initialize(X, y, sample_weight, thresholds)
+            self._trees = self.initializer.initialize(X, y, sample_weight, thresholds, assign_observations)
             if self._best_tree is not None and partial_fit:
-                self._best_tree.prepare_new_fit(X, y, sample_weight, thresholds)
+                self._best_tree.prepare_new_fit(X, y, sample_weight, thresholds, assign_observations)
                 self._trees = self._trees + [self._best_tree]
-        else:
-            for tree in self._trees:
-                tree.prepare_new_fit(X, y, sample_weight, thresholds)
-
-    def _growth_trees(self):
-        offspring = self._trees
-        trees_metrics = self.evaluator.evaluate(offspring)
-        self._append_metrics(offspring)
-
-        while not self.stopper.stop(trees_metrics):
-            elite = self.selector.get_elite_population(offspring, trees_metrics)
-            selected_parents = self.selector.select(offspring, trees_metrics)
-            mutated_population = self.mutator.mutate(selected_parents)
-            crossed_population = self.crosser.cross_population(selected_parents)
-
-            # offspring based on elite parents from previous
-            # population, and trees made by mutation and crossing
-            offspring = mutated_population + crossed_population
-            if self._leave_selected_parents:
-                offspring += selected_parents
-            else:
-                offspring += elite
+        elif assign_observations:
+            prepare_new_fit_of_trees(self._trees, X, y, sample_weight, thresholds, self._n_jobs)
+        if self._forest_population:
+            self._trees = Forest.from_trees(self._trees)
+            self._trees.assign_observations(X, y, sample_weight, thresholds, self._n_jobs)
+
+    def _growth_trees(self, n_iter: int = None) -> bool:
+        """
+        Runs genetic algorithm on current population (list of trees or Forest)
+        until the stop condition is met or n_iter generations are created
+
+        Args:
+            n_iter: maximal number of generations (None means no limit)
 
-            trees_metrics = self.evaluator.evaluate(offspring)
-            self._append_metrics(offspring)
-            self._print_algorithm_info(offspring)
+        Returns:
+            True if the stop condition is met
+        """
+        if not isinstance(self._trees, Forest):
+            self.evaluator.set_fitness_cache(self._trees)
+            self.mutator.set_feature_index(self._trees)
+        population_stats = self.evaluator.get_population_stats(self._trees)
+        iteration = 0
+        while n_iter is None or iteration < n_iter:
+            if self.stopper.stop(population_stats.metric):
+                return True
+            self._trees, population_stats = self._create_next_generation(self._trees, population_stats)
+            if self.subsampler.rotate(self):
+                self.mutator.set_feature_index(self._trees)
+                population_stats = self.evaluator.get_population_stats(self._trees)
+            self.checkpointer.checkpoint(self)
+            iteration += 1
+        return False
 
-        self._trees = offspring
+    def _create_next_generation(self, trees, population_stats: PopulationStats):
+        if isinstance(trees, Forest):
+            return self._create_next_forest_generation(trees, population_stats)
+        self.evaluator.set_racing_cut(trees, population_stats)
+        elite = self.selector.get_elite_population(trees, population_stats.metric)
+        selected_parents = self.selector.select(trees, population_stats.metric)
+        mutated_population = self.mutator.mutate(selected_parents)
+        crossed_population = self.crosser.cross_population(selected_parents)
+
+        # offspring based on elite parents from previous population, and trees
+        # made by mutation and crossing (without rejected by racing)
+        offspring = [tree for tree in mutated_population + crossed_population if not tree.rejected]
+        n_rejected = len(mutated_population) + len(crossed_population) - len(offspring)
+        if self._leave_selected_parents:
+            offspring += selected_parents
+        else:
+            offspring += elite
+        if n_rejected > 0:
+            offspring = self._replace_rejected(offspring, selected_parents + elite,
+                                               min(n_rejected, self.selector.n_trees - len(offspring)))
+
+        population_stats = self.evaluator.get_population_stats(offspring)
+        self._append_metrics(population_stats)
+        self._print_algorithm_info(population_stats)
+        return offspring, population_stats
+
+    def _replace_rejected(self, offspring, parents, n_missing: int):
+        # offspring rejected by racing would make population smaller than
+        # n_trees, so missing trees are replaced by the best parents (they
+        # are already evaluated and are not in offspring yet)
+        if n_missing <= 0:
+            return offspring
+        offspring_ids = set(id(tree) for tree in offspring)
+        parents = list({id(tree): tree for tree in parents if id(tree) not in offspring_ids}.values())
+        if len(parents) == 0:
+            return offspring
+        parents_metrics = self.evaluator.get_population_stats(parents).metric
+        best_parents = np.argsort(-parents_metrics, kind="stable")[:n_missing]
+        return offspring + [parents[index] for index in best_parents]
+
+    def _create_next_forest_generation(self, forest: Forest, population_stats: PopulationStats):
+        # the same as _create_next_generation, but trees are only indices of
+        # forests and are changed by batch kernels
+        racing_cut = self.evaluator.get_racing_cut(population_stats, forest.sample_weight)
+        elite_indices = self.selector.get_elite_indices(population_stats.metric)
+        selected_indices = self.selector.select_indices(population_stats.metric)
+        selected_parents = forest.take(selected_indices, draw_seeds=True)
+        mutated_population = self.mutator.mutate_forest(selected_parents, racing_cut)
+        crossed_population = self.crosser.cross_forest(selected_parents, racing_cut)
+
+        children = Forest.concatenate([mutated_population, crossed_population])
+        accepted = np.flatnonzero(children.rejected == 0)
+        n_rejected = len(children) - accepted.shape[0]
+        if n_rejected > 0:
+            children = children.take(accepted)
+
+        # parents not added to offspring can replace children rejected by racing
+        _, first_selected = np.unique(selected_indices, return_index=True)
+        if self._leave_selected_parents:
+            offspring = [children, selected_parents]
+            parents = forest
+            parents_indices = np.setdiff1d(elite_indices, selected_indices)
+        else:
+            offspring = [children, forest.take(elite_indices)]
+            parents = selected_parents
+            parents_indices = np.sort(first_selected[~np.isin(selected_indices[first_selected], elite_indices)])
+        if n_rejected > 0:
+            n_missing = min(n_rejected, self.selector.n_trees - sum(len(trees) for trees in offspring))
+            offspring.append(self._get_best_forest_parents(parents, parents_indices, n_missing))
+        offspring = Forest.concatenate(offspring)
+
+        population_stats = self.evaluator.get_population_stats(offspring)
+        self._append_metrics(population_stats)
+        self._print_algorithm_info(population_stats)
+        return offspring, population_stats
+
+    def _get_best_forest_parents(self, parents: Forest, parents_indices: np.ndarray, n_missing: int) -> Forest:
+        # the same as _replace_rejected, but parents are given by indices
+        if n_missing <= 0 or parents_indices.shape[0] == 0:
+            return parents.take([])
+        parents_metrics = self.evaluator.get_population_stats(parents).metric[parents_indices]
+        best_parents = np.argsort(-parents_metrics, kind="stable")[:n_missing]
+        return parents.take(parents_indices[best_parents])
 
     def _prepare_to_predict(self):
+        if isinstance(self._trees, Forest):
+            self._trees = self._get_trees_of_forest(self._trees)
+        # index is built again by next fit (X could be changed in place)
+        self.mutator.clear_feature_index(self._trees)
         self._prepare_best_tree_to_prediction()
         if not self._keep_last_population:
             self._trees = None
@@ -272,33 +586,106 @@ class GeneticTree:
                 tree.remove_variables()
         self._can_predict = True
 
+    def _get_trees_of_forest(self, forest: Forest) -> list:
+        # Trees are created only for trees that are used after fit
+        if not self._keep_last_population:
+            forest = forest.take([self.evaluator.get_population_stats(forest).best_index])
+        return forest.to_trees(forest.X, forest.y, forest.sample_weight, forest.thresholds, self._n_jobs,
+                               self.initializer.flat_observations)
+
     def _prepare_best_tree_to_prediction(self):
         best_tree_index: int = self.evaluator.get_best_tree_index(self._trees)
         self._best_tree = self._trees[best_tree_index]
         self._best_tree.prepare_tree_to_prediction()
+        self._predictor = CompiledTree(self._best_tree) if self._compiled_predictor else None
     
-    def _append_metrics(self, trees):
+    def _append_metrics(self, population_stats: PopulationStats):
         if self._save_metrics:
-            best_tree_index = self.evaluator.get_best_tree_index(trees)
-            accuracies = self.evaluator.get_accuracies(trees)
-            self.acc_best.append(accuracies[best_tree_index])
-            self.acc_mean.append(np.mean(accuracies))
-            depths = self.evaluator.get_depths(trees)
-            self.depth_best.append(depths[best_tree_index])
-            self.depth_mean.append(np.mean(depths))
-            n_leaves = self.evaluator.get_n_leaves(trees)
-            self.n_leaves_best.append(n_leaves[best_tree_index])
-            self.n_leaves_mean.append(np.mean(n_leaves))
-            metrics = self.evaluator.evaluate(trees)
-            self.metric_best.append(metrics[best_tree_index])
-            self.metric_mean.append(np.mean(metrics))
-
-    def _print_algorithm_info(self, trees):
+            best_tree_index = population_stats.best_index
+            self._reserve_metrics_history(1)
+            self._metrics_history[:, self._n_generations] = (
+                np.mean(population_stats.accuracy), population_stats.accuracy[best_tree_index],
+                np.mean(population_stats.n_leaves), population_stats.n_leaves[best_tree_index],
+                np.mean(population_stats.depth), population_stats.depth[best_tree_index],
+                population_stats.metric[best_tree_index], np.mean(population_stats.metric),
+            )
+            self._n_generations += 1
+
+    # order of rows in _metrics_history
+    _METRICS_HISTORY = ("acc_mean", "acc_best", "n_leaves_mean", "n_leaves_best",
+                        "depth_mean", "depth_best", "metric_best", "metric_mean")
+
+    def _history_property(row: int):
+        return property(lambda self: self._metrics_history[row, :self._n_generations])
+
+    acc_mean = _history_property(0)
+    acc_best = _history_property(1)
+    n_leaves_mean = _history_property(2)
+    n_leaves_best = _history_property(3)
+    depth_mean = _history_property(4)
+    depth_best = _history_property(5)
+    metric_best = _history_property(6)
+    metric_mean = _history_property(7)
+    del _history_property
+
+    def _clear_metrics_history(self):
+        self._metrics_history = np.empty((len(self._METRICS_HISTORY), 0))
+        self._n_generations = 0
+
+    def _reserve_metrics_history(self, n_generations: int):
+        """
+        Resizes history of metrics (array with row for each metric and column
+        for each generation) so it has place for next n_generations
+        """
+        capacity = self._metrics_history.shape[1]
+        if self._n_generations + n_generations <= capacity:
+            return
+        capacity = max(self._n_generations + n_generations, 2 * capacity)
+        metrics_history = np.empty((len(self._METRICS_HISTORY), capacity))
+        metrics_history[:, :self._n_generations] = self._metrics_history[:, :self._n_generations]
+        self._metrics_history = metrics_history
+
+    def _get_metrics_history(self) -> dict:
+        return {name: getattr(self, name).copy() for name in self._METRICS_HISTORY}
+
+    def _set_metrics_history(self, history: dict):
+        self._clear_metrics_history()
+        n_generations = len(history["metric_best"])
+        self._reserve_metrics_history(n_generations)
+        for row, name in enumerate(self._METRICS_HISTORY):
+            self._metrics_history[row, :n_generations] = history[name]
+        self._n_generations = n_generations
+
+    def _append_islands_metrics(self, histories: list):
+        """
+        Appends metrics history of islands. In each generation the best values
+        are taken from island with the best metric and mean values are means
+        of islands. Histories of islands stopped earlier are extended by their
+        last values.
+        """
+        if not self._save_metrics:
+            return
+        n_generations = max(len(history["metric_best"]) for history in histories)
+        columns = {}
+        for name in self._METRICS_HISTORY:
+            columns[name] = np.array([np.pad(history[name], (0, n_generations - len(history[name])), mode="edge")
+                                      for history in histories])
+        best_islands = np.argmax(columns["metric_best"], axis=0)
+        generations = np.arange(n_generations)
+        self._reserve_metrics_history(n_generations)
+        for row, name in enumerate(self._METRICS_HISTORY):
+            if name.endswith("_best"):
+                values = columns[name][best_islands, generations]
+            else:
+                values = np.mean(columns[name], axis=0)
+            self._metrics_history[row, self._n_generations:self._n_generations + n_generations] = values
+        self._n_generations += n_generations
+
+    def _print_algorithm_info(self, population_stats: PopulationStats):
         if self._verbose >= 1:
-            accuracies = self.evaluator.get_accuracies(trees)
             print(f"Ended iteration {self.stopper.current_iteration-1} "
-                  f"with mean accuracy {np.mean(accuracies):0.04f} "
-                  f"and best accuracy {np.max(accuracies):0.04f}")
+                  f"with mean accuracy {np.mean(population_stats.accuracy):0.04f} "
+                  f"and best accuracy {np.max(population_stats.accuracy):0.04f}")
 
     def predict(self, X, check_input=True) -> np.ndarray:
         """
@@ -313,6 +700,8 @@ class GeneticTree:
             For each row x (observation) it classify the observation to one
             class and return this class.
         """
+        if self._predictor is not None:
+            return self._predictor.predict(self._check_X_to_predict(X, check_input), self._n_jobs)
         node_ids = self.apply(X)
         classes = self._best_tree.feature
         return classes[node_ids]
@@ -331,10 +720,79 @@ class GeneticTree:
             For each row x in X (observation) it finds the proper leaf. Then it
             returns the probability of each class based on leaf.
         """
+        if self._predictor is not None:
+            return self._predictor.predict_proba(self._check_X_to_predict(X, check_input), self._n_jobs)
         node_ids = self.apply(X)
         probabilities = self._best_tree.probabilities
         return probabilities[node_ids, :]
 
+    def predict_one(self, x, proba: bool = False):
+        """
+        Low-latency prediction of one observation. It skips validation of
+        input (x should have dtype float32 and proper number of features) and
+        does not allocate memory.
+
+        Args:
+            x: 1-D vector of features of observation
+            proba: if return probabilities of classes instead of class
+
+        Returns:
+            class of observation or read-only row of probabilities
+        """
+        return self._get_serving_predictor().predict_one(x, proba)
+
+    def predict_small(self, X, proba: bool = False) -> np.ndarray:
+        """
+        Low-latency prediction of small dense batch of observations. It skips
+        validation of input (X should have dtype float32 and proper number of
+        features) and runs in current thread.
+
+        Args:
+            X: np.array of size observations x features
+            proba: if return probabilities of classes instead of classes
+
+        Returns:
+            Array of size X.shape[0] with classes or array of size \
+            (X.shape[0], n_classes) with probabilities
+        """
+        return self._get_serving_predictor().predict_small(X, proba)
+
+    def _get_serving_predictor(self) -> CompiledTree:
+        if self._predictor is None:
+            self._check_is_fitted()
+            self._predictor = CompiledTree(self._best_tree)
+        return self._predictor
+
+    def save(self, path):
+        """
+        Saves the best tree (as CompiledTree), classes and number of features
+        to uncompressed .npz file, which can be loaded with memory-mapped arrays
+
+        Args:
+            path: path or file object
+        """
+        save_model(path, self._get_serving_predictor(), self._classes, self._n_features)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True, **kwargs):
+        """
+        Loads model saved by save method. Loaded model can only predict
+        (until it is fitted again).
+
+        Args:
+            path: path to .npz file
+            mmap: if arrays should be memory-mapped read-only from file \
+            (pages are shared between all processes that load the same file)
+            kwargs: parameters of GeneticTree (e.g. n_jobs)
+
+        Returns:
+            GeneticTree: model ready to predict
+        """
+        genetic_tree = cls(**kwargs)
+        genetic_tree._predictor, genetic_tree._classes, genetic_tree._n_features = load_model(path, mmap)
+        genetic_tree._can_predict = True
+        return genetic_tree
+
     def apply(self, X, check_input=True) -> np.ndarray:
         """
         Return the index of the leaf that each sample is predicted as.
@@ -348,14 +806,19 @@ class GeneticTree:
             For each observation x in X, return the index of the leaf x
             ends up in. Leaves are numbered within [0, node_count).
         """
-        self._check_is_fitted()
-        X = self._check_X(X, check_input)
-        return self._best_tree.apply(X)
+        X = self._check_X_to_predict(X, check_input)
+        if self._predictor is not None:
+            return self._predictor.apply(X, self._n_jobs)
+        return self._best_tree.apply(X, self._n_jobs)
 
     def _check_is_fitted(self):
         if not self._can_predict:
             raise Exception('Cannot predict. Model not prepared.')
 
+    def _check_X_to_predict(self, X, check_input: bool):
+        self._check_is_fitted()
+        return self._check_X(X, check_input)
+
     def _check_input(self, X, y, sample_weight, check_input: bool) -> tuple:
         """
         Check if X and y have proper dtype and have the same number of observations
@@ -404,7 +867,8 @@ class GeneticTree:
     def _check_X(self, X, check_input: bool) -> object:
         """
         Checks if X has proper dtype
-        If not it return proper X
+        If not it return proper X (np.memmap of proper dtype is not copied to
+        memory, it is read from disk by blocks of rows)
 
         Args:
             X: np.array or scipy.sparse_matrix of size observations x features
@@ -0,0 +1,78 @@
+import zipfile
+
+import numpy as np
+
+from .tree.predictor import CompiledTree
+
+FORMAT_VERSION = 1
+
+_COMPILED_TREE_ARRAYS = ("children_left", "children_right", "feature", "threshold",
+                         "leaf_node_ids", "leaf_classes", "leaf_probabilities")
+
+
+def save_model(file, predictor: CompiledTree, classes: np.ndarray, n_features: int):
+    """
+    Saves model as uncompressed .npz file, so each array can be memory-mapped
+    during loading
+
+    Args:
+        file: path or file object
+        predictor: CompiledTree made from the best tree
+        classes: classes of the model
+        n_features: number of features of the model
+    """
+    arrays = {name: getattr(predictor, name) for name in _COMPILED_TREE_ARRAYS}
+    np.savez(file, format_version=np.array(FORMAT_VERSION), classes=classes,
+             n_features=np.array(n_features), **arrays)
+
+
+def load_model(path, mmap: bool = True) -> tuple:
+    """
+    Loads model saved by save_model
+
+    Args:
+        path: path to .npz file
+        mmap: if arrays should be read-only memory-mapped from file instead \
+        of read to memory (so many processes share the same pages)
+
+    Returns:
+        tuple (predictor, classes, n_features)
+    """
+    if mmap:
+        arrays = _load_npz_mmap(path)
+    else:
+        with np.load(path) as npz:
+            arrays = dict(npz)
+    format_version = int(arrays["format_version"])
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model file format version {format_version}. "
+                         f"Supported version is {FORMAT_VERSION}.")
+    predictor = CompiledTree.from_arrays(*[arrays[name] for name in _COMPILED_TREE_ARRAYS])
+    return predictor, np.asarray(arrays["classes"]), int(arrays["n_features"])
+
+
+def _load_npz_mmap(path) -> dict:
+    """
+    Memory-maps arrays of uncompressed .npz file (np.load maps only .npy files)
+    """
+    arrays = {}
+    with open(path, "rb") as file, zipfile.ZipFile(file) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Array {info.filename} is compressed, it cannot be memory-mapped")
+            # local header: 30 bytes + file name + extra field, then .npy file
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(file.read(4), dtype="<u2")
+            file.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            name = info.filename[:-len(".npy")]
+            if np.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=file.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
@@ -35,6 +35,7 @@ ctypedef struct IntArray:
     SIZE_t count                # current number of elements in DynamicArray
     SIZE_t capacity             # current max capacity of DynamicArray
     SIZE_t* elements            # pointer to Array with elements
+    SIZE_t* refcount            # number of arrays sharing elements (NULL if not shared)
 
 ctypedef struct NodeArray:
     SIZE_t count                # current number of elements in DynamicArray
@@ -64,8 +65,22 @@ cdef int resize_c(DynamicArray* array, SIZE_t capacity=*) nogil except -1
 
 cdef np.ndarray sizet_ptr_to_ndarray(SIZE_t* data, SIZE_t size)
 
-cdef copy_int_array(IntArray* old_array, IntArray* new_array)
-cdef copy_leaves(Leaves* old_leaves, Leaves* new_leaves)
+cdef int copy_int_array(IntArray* old_array, IntArray* new_array) nogil except -1
+cdef int copy_leaves(Leaves* old_leaves, Leaves* new_leaves) nogil except -1
+
+# copy-on-write sharing of IntArray elements
+cdef int share_int_array(IntArray* old_array, IntArray* new_array) nogil except -1
+cdef int share_leaves(Leaves* old_leaves, Leaves* new_leaves) nogil except -1
+cdef int make_int_array_private(IntArray* array) nogil except -1
+cdef void free_int_array(IntArray* array) nogil
+
+# buffer pool reusing memory of discarded trees
+cdef void* pool_malloc(size_t nbytes, size_t* nbytes_allocated) nogil except NULL
+cdef void pool_free(void* pointer, size_t nbytes) nogil
+cdef void* pool_realloc(void* pointer, size_t old_nbytes, size_t nbytes,
+                        size_t* nbytes_allocated) nogil except NULL
+cdef int pool_resize(DynamicArray* array, SIZE_t capacity=*) nogil except -1
+cdef void pool_free_array(DynamicArray* array) nogil
 
 # =============================================================================
 # Stack data structure - copied from sklearn.tree._utils
@@ -17,6 +17,11 @@ from libc.stdlib cimport free
 from libc.stdlib cimport malloc
 from libc.stdlib cimport realloc
 from libc.stdint cimport SIZE_MAX
+from libc.string cimport memcpy
+from cpython.pythread cimport PyThread_type_lock, PyThread_allocate_lock, \
+    PyThread_acquire_lock, PyThread_release_lock, WAIT_LOCK
+
+import threading
 
 import numpy as np
 cimport numpy as np
@@ -96,17 +101,19 @@ cdef inline np.ndarray sizet_ptr_to_ndarray(SIZE_t* data, SIZE_t size):
     return np.PyArray_SimpleNewFromData(1, shape, np.NPY_INTP, data).copy()
 
 
-cdef copy_int_array(IntArray* old_array, IntArray* new_array):
+cdef int copy_int_array(IntArray* old_array, IntArray* new_array) nogil except -1:
     new_array.count = 0
     new_array.capacity = 0
     new_array.elements = NULL
+    new_array.refcount = NULL
     resize_c(new_array, old_array.count)
     cdef SIZE_t i
     for i in range(old_array.count):
         new_array.elements[i] = old_array.elements[i]
     new_array.count = old_array.count
+    return 0
 
-cdef copy_leaves(Leaves* old_leaves, Leaves* new_leaves):
+cdef int copy_leaves(Leaves* old_leaves, Leaves* new_leaves) nogil except -1:
     new_leaves.count = 0
     new_leaves.capacity = 0
     new_leaves.elements = NULL
@@ -115,6 +122,295 @@ cdef copy_leaves(Leaves* old_leaves, Leaves* new_leaves):
     for i in range(old_leaves.count):
         copy_int_array(&old_leaves.elements[i], &new_leaves.elements[i])
     new_leaves.count = old_leaves.count
+    return 0
+
+
+# =============================================================================
+# Buffer pool
+# =============================================================================
+
+# Buffers of discarded trees (nodes, leaves, observations in leaves) are kept
+# in the pool and reused by new trees instead of being freed and allocated
+# again in every generation. Buffers are grouped in power-of-two size classes,
+# free buffers of each class form a linked list (pointer to the next buffer is
+# stored in the first bytes of the buffer). Pool keeps at most pool_max_size
+# bytes, buffers above this limit are freed. Pool is disabled when
+# pool_max_size == 0, then pool_malloc and pool_free are plain malloc and free.
+# The pool is shared by the whole process, so fits running at the same time
+# (e.g. in threads) register in it by acquire_buffer_pool and release_buffer_pool
+# and the pool keeps buffers until the last of them ends.
+cdef struct PoolBlock:
+    PoolBlock* next
+
+DEF N_POOL_CLASSES = 64
+cdef PoolBlock* pool_blocks[N_POOL_CLASSES]
+cdef size_t pool_size = 0
+cdef size_t pool_max_size = 0
+cdef PyThread_type_lock pool_lock = PyThread_allocate_lock()
+
+
+cdef inline int _ceil_log2(size_t n) nogil:
+    cdef int k = 0
+    while (<size_t> 1 << k) < n:
+        k += 1
+    return k
+
+
+cdef inline int _floor_log2(size_t n) nogil:
+    cdef int k = 0
+    while (<size_t> 2 << k) <= n:
+        k += 1
+    return k
+
+
+cdef void* pool_malloc(size_t nbytes, size_t* nbytes_allocated) nogil except NULL:
+    global pool_size
+    cdef int block_class
+    cdef PoolBlock* block = NULL
+    if nbytes < sizeof(PoolBlock):
+        nbytes = sizeof(PoolBlock)
+    if pool_max_size > 0:
+        block_class = _ceil_log2(nbytes)
+        nbytes = <size_t> 1 << block_class
+        PyThread_acquire_lock(pool_lock, WAIT_LOCK)
+        block = pool_blocks[block_class]
+        if block != NULL:
+            pool_blocks[block_class] = block.next
+            pool_size -= nbytes
+        PyThread_release_lock(pool_lock)
+    if block == NULL:
+        block = <PoolBlock*> malloc(nbytes)
+        if block == NULL:
+            with gil:
+                raise MemoryError("could not allocate %d bytes" % nbytes)
+    if nbytes_allocated != NULL:
+        nbytes_allocated[0] = nbytes
+    return block
+
+
+cdef void pool_free(void* pointer, size_t nbytes) nogil:
+    global pool_size
+    cdef int block_class
+    cdef PoolBlock* block = <PoolBlock*> pointer
+    if block == NULL:
+        return
+    if pool_max_size > 0 and nbytes >= sizeof(PoolBlock):
+        # buffer has at least nbytes, so it can be reused in the lower class
+        block_class = _floor_log2(nbytes)
+        PyThread_acquire_lock(pool_lock, WAIT_LOCK)
+        if pool_size + (<size_t> 1 << block_class) <= pool_max_size:
+            block.next = pool_blocks[block_class]
+            pool_blocks[block_class] = block
+            pool_size += <size_t> 1 << block_class
+            block = NULL
+        PyThread_release_lock(pool_lock)
+    free(block)
+
+
+cdef void* pool_realloc(void* pointer, size_t old_nbytes, size_t nbytes,
+                        size_t* nbytes_allocated) nogil except NULL:
+    cdef void* new_pointer = pool_malloc(nbytes, nbytes_allocated)
+    if pointer != NULL:
+        memcpy(new_pointer, pointer, old_nbytes if old_nbytes < nbytes else nbytes)
+        pool_free(pointer, old_nbytes)
+    return new_pointer
+
+
+cdef int pool_resize(DynamicArray* array, SIZE_t capacity=SIZE_MAX) nogil except -1:
+    """Like resize_c, but takes memory from the buffer pool
+    Array is never shrunk, its capacity can be greater than requested.
+    """
+    if capacity == SIZE_MAX:
+        if array[0].capacity == 0:
+            capacity = 3  # default initial value
+        else:
+            capacity = 2 * array[0].capacity
+    if capacity <= array[0].capacity and array[0].elements != NULL:
+        return 0
+
+    cdef size_t element_size = sizeof(array[0].elements[0])
+    cdef size_t nbytes
+    cdef void* elements = pool_realloc(array[0].elements,
+                                       array[0].count * element_size,
+                                       capacity * element_size, &nbytes)
+    if DynamicArray is Leaves:
+        array[0].elements = <IntArray*> elements
+    elif DynamicArray is IntArray:
+        array[0].elements = <SIZE_t*> elements
+    else:
+        array[0].elements = <Node*> elements
+    array[0].capacity = nbytes // element_size
+    return 0
+
+
+cdef void pool_free_array(DynamicArray* array) nogil:
+    pool_free(array[0].elements, array[0].capacity * sizeof(array[0].elements[0]))
+    array[0].elements = NULL
+    array[0].count = 0
+    array[0].capacity = 0
+
+
+def set_buffer_pool_size(size_t max_size):
+    """
+    Sets the high-water mark of the buffer pool (in bytes)
+
+    Buffers above the limit are freed. 0 disables the pool.
+    """
+    global pool_max_size
+    pool_max_size = max_size
+    _trim_buffer_pool()
+
+
+# high-water marks of fits using the pool at the moment
+_pool_users = []
+_pool_users_lock = threading.Lock()
+
+
+def acquire_buffer_pool(size_t max_size):
+    """
+    Registers fit using the buffer pool
+
+    The high-water mark of the pool is the largest one of running fits.
+    """
+    with _pool_users_lock:
+        _pool_users.append(max_size)
+        set_buffer_pool_size(max(_pool_users))
+
+
+def release_buffer_pool(size_t max_size):
+    """
+    Unregisters fit registered by acquire_buffer_pool with the same max_size
+
+    The pool is trimmed to the high-water mark of fits still running, so
+    buffers are freed when the last fit ends.
+    """
+    with _pool_users_lock:
+        _pool_users.remove(max_size)
+        set_buffer_pool_size(max(_pool_users, default=0))
+
+
+def get_buffer_pool_size():
+    """
+    Returns:
+        number of bytes kept in the buffer pool
+    """
+    return pool_size
+
+
+def clear_buffer_pool():
+    """
+    Frees all buffers kept in the buffer pool
+    """
+    global pool_max_size
+    cdef size_t max_size = pool_max_size
+    pool_max_size = 0
+    _trim_buffer_pool()
+    pool_max_size = max_size
+
+
+cdef void _trim_buffer_pool() nogil:
+    global pool_size
+    cdef int block_class = N_POOL_CLASSES - 1
+    cdef PoolBlock* block
+    PyThread_acquire_lock(pool_lock, WAIT_LOCK)
+    while pool_size > pool_max_size and block_class >= 0:
+        block = pool_blocks[block_class]
+        if block == NULL:
+            block_class -= 1
+            continue
+        pool_blocks[block_class] = block.next
+        pool_size -= <size_t> 1 << block_class
+        free(block)
+    PyThread_release_lock(pool_lock)
+
+
+# =============================================================================
+# Copy-on-write IntArray
+# =============================================================================
+
+# IntArray can share its elements with other IntArrays (e.g. leaves of copied
+# tree share observations with leaves of original tree). Shared arrays have
+# common refcount, elements are copied only before the first modification
+# (make_int_array_private) and freed by the last owner (free_int_array).
+# Refcounts of arrays from different trees can be changed by different
+# threads, so they are guarded by one lock (it does not need GIL).
+cdef PyThread_type_lock refcount_lock = PyThread_allocate_lock()
+
+
+cdef int share_int_array(IntArray* old_array, IntArray* new_array) nogil except -1:
+    new_array.count = old_array.count
+    new_array.capacity = old_array.capacity
+    new_array.elements = old_array.elements
+    new_array.refcount = NULL
+    if old_array.elements == NULL:
+        return 0
+
+    PyThread_acquire_lock(refcount_lock, WAIT_LOCK)
+    if old_array.refcount == NULL:
+        old_array.refcount = <SIZE_t*> malloc(sizeof(SIZE_t))
+        if old_array.refcount == NULL:
+            PyThread_release_lock(refcount_lock)
+            with gil:
+                raise MemoryError()
+        old_array.refcount[0] = 1
+    old_array.refcount[0] += 1
+    new_array.refcount = old_array.refcount
+    PyThread_release_lock(refcount_lock)
+    return 0
+
+
+cdef int share_leaves(Leaves* old_leaves, Leaves* new_leaves) nogil except -1:
+    new_leaves.count = 0
+    new_leaves.capacity = 0
+    new_leaves.elements = NULL
+    pool_resize(new_leaves, old_leaves.count)
+    cdef SIZE_t i
+    for i in range(old_leaves.count):
+        share_int_array(&old_leaves.elements[i], &new_leaves.elements[i])
+    new_leaves.count = old_leaves.count
+    return 0
+
+
+cdef int make_int_array_private(IntArray* array) nogil except -1:
+    if array.refcount == NULL:
+        return 0
+
+    cdef bint is_shared
+    PyThread_acquire_lock(refcount_lock, WAIT_LOCK)
+    is_shared = array.refcount[0] > 1
+    if not is_shared:  # other owners have already freed the array
+        free(array.refcount)
+        array.refcount = NULL
+    PyThread_release_lock(refcount_lock)
+    if not is_shared:
+        return 0
+
+    # elements are copied before releasing the shared ones, so the other
+    # owner cannot free them in the meantime
+    cdef IntArray shared_array = array[0]
+    array.elements = NULL
+    array.refcount = NULL
+    array.elements = <SIZE_t*> pool_malloc(array.capacity * sizeof(SIZE_t), NULL)
+    memcpy(array.elements, shared_array.elements, array.count * sizeof(SIZE_t))
+    free_int_array(&shared_array)
+    return 0
+
+
+cdef void free_int_array(IntArray* array) nogil:
+    cdef bint is_last = 1
+    if array.refcount != NULL:
+        PyThread_acquire_lock(refcount_lock, WAIT_LOCK)
+        array.refcount[0] -= 1
+        is_last = array.refcount[0] == 0
+        PyThread_release_lock(refcount_lock)
+        if is_last:
+            free(array.refcount)
+    if is_last:
+        pool_free(array.elements, array.capacity * sizeof(SIZE_t))
+    array.elements = NULL
+    array.refcount = NULL
+    array.count = 0
+    array.capacity = 0
 
 
 cdef IntArray _create_int_array(SIZE_t factor):
@@ -122,6 +418,7 @@ cdef IntArray _create_int_array(SIZE_t factor):
     int_array.capacity = 0
     int_array.count = 0
     int_array.elements = NULL
+    int_array.refcount = NULL
     resize_c(&int_array, 10)
     cdef SIZE_t i
     for i in range(10):
@@ -177,6 +474,52 @@ cpdef void test_copy_leaves():
     free(copied.elements)
     free(copied)
 
+cpdef void test_share_int_array():
+    cdef IntArray to_share = _create_int_array(4)
+    cdef IntArray shared
+    share_int_array(&to_share, &shared)
+    assert shared.elements == to_share.elements
+    assert shared.refcount == to_share.refcount
+    assert shared.refcount[0] == 2
+    make_int_array_private(&shared)
+    assert shared.elements != to_share.elements
+    assert shared.refcount == NULL
+    assert to_share.refcount[0] == 1
+    for i in range(10):
+        assert shared.elements[i] == to_share.elements[i]
+    make_int_array_private(&to_share)
+    assert to_share.refcount == NULL
+    free_int_array(&to_share)
+    free_int_array(&shared)
+    assert shared.elements == NULL
+cpdef void test_buffer_pool():
+    cdef size_t nbytes
+    cdef void* pointer
+    cdef IntArray array = _create_int_array(3)
+    set_buffer_pool_size(1024)
+    clear_buffer_pool()
+    pool_resize(&array, 20)
+    assert array.capacity == 32     # 160 bytes rounded to 256
+    for i in range(10):
+        assert array.elements[i] == i * 3 + 1
+    assert get_buffer_pool_size() == 64     # old 80 bytes buffer
+    pointer = pool_malloc(60, &nbytes)
+    assert nbytes == 64
+    assert pointer != NULL
+    assert get_buffer_pool_size() == 0
+    pool_free(pointer, nbytes)
+    pool_free_array(&array)
+    assert array.elements == NULL
+    assert get_buffer_pool_size() == 64 + 256
+    clear_buffer_pool()
+    assert get_buffer_pool_size() == 0
+    set_buffer_pool_size(0)
+    pointer = pool_malloc(60, &nbytes)
+    assert nbytes == 60
+    pool_free(pointer, nbytes)
+    assert get_buffer_pool_size() == 0
+
+
 # =============================================================================
 # Stack data structure - copied from sklearn.tree._utils
 # but changed to contain relevant information
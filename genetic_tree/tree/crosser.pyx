@@ -1,4 +1,5 @@
 from .tree cimport Tree, Node, copy_tree
+from .observations cimport Observations
 from ._utils cimport Stack, StackRecord
 
 from libc.stdlib cimport free
@@ -25,21 +26,37 @@ cdef struct BranchParent:
     bint is_child_left      # if first copied node should be registered as left
     SIZE_t depth_addition   # what is the depth of copied node in child tree
 
+"""
+Function to draw a seed of child that will be created by crossing
+It uses the same random state as cross_trees would use, so the seeds can be
+drawn in one thread and then trees can be crossed in many threads
+"""
+cpdef object draw_child_seed(Tree first_parent, int first_node_id):
+    if first_node_id == 0:
+        return np.random.randint(10**8)
+    return first_parent.randint(0, 10**8)
+
 """
 Function to cross 2 trees depends on first parents' node_id
 If it is 0 -> it only cut branch
 Else it crosses two trees
+Parents are not changed (only their random state is used), so they can share
+observations with other trees (see share_tree) - child gets its own observations
 """
 cpdef Tree cross_trees(Tree first_parent, Tree second_parent,
-                       int first_node_id, int second_node_id):
+                       int first_node_id, int second_node_id,
+                       object seed=None):
 
     cdef child
 
+    if seed is None:
+        seed = draw_child_seed(first_parent, first_node_id)
+
     if first_node_id == 0:
-        child = _cut_branch(second_parent, second_node_id)
+        child = _cut_branch(second_parent, second_node_id, seed)
 
     else:
-        child = copy_tree(first_parent)
+        child = copy_tree(first_parent, 0, seed)
         _cross_trees(child, first_parent.nodes.elements, second_parent.nodes.elements,
                      first_node_id, second_node_id)
 
@@ -72,16 +89,21 @@ Cut branch from parent tree induced by node_id
 Initialize observations in new created tree
 Return new tree
 """
-cdef Tree _cut_branch(Tree parent, int node_id):
+cdef Tree _cut_branch(Tree parent, int node_id, object seed):
     cdef BranchParent* result = <BranchParent*> malloc(sizeof(StackRecord))
     result[0].id = _TREE_UNDEFINED
     result[0].is_child_left = 0
     result[0].depth_addition = 0
 
-    cdef Tree child = Tree(parent.classes, parent.X, parent.y, parent.sample_weight, parent.thresholds, np.random.randint(10**8))
+    cdef Tree child = Tree(parent.classes, parent.X, parent.y, parent.sample_weight, parent.thresholds, seed,
+                           parent.flat_observations, parent.y_class_ids)
     child.depth = 0
     _copy_nodes(parent.nodes.elements, node_id, child, result)
-    child.initialize_observations()
+    child.fitness_cache = parent.fitness_cache
+    child.feature_index = parent.feature_index
+    child.observations_pending = 1    # no observations are assigned yet
+    child.racing_cut = parent.racing_cut
+    child.update_fitness(-1)
 
     free(result)
     return child
@@ -90,8 +112,9 @@ cdef Tree _cut_branch(Tree parent, int node_id):
 Function to remove nodes and observations from recipient below crossover point
 """
 cdef void _remove_parent_nodes(Tree recipient, SIZE_t crossover_point,
-                               BranchParent* result) nogil:
+                               BranchParent* result):
     cdef Node* nodes = recipient.nodes.elements
+    cdef Observations observations = recipient.observations
 
     with nogil:
         result.id = nodes[crossover_point].parent
@@ -100,19 +123,18 @@ cdef void _remove_parent_nodes(Tree recipient, SIZE_t crossover_point,
         if nodes[result.id].left_child == crossover_point:
             result.is_child_left = 1
 
-    # remove nodes and observations
-    with gil:
-        recipient.observations.remove_observations(recipient.nodes.elements, crossover_point)
+        # remove nodes and observations
+        observations.remove_observations(nodes, crossover_point)
         recipient.mark_nodes_as_removed(crossover_point)
 
 """
 Function to assign observations in tree that was previously removed
 """
-cdef void _reassign_observations(Tree child, BranchParent* branch_parent):
+cdef void _reassign_observations(Tree child, BranchParent* branch_parent) except *:
     cdef SIZE_t below_node_id = child.nodes.elements[branch_parent.id].right_child
     if branch_parent.is_child_left == 1:
         below_node_id = child.nodes.elements[branch_parent.id].left_child
-    child.observations.reassign_observations(child, below_node_id)
+    child.update_fitness(below_node_id)
 
 """
 Function copy nodes from parent to a child
@@ -52,3 +52,28 @@ cpdef SIZE_t[:] get_trees_depths(list trees):
     for i in range(len(trees)):
         trees_depths[i] = trees[i].depth
     return trees_depths
+
+
+cpdef tuple get_trees_stats(list trees):
+    """
+    Returns accuracies, depths and numbers of nodes of trees computed in one
+    pass over trees
+    """
+    cdef SIZE_t n_trees = len(trees)
+    cdef np.ndarray accuracies = np.empty(n_trees, dtype=np.float64)
+    cdef np.ndarray depths = np.empty(n_trees, dtype=np.intp)
+    cdef np.ndarray node_counts = np.empty(n_trees, dtype=np.intp)
+    cdef DOUBLE_t[:] accuracies_view = accuracies
+    cdef SIZE_t[:] depths_view = depths
+    cdef SIZE_t[:] node_counts_view = node_counts
+    cdef DTYPE_t sample_weight_sum
+    cdef int i
+    cdef Tree tree
+    if n_trees > 0:
+        sample_weight_sum = np.sum(trees[0].sample_weight)
+    for i in range(n_trees):
+        tree = trees[i]
+        accuracies_view[i] = tree.proper_classified / sample_weight_sum
+        depths_view[i] = tree.depth
+        node_counts_view[i] = tree.nodes.count
+    return accuracies, depths, node_counts
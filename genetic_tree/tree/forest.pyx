@@ -0,0 +1,817 @@
+# cython: cdivision=True
+# cython: boundscheck=False
+# cython: wraparound=False
+
+from functools import partial
+
+from libc.string cimport memcpy
+
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+from ._utils cimport Node
+from .tree cimport Tree
+from .tree import NODE_DTYPE, TREE_LEAF, get_y_class_ids, initialize_observations_of_trees
+from .observations cimport LeafFinder
+from ..genetic.parallel import get_n_threads, map_in_threads
+
+ctypedef np.npy_float32 DTYPE_t         # Type of X
+ctypedef np.npy_float64 DOUBLE_t        # Type of thresholds and proper_classified
+ctypedef np.npy_intp SIZE_t             # Type for indices and counters
+ctypedef np.npy_uint32 UINT32_t         # Type for observations ids in samples
+ctypedef np.npy_uint64 UINT64_t         # Type for random generator JKISS
+ctypedef np.npy_uint8 UINT8_t           # Type of rejected flags
+
+cdef SIZE_t _TREE_LEAF = TREE_LEAF
+
+# the same as initial seeds of Tree (seed1 is drawn)
+cdef UINT64_t SEED2 = 987654321
+cdef UINT64_t SEED3 = 43219876
+cdef UINT64_t SEED4 = 6543217
+
+# kinds of mutations of batch kernel (each is the same as mutation function
+# with the same name in tree.mutator)
+cdef enum:
+    _MUTATE_RANDOM_NODE = 0
+    _MUTATE_CLASS = 1
+    _MUTATE_THRESHOLD = 2
+    _MUTATE_FEATURE = 3
+    _MUTATE_CLASS_OR_THRESHOLD = 4
+
+MUTATE_RANDOM_NODE = _MUTATE_RANDOM_NODE
+MUTATE_CLASS = _MUTATE_CLASS
+MUTATE_THRESHOLD = _MUTATE_THRESHOLD
+MUTATE_FEATURE = _MUTATE_FEATURE
+MUTATE_CLASS_OR_THRESHOLD = _MUTATE_CLASS_OR_THRESHOLD
+
+
+"""
+State of assigning observations to one tree, assigning is stopped when the
+tree cannot reach racing_cut (0 - no racing)
+"""
+cdef struct Race:
+    DOUBLE_t proper_classified
+    DOUBLE_t weight_to_assign
+    DOUBLE_t racing_cut
+
+
+# it is the same JKISS generator as Tree.randint_c, seeds are 4 consecutive
+# elements of Forest.seeds
+cdef inline SIZE_t _randint(UINT64_t* seeds, SIZE_t lb, SIZE_t ub) nogil:
+    cdef UINT64_t temp
+    seeds[0] = 314527869 * seeds[0] + 1234567
+    seeds[1] ^= seeds[1] << 5
+    seeds[1] ^= seeds[1] >> 7
+    seeds[1] ^= seeds[1] << 22
+    temp = 4294584393ULL * seeds[2] + seeds[3]
+    seeds[3] = temp >> 32
+    seeds[2] = temp
+    return lb + (seeds[0] + seeds[1] + seeds[2]) % (ub - lb)
+
+
+cdef inline SIZE_t _subtree_end(Node* nodes, SIZE_t node_id) nogil:
+    # nodes are in preorder, so the subtree ends after its rightmost leaf
+    while nodes[node_id].left_child != _TREE_LEAF:
+        node_id = nodes[node_id].right_child
+    return node_id + 1
+
+
+cdef void _copy_in_preorder(Node* source, SIZE_t n_nodes, Node* target, SIZE_t* stack, SIZE_t* new_ids) nogil:
+    cdef SIZE_t top = 1
+    cdef SIZE_t n_visited = 0
+    cdef SIZE_t node_id
+    stack[0] = 0
+    while top > 0:
+        top -= 1
+        node_id = stack[top]
+        new_ids[node_id] = n_visited
+        n_visited += 1
+        if source[node_id].left_child != _TREE_LEAF:
+            stack[top] = source[node_id].right_child
+            stack[top + 1] = source[node_id].left_child
+            top += 2
+
+    for node_id in range(n_nodes):
+        target[new_ids[node_id]] = source[node_id]
+        if source[node_id].left_child == _TREE_LEAF:
+            target[new_ids[node_id]].right_child = _TREE_LEAF
+        else:
+            target[new_ids[node_id]].left_child = new_ids[source[node_id].left_child]
+            target[new_ids[node_id]].right_child = new_ids[source[node_id].right_child]
+        if source[node_id].parent >= 0:
+            target[new_ids[node_id]].parent = new_ids[source[node_id].parent]
+
+
+def _map_in_blocks(function, SIZE_t n_trees, int n_jobs):
+    # trees are split into blocks of consecutive indices, one for each thread
+    n_blocks = min(get_n_threads(n_jobs), n_trees)
+    if n_blocks <= 1:
+        function((0, n_trees))
+        return
+    bounds = np.linspace(0, n_trees, n_blocks + 1).astype(np.intp).tolist()
+    map_in_threads(function, list(zip(bounds[:n_blocks], bounds[1:])), n_jobs)
+
+
+cdef class Forest:
+    """
+    Population of trees kept as struct of arrays. Nodes of all trees are in
+    one contiguous array with NODE_DTYPE and nodes of tree i are
+    nodes[offsets[i]:offsets[i + 1]] in preorder (ids of children are
+    relative to the start of the tree), so each subtree is one range of
+    nodes. Random state (JKISS seeds as in Tree) of tree i is seeds[i].
+
+    After assign_observations the Forest also keeps leaf memberships of all
+    trees in one buffer of observations ids: samples of tree i are
+    samples[i * n_observations:(i + 1) * n_observations] and node j of tree
+    has its observations in range [starts[j], ends[j]) of them (subtrees are
+    contiguous as in FlatObservations). It takes as much memory as
+    observations of population of Trees, but without allocations and Python
+    objects for each tree. Batch kernels (take, mutate, cross) work on index
+    ranges of these arrays without GIL, so the genetic algorithm does not
+    need Tree objects during fit. Trees are created from Forest (to_trees)
+    only to predict or to keep last population.
+
+    Args:
+        nodes: array with NODE_DTYPE with nodes of all trees
+        offsets: array with n_trees + 1 starts of trees in nodes
+        seeds: array [n_trees x 4] with random state of each tree (None \
+        means default seeds)
+    """
+    cdef readonly np.ndarray nodes
+    cdef readonly np.ndarray offsets
+    cdef readonly np.ndarray seeds
+
+    # leaf memberships (None until observations are assigned)
+    cdef readonly np.ndarray samples
+    cdef readonly np.ndarray starts
+    cdef readonly np.ndarray ends
+    cdef readonly np.ndarray proper_classified
+    cdef readonly np.ndarray rejected
+
+    # data memberships are found for (shared by forests created from it)
+    cdef readonly object X
+    cdef readonly np.ndarray y
+    cdef readonly np.ndarray sample_weight
+    cdef readonly np.ndarray thresholds
+    cdef readonly np.ndarray classes
+    cdef readonly SIZE_t n_observations
+    cdef SIZE_t n_features
+    cdef SIZE_t n_thresholds
+    cdef SIZE_t n_classes
+    cdef DOUBLE_t sample_weight_sum
+    cdef LeafFinder leaf_finder
+    cdef SIZE_t* y_ptr
+    cdef DTYPE_t* sample_weight_ptr
+    cdef DTYPE_t* thresholds_ptr
+    cdef SIZE_t* classes_ptr
+
+    def __init__(self, nodes=None, offsets=None, seeds=None):
+        if nodes is None:
+            nodes = np.empty(0, dtype=NODE_DTYPE)
+        if offsets is None:
+            offsets = np.zeros(1, dtype=np.intp)
+        nodes = np.ascontiguousarray(nodes)
+        offsets = np.ascontiguousarray(offsets, dtype=np.intp)
+        if nodes.ndim != 1 or nodes.dtype != NODE_DTYPE:
+            raise ValueError('Did not recognise nodes array layout')
+        if (offsets.ndim != 1 or offsets.shape[0] == 0 or offsets[0] != 0 or
+                offsets[offsets.shape[0] - 1] != nodes.shape[0] or np.any(np.diff(offsets) <= 0)):
+            raise ValueError('Offsets do not match nodes array')
+        if seeds is None:
+            seeds = np.empty((offsets.shape[0] - 1, 4), dtype=np.uint64)
+            seeds[:, 0] = np.arange(offsets.shape[0] - 1)
+            seeds[:, 1:] = [SEED2, SEED3, SEED4]
+        seeds = np.ascontiguousarray(seeds, dtype=np.uint64)
+        if seeds.shape != (offsets.shape[0] - 1, 4):
+            raise ValueError('Seeds do not match number of trees')
+        self.nodes = nodes
+        self.offsets = offsets
+        self.seeds = seeds
+
+    @staticmethod
+    def from_trees(list trees):
+        """
+        Copies nodes and random state of trees. Nodes are ordered in preorder
+        and in leaves right_child (pointing to observations during fit) is set
+        to TREE_LEAF as in Tree.export_nodes.
+
+        Args:
+            trees: list of trees
+
+        Returns:
+            Forest with nodes of trees
+        """
+        cdef SIZE_t n_trees = len(trees)
+        cdef np.ndarray offsets = np.zeros(n_trees + 1, dtype=np.intp)
+        cdef SIZE_t[:] offsets_view = offsets
+        cdef np.ndarray seeds = np.empty((n_trees, 4), dtype=np.uint64)
+        cdef UINT64_t[:, :] seeds_view = seeds
+        cdef SIZE_t i
+        cdef SIZE_t max_count = 0
+        cdef Tree tree
+        for i in range(n_trees):
+            tree = trees[i]
+            offsets_view[i + 1] = offsets_view[i] + tree.nodes.count
+            max_count = max(max_count, tree.nodes.count)
+            seeds_view[i, 0] = tree.seed1
+            seeds_view[i, 1] = tree.seed2
+            seeds_view[i, 2] = tree.seed3
+            seeds_view[i, 3] = tree.seed4
+
+        cdef np.ndarray nodes = np.empty(offsets_view[n_trees], dtype=NODE_DTYPE)
+        cdef Node* nodes_ptr = <Node*> nodes.data
+        cdef np.ndarray stack = np.empty(max_count + 1, dtype=np.intp)
+        cdef np.ndarray new_ids = np.empty(max_count + 1, dtype=np.intp)
+        for i in range(n_trees):
+            tree = trees[i]
+            _copy_in_preorder(tree.nodes.elements, tree.nodes.count, &nodes_ptr[offsets_view[i]],
+                              <SIZE_t*> stack.data, <SIZE_t*> new_ids.data)
+        return Forest(nodes, offsets, seeds)
+
+    @staticmethod
+    def concatenate(list forests):
+        """
+        Leaf memberships are concatenated only if all forests have them.
+
+        Returns:
+            Forest with trees of all forests (in order of forests)
+        """
+        if len(forests) == 0:
+            return Forest()
+        nodes = np.concatenate([forest.nodes for forest in forests])
+        sizes = np.concatenate([forest.node_counts for forest in forests])
+        offsets = np.zeros(sizes.shape[0] + 1, dtype=np.intp)
+        np.cumsum(sizes, out=offsets[1:])
+        seeds = np.concatenate([forest.seeds for forest in forests])
+        cdef Forest result = Forest(nodes, offsets, seeds)
+        cdef Forest first = forests[0]
+        if all(forest.samples is not None for forest in forests):
+            result._set_data_of(first)
+            result.samples = np.concatenate([forest.samples for forest in forests])
+            result.starts = np.concatenate([forest.starts for forest in forests])
+            result.ends = np.concatenate([forest.ends for forest in forests])
+            result.proper_classified = np.concatenate([forest.proper_classified for forest in forests])
+            result.rejected = np.concatenate([forest.rejected for forest in forests])
+        return result
+
+    def __reduce__(self):
+        # as trees, forest is never pickled with observations
+        return (Forest, (self.nodes, self.offsets, self.seeds))
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, SIZE_t index):
+        """
+        Returns:
+            view of nodes of tree with index (can be loaded by Tree.load_nodes)
+        """
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Forest index out of range")
+        return self.nodes[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def node_counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def depths(self) -> np.ndarray:
+        if len(self) == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.maximum.reduceat(self.nodes['depth'], self.offsets[:len(self)])
+
+    @property
+    def accuracies(self) -> np.ndarray:
+        """
+        Returns:
+            weighted accuracy of each tree (observations have to be assigned)
+        """
+        return self.proper_classified / self.sample_weight_sum
+
+    def take(self, indices, bint draw_seeds=0):
+        """
+        Copies trees with indices (they can repeat) to new Forest
+
+        Args:
+            indices: indices of trees
+            draw_seeds: if copied trees should get new random state drawn \
+            from random state of trees (as copy_tree) instead of the same
+
+        Returns:
+            Forest with copied trees (and their observations) in order of indices
+        """
+        indices = np.ascontiguousarray(indices, dtype=np.intp)
+        starts = self.offsets[indices]
+        sizes = self.offsets[indices + 1] - starts
+        offsets = np.zeros(indices.shape[0] + 1, dtype=np.intp)
+        np.cumsum(sizes, out=offsets[1:])
+        # id of each copied node in self.nodes
+        n_trees = indices.shape[0]
+        node_ids = np.arange(offsets[n_trees], dtype=np.intp) + np.repeat(starts - offsets[:n_trees], sizes)
+        seeds = self._draw_seeds(indices) if draw_seeds else self.seeds[indices]
+        cdef Forest result = Forest(self.nodes[node_ids], offsets, seeds)
+        if self.samples is not None:
+            result._set_data_of(self)
+            result.samples = self.samples.reshape(-1, self.n_observations)[indices].reshape(-1)
+            result.starts = self.starts[node_ids]
+            result.ends = self.ends[node_ids]
+            result.proper_classified = self.proper_classified[indices]
+            result.rejected = self.rejected[indices]
+        return result
+
+    cdef np.ndarray _draw_seeds(self, np.ndarray indices):
+        cdef SIZE_t n_trees = indices.shape[0]
+        cdef SIZE_t* indices_ptr = <SIZE_t*> indices.data
+        cdef UINT64_t* seeds = <UINT64_t*> self.seeds.data
+        cdef np.ndarray new_seeds = np.empty((n_trees, 4), dtype=np.uint64)
+        cdef UINT64_t* new_seeds_ptr = <UINT64_t*> new_seeds.data
+        cdef SIZE_t i
+        for i in range(n_trees):
+            new_seeds_ptr[4 * i] = _randint(&seeds[4 * indices_ptr[i]], 0, 10**8)
+            new_seeds_ptr[4 * i + 1] = SEED2
+            new_seeds_ptr[4 * i + 2] = SEED3
+            new_seeds_ptr[4 * i + 3] = SEED4
+        return new_seeds
+
+    def to_trees(self, X, y, sample_weight, thresholds, int n_jobs=1, bint flat_observations=0):
+        """
+        Creates trees from nodes of Forest and assigns observations to them.
+        Each tree gets seed drawn from numpy random generator.
+
+        Args:
+            X: dataset to train model on as matrix of shape [n_observations x n_features]
+            y: proper class of each observation as vector of shape [n_observations]
+            sample_weight: a weight of each observation
+            thresholds: array of thresholds for particular dataset
+            n_jobs: number of threads used to assign observations
+            flat_observations: if trees should keep observations in FlatObservations
+
+        Returns:
+            list of trees
+        """
+        classes = np.unique(y)
+        y_class_ids = get_y_class_ids(classes, y)
+        trees = []
+        for i in range(len(self)):
+            tree: Tree = Tree(classes, X, y, sample_weight, thresholds, np.random.randint(10 ** 8),
+                              flat_observations, y_class_ids)
+            tree.load_nodes(self[i])
+            trees.append(tree)
+        initialize_observations_of_trees(trees, n_jobs)
+        return trees
+
+# ===========================================================================================================
+# Leaf memberships
+# ===========================================================================================================
+
+    def assign_observations(self, X, y, sample_weight, thresholds, int n_jobs=1):
+        """
+        Assigns all observations to leaves of all trees (in blocks of trees
+        without GIL in threads). Forests created from this Forest by batch
+        kernels use the same data.
+
+        Args:
+            X: dataset of type float32 (dense or sparse)
+            y: proper class of each observation
+            sample_weight: a weight of each observation
+            thresholds: array of thresholds for particular dataset
+            n_jobs: number of threads
+        """
+        if X.shape[0] > 0xFFFFFFFF:
+            raise ValueError("Forest supports at most 2^32 observations")
+        self.X = X
+        self.y = np.ascontiguousarray(y, dtype=np.intp)
+        self.sample_weight = np.ascontiguousarray(sample_weight, dtype=np.float32)
+        self.thresholds = np.ascontiguousarray(thresholds, dtype=np.float32)
+        self.classes = np.unique(self.y)
+        self.n_observations = X.shape[0]
+        self.n_features = X.shape[1]
+        self.n_thresholds = self.thresholds.shape[0]
+        self.n_classes = self.classes.shape[0]
+        self.sample_weight_sum = np.sum(self.sample_weight)
+        self.leaf_finder = LeafFinder(X)
+        self._set_data_of(self)
+
+        cdef SIZE_t n_trees = len(self)
+        self.samples = np.empty(n_trees * self.n_observations, dtype=np.uint32)
+        self.starts = np.empty(self.nodes.shape[0], dtype=np.intp)
+        self.ends = np.empty(self.nodes.shape[0], dtype=np.intp)
+        self.proper_classified = np.zeros(n_trees, dtype=np.float64)
+        self.rejected = np.zeros(n_trees, dtype=np.uint8)
+        _map_in_blocks(self._assign_block, n_trees, n_jobs)
+
+    cdef void _set_data_of(self, Forest forest):
+        self.X = forest.X
+        self.y = forest.y
+        self.sample_weight = forest.sample_weight
+        self.thresholds = forest.thresholds
+        self.classes = forest.classes
+        self.n_observations = forest.n_observations
+        self.n_features = forest.n_features
+        self.n_thresholds = forest.n_thresholds
+        self.n_classes = forest.n_classes
+        self.sample_weight_sum = forest.sample_weight_sum
+        self.leaf_finder = forest.leaf_finder
+        self.y_ptr = <SIZE_t*> self.y.data
+        self.sample_weight_ptr = <DTYPE_t*> self.sample_weight.data
+        self.thresholds_ptr = <DTYPE_t*> self.thresholds.data
+        self.classes_ptr = <SIZE_t*> self.classes.data
+
+    cdef void _check_observations(self) except *:
+        if self.samples is None:
+            raise ValueError("Observations are not assigned to Forest")
+
+    def _assign_block(self, block):
+        cdef Node* nodes = <Node*> self.nodes.data
+        cdef SIZE_t* offsets = <SIZE_t*> self.offsets.data
+        cdef UINT32_t* samples = <UINT32_t*> self.samples.data
+        cdef SIZE_t* starts = <SIZE_t*> self.starts.data
+        cdef SIZE_t* ends = <SIZE_t*> self.ends.data
+        cdef DOUBLE_t* proper_classified = <DOUBLE_t*> self.proper_classified.data
+        cdef SIZE_t n_observations = self.n_observations
+        cdef SIZE_t start = block[0]
+        cdef SIZE_t end = block[1]
+        cdef SIZE_t i, y_id
+        cdef Race race
+        with nogil:
+            for i in range(start, end):
+                for y_id in range(n_observations):
+                    samples[i * n_observations + y_id] = y_id
+                race.proper_classified = 0
+                race.weight_to_assign = self.sample_weight_sum
+                race.racing_cut = 0
+                self._partition(&samples[i * n_observations], &nodes[offsets[i]], &starts[offsets[i]],
+                                &ends[offsets[i]], 0, 0, n_observations, &race)
+                proper_classified[i] = race.proper_classified
+
+    cdef int _partition(self, UINT32_t* samples, Node* nodes, SIZE_t* starts, SIZE_t* ends,
+                        SIZE_t node_id, SIZE_t start, SIZE_t end, Race* race) nogil:
+        """
+        Partitions samples in range [start, end) between leaves below node_id
+        (as FlatObservations) and adds proper classified observations to race.
+        Returns 1 if the tree cannot reach racing_cut (assigning is stopped).
+        """
+        cdef SIZE_t i
+        cdef SIZE_t j
+        cdef SIZE_t feature
+        cdef DOUBLE_t threshold
+        cdef UINT32_t y_id
+        starts[node_id] = start
+        ends[node_id] = end
+
+        if nodes[node_id].left_child == _TREE_LEAF:
+            for i in range(start, end):
+                y_id = samples[i]
+                race.weight_to_assign -= self.sample_weight_ptr[y_id]
+                if self.y_ptr[y_id] == nodes[node_id].feature:   # feature means class
+                    race.proper_classified += self.sample_weight_ptr[y_id]
+            return race.racing_cut > 0 and race.proper_classified + race.weight_to_assign < race.racing_cut
+
+        # observations going to left child are moved to the beginning of range
+        feature = nodes[node_id].feature
+        threshold = nodes[node_id].threshold
+        i = start
+        j = end
+        while i < j:
+            if self.leaf_finder.get_value(samples[i], feature) <= threshold:
+                i += 1
+            else:
+                j -= 1
+                y_id = samples[i]
+                samples[i] = samples[j]
+                samples[j] = y_id
+
+        if self._partition(samples, nodes, starts, ends, nodes[node_id].left_child, start, i, race) == 1:
+            return 1
+        return self._partition(samples, nodes, starts, ends, nodes[node_id].right_child, i, end, race)
+
+    cdef void _remove_subtree(self, UINT32_t* samples, Node* nodes, SIZE_t* starts, SIZE_t* ends,
+                              SIZE_t node_id, Race* race) nogil:
+        # observations of subtree are removed from proper_classified and have
+        # to be assigned again (leaves of subtree are its range of nodes)
+        cdef SIZE_t leaf_id, i
+        cdef UINT32_t y_id
+        for leaf_id in range(node_id, _subtree_end(nodes, node_id)):
+            if nodes[leaf_id].left_child != _TREE_LEAF:
+                continue
+            for i in range(starts[leaf_id], ends[leaf_id]):
+                y_id = samples[i]
+                race.weight_to_assign += self.sample_weight_ptr[y_id]
+                if self.y_ptr[y_id] == nodes[leaf_id].feature:
+                    race.proper_classified -= self.sample_weight_ptr[y_id]
+
+# ===========================================================================================================
+# Mutation
+# ===========================================================================================================
+
+    def mutate(self, indices, int kind=_MUTATE_RANDOM_NODE, DOUBLE_t racing_cut=0,
+               int n_jobs=1, bint in_place=0):
+        """
+        Batch kernel that mutates trees with indices (in blocks of trees
+        without GIL in threads). Each tree uses its own random state, so the
+        result does not depend on n_jobs.
+
+        Args:
+            indices: unique indices of trees to mutate
+            kind: one of MUTATE_* constants
+            racing_cut: mutated tree is rejected if it cannot reach this \
+            proper_classified (0 means no racing)
+            n_jobs: number of threads
+            in_place: if trees should be mutated in place instead of copies
+
+        Returns:
+            Forest with mutated copies of trees (or self if in_place)
+        """
+        self._check_observations()
+        cdef Forest result = self
+        indices = np.ascontiguousarray(indices, dtype=np.intp)
+        if in_place:
+            racing_cut = 0
+        else:
+            result = self.take(indices, draw_seeds=True)
+            indices = np.arange(indices.shape[0], dtype=np.intp)
+        _map_in_blocks(partial(result._mutate_block, indices, kind, racing_cut), indices.shape[0], n_jobs)
+        return result
+
+    def _mutate_block(self, np.ndarray indices, int kind, DOUBLE_t racing_cut, block):
+        cdef Node* nodes = <Node*> self.nodes.data
+        cdef SIZE_t* offsets = <SIZE_t*> self.offsets.data
+        cdef UINT64_t* seeds = <UINT64_t*> self.seeds.data
+        cdef UINT32_t* samples = <UINT32_t*> self.samples.data
+        cdef SIZE_t* starts = <SIZE_t*> self.starts.data
+        cdef SIZE_t* ends = <SIZE_t*> self.ends.data
+        cdef DOUBLE_t* proper_classified = <DOUBLE_t*> self.proper_classified.data
+        cdef UINT8_t* rejected = <UINT8_t*> self.rejected.data
+        cdef SIZE_t* indices_ptr = <SIZE_t*> indices.data
+        cdef SIZE_t start = block[0]
+        cdef SIZE_t end = block[1]
+        cdef SIZE_t k, i
+        cdef Race race
+        with nogil:
+            for k in range(start, end):
+                i = indices_ptr[k]
+                race.proper_classified = proper_classified[i]
+                race.weight_to_assign = 0
+                race.racing_cut = racing_cut
+                rejected[i] = self._mutate_tree(&samples[i * self.n_observations], &nodes[offsets[i]],
+                                                offsets[i + 1] - offsets[i], &starts[offsets[i]],
+                                                &ends[offsets[i]], &seeds[4 * i], kind, &race)
+                proper_classified[i] = race.proper_classified
+
+    cdef int _mutate_tree(self, UINT32_t* samples, Node* nodes, SIZE_t n_nodes, SIZE_t* starts,
+                          SIZE_t* ends, UINT64_t* seeds, int kind, Race* race) nogil:
+        cdef SIZE_t node_id
+        if kind == _MUTATE_RANDOM_NODE or kind == _MUTATE_CLASS_OR_THRESHOLD:
+            node_id = _randint(seeds, 0, n_nodes)
+            if nodes[node_id].left_child == _TREE_LEAF:
+                self._mutate_class(samples, nodes, starts, ends, seeds, node_id, race)
+                return 0
+            return self._mutate_threshold(samples, nodes, starts, ends, seeds, node_id,
+                                          kind == _MUTATE_RANDOM_NODE, race)
+
+        if kind == _MUTATE_CLASS:
+            node_id = _randint(seeds, 0, n_nodes)
+            while nodes[node_id].left_child != _TREE_LEAF:
+                node_id = _randint(seeds, 0, n_nodes)
+            self._mutate_class(samples, nodes, starts, ends, seeds, node_id, race)
+            return 0
+
+        if n_nodes <= 1:  # there is only one leaf
+            return 0
+        node_id = _randint(seeds, 0, n_nodes)
+        while nodes[node_id].left_child == _TREE_LEAF:
+            node_id = _randint(seeds, 0, n_nodes)
+        return self._mutate_threshold(samples, nodes, starts, ends, seeds, node_id,
+                                      kind == _MUTATE_FEATURE, race)
+
+    cdef int _mutate_threshold(self, UINT32_t* samples, Node* nodes, SIZE_t* starts, SIZE_t* ends,
+                               UINT64_t* seeds, SIZE_t node_id, bint change_feature, Race* race) nogil:
+        cdef SIZE_t feature = nodes[node_id].feature
+        cdef SIZE_t new_feature
+        cdef SIZE_t threshold_index
+        cdef bint feature_changed = 0
+        if change_feature and self.n_features > 1:
+            new_feature = _randint(seeds, 0, self.n_features - 1)
+            if new_feature >= feature:
+                new_feature += 1
+            feature = new_feature
+            feature_changed = 1
+
+        if feature_changed:
+            threshold_index = _randint(seeds, 0, self.n_thresholds)
+        else:
+            if self.n_thresholds <= 1:  # there is no other threshold
+                return 0
+            threshold_index = _randint(seeds, 0, self.n_thresholds - 1)
+            if self.thresholds_ptr[threshold_index * self.n_features + feature] >= nodes[node_id].threshold:
+                threshold_index += 1
+
+        nodes[node_id].feature = feature
+        nodes[node_id].threshold = self.thresholds_ptr[threshold_index * self.n_features + feature]
+        self._remove_subtree(samples, nodes, starts, ends, node_id, race)
+        return self._partition(samples, nodes, starts, ends, node_id, starts[node_id], ends[node_id], race)
+
+    cdef void _mutate_class(self, UINT32_t* samples, Node* nodes, SIZE_t* starts, SIZE_t* ends,
+                            UINT64_t* seeds, SIZE_t node_id, Race* race) nogil:
+        # observations stay in the leaf, only proper_classified is updated
+        cdef SIZE_t old_class = nodes[node_id].feature
+        cdef SIZE_t class_index
+        cdef SIZE_t new_class
+        cdef SIZE_t i
+        cdef UINT32_t y_id
+        if self.n_classes <= 1:
+            return
+        class_index = _randint(seeds, 0, self.n_classes - 1)
+        if self.classes_ptr[class_index] >= old_class:
+            class_index += 1
+        new_class = self.classes_ptr[class_index]
+        for i in range(starts[node_id], ends[node_id]):
+            y_id = samples[i]
+            if self.y_ptr[y_id] == old_class:
+                race.proper_classified -= self.sample_weight_ptr[y_id]
+            elif self.y_ptr[y_id] == new_class:
+                race.proper_classified += self.sample_weight_ptr[y_id]
+        nodes[node_id].feature = new_class
+
+# ===========================================================================================================
+# Crossing
+# ===========================================================================================================
+
+    def cross(self, first_parents, second_parents, bint cross_both=1, DOUBLE_t racing_cut=0, int n_jobs=1):
+        """
+        Batch kernel that crosses pairs of trees. Child of pair replaces
+        subtree of random node of the first parent by subtree of random node
+        of the second parent (when the node of the first parent is the root,
+        child is subtree of the second parent as in cut branch). Random nodes
+        and seeds of children are drawn from parents random states in one
+        thread, then children are created in blocks without GIL in threads.
+        Child copies observations of first parent and assigns again only the
+        observations of the replaced subtree.
+
+        Args:
+            first_parents: indices of first parents
+            second_parents: indices of second parents
+            cross_both: if second parent should be also crossed with the first
+            racing_cut: child is rejected if it cannot reach this \
+            proper_classified (0 means no racing)
+            n_jobs: number of threads
+
+        Returns:
+            Forest with children
+        """
+        self._check_observations()
+        first_parents = np.ascontiguousarray(first_parents, dtype=np.intp)
+        second_parents = np.ascontiguousarray(second_parents, dtype=np.intp)
+        cdef SIZE_t n_crossings = first_parents.shape[0]
+        cdef SIZE_t n_children = n_crossings * (2 if cross_both else 1)
+        cdef SIZE_t[:] first_view = first_parents
+        cdef SIZE_t[:] second_view = second_parents
+        cdef Node* nodes = <Node*> self.nodes.data
+        cdef SIZE_t* offsets = <SIZE_t*> self.offsets.data
+        cdef UINT64_t* seeds = <UINT64_t*> self.seeds.data
+
+        # recipient (first parent of child), donor, their nodes and size of child
+        cdef np.ndarray crossings = np.empty((n_children, 4), dtype=np.intp)
+        cdef SIZE_t[:, :] crossings_view = crossings
+        cdef np.ndarray offsets_children = np.zeros(n_children + 1, dtype=np.intp)
+        cdef SIZE_t[:] offsets_children_view = offsets_children
+        cdef np.ndarray seeds_children = np.empty((n_children, 4), dtype=np.uint64)
+        cdef UINT64_t[:, :] seeds_children_view = seeds_children
+        cdef SIZE_t i, j, first, second, first_node_id, second_node_id
+        j = 0
+        for i in range(n_crossings):
+            first = first_view[i]
+            second = second_view[i]
+            first_node_id = _randint(&seeds[4 * first], 0, offsets[first + 1] - offsets[first])
+            second_node_id = _randint(&seeds[4 * second], 0, offsets[second + 1] - offsets[second])
+            self._plan_child(crossings_view, seeds_children_view, j, first, second, first_node_id, second_node_id)
+            j += 1
+            if cross_both:
+                self._plan_child(crossings_view, seeds_children_view, j, second, first, second_node_id,
+                                 first_node_id)
+                j += 1
+        for j in range(n_children):
+            first = crossings_view[j, 0]
+            second = crossings_view[j, 1]
+            offsets_children_view[j + 1] = (
+                offsets_children_view[j] + offsets[first + 1] - offsets[first] -
+                (_subtree_end(&nodes[offsets[first]], crossings_view[j, 2]) - crossings_view[j, 2]) +
+                (_subtree_end(&nodes[offsets[second]], crossings_view[j, 3]) - crossings_view[j, 3]))
+
+        cdef Forest children = Forest(np.empty(offsets_children_view[n_children], dtype=NODE_DTYPE),
+                                      offsets_children, seeds_children)
+        children._set_data_of(self)
+        children.samples = np.empty(n_children * self.n_observations, dtype=np.uint32)
+        children.starts = np.empty(children.nodes.shape[0], dtype=np.intp)
+        children.ends = np.empty(children.nodes.shape[0], dtype=np.intp)
+        children.proper_classified = np.zeros(n_children, dtype=np.float64)
+        children.rejected = np.zeros(n_children, dtype=np.uint8)
+        _map_in_blocks(partial(self._cross_block, children, crossings, racing_cut), n_children, n_jobs)
+        return children
+
+    cdef void _plan_child(self, SIZE_t[:, :] crossings, UINT64_t[:, :] seeds_children, SIZE_t j,
+                          SIZE_t first, SIZE_t second, SIZE_t first_node_id, SIZE_t second_node_id):
+        # seed of child is drawn as in draw_child_seed
+        cdef UINT64_t* seeds = <UINT64_t*> self.seeds.data
+        crossings[j, 0] = first
+        crossings[j, 1] = second
+        crossings[j, 2] = first_node_id
+        crossings[j, 3] = second_node_id
+        if first_node_id == 0:
+            seeds_children[j, 0] = np.random.randint(10**8)
+        else:
+            seeds_children[j, 0] = _randint(&seeds[4 * first], 0, 10**8)
+        seeds_children[j, 1] = SEED2
+        seeds_children[j, 2] = SEED3
+        seeds_children[j, 3] = SEED4
+
+    def _cross_block(self, Forest children, np.ndarray crossings, DOUBLE_t racing_cut, block):
+        cdef Node* nodes = <Node*> self.nodes.data
+        cdef SIZE_t* offsets = <SIZE_t*> self.offsets.data
+        cdef UINT32_t* samples = <UINT32_t*> self.samples.data
+        cdef SIZE_t* starts = <SIZE_t*> self.starts.data
+        cdef SIZE_t* ends = <SIZE_t*> self.ends.data
+        cdef DOUBLE_t* proper_classified = <DOUBLE_t*> self.proper_classified.data
+        cdef Node* children_nodes = <Node*> children.nodes.data
+        cdef SIZE_t* children_offsets = <SIZE_t*> children.offsets.data
+        cdef UINT32_t* children_samples = <UINT32_t*> children.samples.data
+        cdef SIZE_t* children_starts = <SIZE_t*> children.starts.data
+        cdef SIZE_t* children_ends = <SIZE_t*> children.ends.data
+        cdef DOUBLE_t* children_proper_classified = <DOUBLE_t*> children.proper_classified.data
+        cdef UINT8_t* children_rejected = <UINT8_t*> children.rejected.data
+        cdef SIZE_t[:, :] crossings_view = crossings
+        cdef SIZE_t n_observations = self.n_observations
+        cdef SIZE_t start = block[0]
+        cdef SIZE_t end = block[1]
+        cdef SIZE_t j, first, second, child_start
+        cdef Race race
+        with nogil:
+            for j in range(start, end):
+                first = crossings_view[j, 0]
+                second = crossings_view[j, 1]
+                child_start = children_offsets[j]
+                memcpy(&children_samples[j * n_observations], &samples[first * n_observations],
+                       n_observations * sizeof(UINT32_t))
+                race.proper_classified = proper_classified[first]
+                race.weight_to_assign = 0
+                race.racing_cut = racing_cut
+                children_rejected[j] = self._cross_trees(
+                    &children_samples[j * n_observations], &children_nodes[child_start],
+                    &children_starts[child_start], &children_ends[child_start],
+                    &nodes[offsets[first]], offsets[first + 1] - offsets[first],
+                    &starts[offsets[first]], &ends[offsets[first]], &nodes[offsets[second]],
+                    crossings_view[j, 2], crossings_view[j, 3], &race)
+                children_proper_classified[j] = race.proper_classified
+
+    cdef int _cross_trees(self, UINT32_t* samples, Node* child, SIZE_t* child_starts, SIZE_t* child_ends,
+                          Node* first, SIZE_t n_first, SIZE_t* first_starts, SIZE_t* first_ends,
+                          Node* second, SIZE_t first_node_id, SIZE_t second_node_id, Race* race) nogil:
+        """
+        Creates child from nodes of first parent before and after subtree of
+        first_node_id with subtree of second_node_id of second parent between
+        them (all in preorder). Samples of child are copy of first parent
+        samples, only range of the replaced subtree is partitioned again.
+        """
+        cdef SIZE_t first_end = _subtree_end(first, first_node_id)
+        cdef SIZE_t second_size = _subtree_end(second, second_node_id) - second_node_id
+        cdef SIZE_t shift = second_size - (first_end - first_node_id)
+        cdef SIZE_t donor_shift = first_node_id - second_node_id
+        cdef SIZE_t depth_addition = first[first_node_id].depth - second[second_node_id].depth
+        cdef SIZE_t i
+
+        # the removed subtree is counted on first parent nodes and ranges
+        self._remove_subtree(samples, first, first_starts, first_ends, first_node_id, race)
+
+        memcpy(child, first, first_node_id * sizeof(Node))
+        memcpy(child_starts, first_starts, first_node_id * sizeof(SIZE_t))
+        memcpy(child_ends, first_ends, first_node_id * sizeof(SIZE_t))
+        memcpy(&child[first_node_id + second_size], &first[first_end], (n_first - first_end) * sizeof(Node))
+        memcpy(&child_starts[first_node_id + second_size], &first_starts[first_end],
+               (n_first - first_end) * sizeof(SIZE_t))
+        memcpy(&child_ends[first_node_id + second_size], &first_ends[first_end],
+               (n_first - first_end) * sizeof(SIZE_t))
+        memcpy(&child[first_node_id], &second[second_node_id], second_size * sizeof(Node))
+
+        # ids of nodes after the replaced subtree are moved by shift
+        for i in range(n_first + shift):
+            if first_node_id <= i < first_node_id + second_size:
+                if child[i].left_child != _TREE_LEAF:
+                    child[i].left_child += donor_shift
+                    child[i].right_child += donor_shift
+                child[i].parent += donor_shift
+                child[i].depth += depth_addition
+                continue
+            if child[i].left_child != _TREE_LEAF:
+                if child[i].left_child >= first_end:
+                    child[i].left_child += shift
+                if child[i].right_child >= first_end:
+                    child[i].right_child += shift
+            if child[i].parent >= first_end:
+                child[i].parent += shift
+        child[first_node_id].parent = first[first_node_id].parent
+
+        return self._partition(samples, child, child_starts, child_ends, first_node_id,
+                               first_starts[first_node_id], first_ends[first_node_id], race)
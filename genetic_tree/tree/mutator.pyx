@@ -3,6 +3,8 @@ cimport numpy as np
 
 from .tree import Tree
 from .tree cimport Tree
+from .observations cimport Observations
+from ._utils cimport Node
 
 ctypedef np.npy_intp SIZE_t             # Type for indices and counters
 ctypedef np.npy_float64 DOUBLE_t        # Type of thresholds
@@ -68,16 +70,25 @@ cdef _mutate_feature(Tree tree, SIZE_t node_id):
     _mutate_threshold(tree, node_id, 1)
 
 cdef _mutate_threshold(Tree tree, SIZE_t node_id, bint feature_changed=0):
-    tree.observations.remove_observations(tree.nodes.elements, node_id)
-    cdef DOUBLE_t threshold = tree.get_new_random_threshold(tree.nodes.elements[node_id].threshold, tree.nodes.elements[node_id].feature, feature_changed)
+    tree.materialize()
+    cdef Observations observations = tree.observations
+    cdef Node* nodes = tree.nodes.elements
+    cdef DOUBLE_t threshold = tree.get_new_random_threshold(nodes[node_id].threshold, nodes[node_id].feature, feature_changed)
+    # with the same feature only observations between thresholds change the branch
+    if not feature_changed and tree.move_threshold(node_id, threshold) == 1:
+        return
+    with nogil:
+        observations.remove_observations(nodes, node_id)
     tree.change_threshold(node_id, threshold)
-    tree.observations.reassign_observations(tree, node_id)
+    tree.update_fitness(node_id)
 
 cdef _mutate_class(Tree tree, SIZE_t node_id):
-    tree.observations.remove_observations(tree.nodes.elements, node_id)
+    # observations stay in the leaf, only proper_classified is updated
     cdef SIZE_t new_class = tree.get_new_random_class(tree.nodes.elements[node_id].feature)
+    tree.materialize()
+    tree.observations.change_leaf_class(tree.nodes.elements, node_id, new_class)
     tree.change_feature_or_class(node_id, new_class)
-    tree.observations.reassign_observations(tree, node_id)
+    tree.update_fitness(-1)
 
 def test_mutate_feature(Tree tree, SIZE_t node_id):
     _mutate_feature(tree, node_id)
@@ -5,6 +5,9 @@ np.import_array()
 ctypedef np.npy_float64 DOUBLE_t        # Type of thresholds
 ctypedef np.npy_float32 DTYPE_t         # Type of X
 ctypedef np.npy_intp SIZE_t             # Type for indices and counters
+ctypedef np.npy_uint32 UINT32_t         # Type for observations ids in flat layout
+ctypedef np.npy_int32 INT32_t           # Type of indices of sparse X
+ctypedef np.npy_uint64 UINT64_t         # Type of keys of moved observations (leaf and observation id)
 
 from ._utils cimport IntArray, Leaves, Node
 from .tree cimport Tree
@@ -15,33 +18,69 @@ cdef class Observations:
     cdef Leaves* leaves_to_reassign
     cdef IntArray* empty_leaves_ids
 
+    cdef DOUBLE_t* class_histograms         # Weighted number of observations of each class in each leaf
+    cdef SIZE_t class_histograms_capacity   # Number of leaves that fits in class_histograms
+
     cdef public DTYPE_t proper_classified
     cdef public SIZE_t n_observations       # Number of observations in X and y
+    cdef DOUBLE_t weight_to_reassign        # Weight of removed observations not assigned again yet
+    cdef public DOUBLE_t racing_cut         # Assigning stops when proper_classified cannot reach it (0 - no racing)
 
     cdef public object X                    # Array with observations features (TODO: possibility of sparse array)
     cdef LeafFinder leaf_finder
 
     cdef public SIZE_t[:] y                 # Array with classes of observations
+    cdef public SIZE_t[:] classes           # Sorted array with all possible classes
+    cdef public SIZE_t n_classes
+    cdef SIZE_t[:] y_class_ids              # Index of class in classes array of each observation
     cdef public DTYPE_t[:] sample_weight          # Array with sample_weight of observations
 
-    cdef void initialize_observations(self, Tree tree)
+    cdef int initialize_observations(self, Node* nodes) nogil except -1
+
+    cdef int remove_observations(self, Node* nodes, SIZE_t below_node_id) nogil except -1
+    cdef int clear_observations(self, Node* nodes) nogil except -1
+    cdef bint cannot_reach_racing_cut(self) nogil
+    cdef DOUBLE_t _get_sample_weight_sum(self) nogil
+    cdef int _remove_observations_in_leaf(self, SIZE_t leaves_id, SIZE_t leaf_class) nogil except -1
+
+    cdef int change_leaf_class(self, Node* nodes, SIZE_t node_id, SIZE_t new_class) nogil except -1
+    cdef DOUBLE_t* get_class_histogram(self, SIZE_t leaves_id) nogil
+    cdef SIZE_t get_class_id(self, SIZE_t class_value) nogil
+
+    cdef int reassign_observations(self, Node* nodes, SIZE_t below_node_id) nogil except -1
+
+    cdef void set_data(self, object X, object y, object sample_weight, object y_class_ids) except *
+    cdef int expire_observations(self, Node* nodes, SIZE_t start, SIZE_t end, DTYPE_t* weights) nogil except -1
+    cdef int append_observations(self, Node* nodes, SIZE_t start, SIZE_t end) nogil except -1
+    cdef void count_proper_classified(self, Node* nodes, SIZE_t n_nodes) nogil
 
-    cdef void remove_observations(self, Node* nodes, SIZE_t below_node_id)
-    cdef void _remove_observations_in_leaf(self, SIZE_t leaves_id, SIZE_t leaf_class)
+    cdef SIZE_t count_observations(self, Node* nodes, SIZE_t below_node_id) nogil
+    cdef SIZE_t count_lower_or_equal(self, UINT32_t* sorted_ids, SIZE_t feature, DOUBLE_t threshold) nogil
+    cdef int move_observations(self, Node* nodes, SIZE_t node_id, DOUBLE_t new_threshold,
+                               UINT32_t* sorted_ids, SIZE_t start, SIZE_t end) nogil except -1
+    cdef int move_observations_of_child(self, Node* nodes, SIZE_t node_id, DOUBLE_t new_threshold,
+                                        SIZE_t n_child_observations) nogil except -1
+    cdef int _take_observations_between(self, Node* nodes, SIZE_t below_node_id, SIZE_t feature,
+                                        DOUBLE_t low, DOUBLE_t high, SIZE_t* taken, SIZE_t* n_taken) nogil except -1
+    cdef bint _reaches_node(self, Node* nodes, SIZE_t y_id, SIZE_t node_id) nogil
+    cdef int _remove_keys_from_leaf(self, Node* nodes, SIZE_t node_id, UINT64_t* keys, SIZE_t n_keys) nogil except -1
 
-    cdef void reassign_observations(self, Tree tree, SIZE_t below_node_id)
+    cdef int _assign_observation(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id) nogil except -1
 
-    cdef _assign_observation(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id)
+    cdef SIZE_t _append_leaves(self, SIZE_t y_id) nogil except -1        # return leaves_id
+    cdef int _append_observations(self, SIZE_t leaves_id, SIZE_t y_id) nogil except -1
 
-    cdef SIZE_t _append_leaves(self, SIZE_t y_id)        # return leaves_id
-    cdef _append_observations(self, SIZE_t leaves_id, SIZE_t y_id)
+    cdef int _copy_element_from_leaves_to_leaves_to_reassign(self, SIZE_t leaves_id) nogil except -1
+    cdef void _delete_leaves_to_reassign(self) nogil
 
-    cdef _copy_element_from_leaves_to_leaves_to_reassign(self, SIZE_t leaves_id)
-    cdef _delete_leaves_to_reassign(self)
+    cdef int _push_empty_leaves_ids(self, SIZE_t leaves_id) nogil except -1
+    cdef SIZE_t _pop_empty_leaves_ids(self) nogil
+    cdef int _resize_class_histograms(self, SIZE_t n_leaves) nogil except -1
+    cdef int _resize_empty_leaves_ids(self) nogil except -1
 
-    cdef _push_empty_leaves_ids(self, SIZE_t leaves_id)
-    cdef SIZE_t _pop_empty_leaves_ids(self)
-    cdef _resize_empty_leaves_ids(self)
+    cdef np.ndarray _get_class_histograms_ndarray(self, SIZE_t n_leaves)
+    cdef void _set_class_histograms_ndarray(self, object class_histograms) except *
+    cdef void remove_all_leaves(self) nogil
 
     cpdef test_initialization(self, Tree tree)
     cpdef test_removing_and_reassigning(self, Tree tree)
@@ -56,15 +95,46 @@ cdef class Observations:
     cpdef test_delete_leaves_to_reassign(self)
 
 
+cdef class FlatObservations(Observations):
+    # Observations of all leaves are kept in one buffer (samples), observations
+    # of each subtree are in one contiguous range of it
+    cdef UINT32_t* samples                  # Permutation of observations ids
+    cdef SIZE_t* leaves_start               # Start of range in samples of each leaf
+    cdef SIZE_t* leaves_end                 # End of range in samples of each leaf
+    cdef SIZE_t leaves_count
+    cdef SIZE_t leaves_capacity
+    cdef SIZE_t reassign_start              # Range in samples with removed observations
+    cdef SIZE_t reassign_end
+
+    cdef int clear_observations(self, Node* nodes) nogil except -1
+    cdef int _partition(self, Node* nodes, SIZE_t node_id, SIZE_t start, SIZE_t end) nogil except -1
+    cdef SIZE_t _new_leaves_id(self) nogil except -1
+    cdef int _resize_leaves_ranges(self, SIZE_t n_leaves) nogil except -1
+
+
 cpdef Observations copy_observations(Observations observations)
 
 
 cdef class LeafFinder:
     cdef bint issparse_X
-    cdef DTYPE_t[:, :] X_ndarray
+    cdef const DTYPE_t[:, :] X_ndarray
     cdef object X
+    # CSR representation of sparse X
+    cdef DTYPE_t[:] X_data
+    cdef INT32_t[:] X_indices
+    cdef INT32_t[:] X_indptr
 
     cdef SIZE_t find_leaf_for_observation(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id) nogil
+    cdef DTYPE_t get_value(self, SIZE_t y_id, SIZE_t feature) nogil
+    cdef DTYPE_t _get_value_sparse(self, SIZE_t y_id, SIZE_t feature) nogil
     cdef SIZE_t _find_leaf_for_observation_dense(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id) nogil
     cdef SIZE_t _find_leaf_for_observation_sparse(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id) nogil
 
+
+cdef class FeatureIndex:
+    cdef readonly object X                  # Dense array the index was built for
+    cdef SIZE_t n_observations
+    cdef object sorted_ids_ndarray          # Array [n_features x n_observations] with sorted ids
+    cdef UINT32_t* sorted_ids
+
+    cdef UINT32_t* get_sorted_ids(self, SIZE_t feature) nogil
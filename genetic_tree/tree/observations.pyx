@@ -1,8 +1,16 @@
-from libc.stdlib cimport free
+# cython: boundscheck=False
+# cython: wraparound=False
+
+from libc.stdlib cimport free, qsort
+from libc.string cimport memcpy
 from libc.stdint cimport SIZE_MAX
 from scipy.sparse import issparse
+from functools import partial
 
-from ._utils cimport resize_c, resize, copy_leaves, copy_int_array, safe_realloc
+from ._utils cimport resize_c, resize, copy_int_array, safe_realloc, sizet_ptr_to_ndarray
+from ._utils cimport share_leaves, make_int_array_private, free_int_array
+from ._utils cimport pool_malloc, pool_free, pool_realloc, pool_resize, pool_free_array
+from ..genetic.parallel import get_n_threads, map_in_threads
 
 import numpy as np
 cimport numpy as np
@@ -15,14 +23,20 @@ NOT_CLASSIFIED = -1
 cdef SIZE_t _TREE_LEAF = TREE_LEAF
 cdef SIZE_t _TREE_UNDEFINED = TREE_UNDEFINED
 cdef SIZE_t _NOT_REGISTERED = NOT_REGISTERED
+cdef SIZE_t _NOT_CLASSIFIED = NOT_CLASSIFIED
+cdef UINT64_t _ID_MASK = 0xFFFFFFFF     # observation id in key of moved observation
 
 cdef class Observations:
     def __cinit__(self,
                   object X,
                   SIZE_t[:] y,
-                  DTYPE_t[:] sample_weight):
+                  DTYPE_t[:] sample_weight,
+                  object classes=None,
+                  object y_class_ids=None):
         self.n_observations = X.shape[0]
         self.proper_classified = 0
+        self.weight_to_reassign = 0
+        self.racing_cut = 0
 
         self.X = X
         self.leaf_finder = LeafFinder(X)
@@ -30,6 +44,16 @@ cdef class Observations:
         self.y = y
         self.sample_weight = sample_weight
 
+        if classes is None:
+            classes = np.unique(y)
+        self.classes = np.ascontiguousarray(classes, dtype=np.intp)
+        self.n_classes = self.classes.shape[0]
+        if y_class_ids is None:
+            y_class_ids = np.searchsorted(self.classes, y).astype(np.intp)
+        self.y_class_ids = y_class_ids
+        self.class_histograms = NULL
+        self.class_histograms_capacity = 0
+
         self.leaves = NULL
         safe_realloc(&self.leaves, 1)
         self.leaves_to_reassign = NULL
@@ -48,17 +72,20 @@ cdef class Observations:
         self.empty_leaves_ids.elements = NULL
         self.empty_leaves_ids.count = 0
         self.empty_leaves_ids.capacity = 0
+        self.empty_leaves_ids.refcount = NULL
 
     def __dealloc__(self):
         if self.leaves.elements != NULL:
             for i in range(self.leaves.count):
-                free(self.leaves.elements[i].elements)
-        free(self.leaves.elements)
+                free_int_array(&self.leaves.elements[i])
+        pool_free_array(self.leaves)
         if self.leaves_to_reassign.elements != NULL:
             for i in range(self.leaves_to_reassign.count):
-                free(self.leaves_to_reassign.elements[i].elements)
-        free(self.leaves_to_reassign.elements)
+                free_int_array(&self.leaves_to_reassign.elements[i])
+        pool_free_array(self.leaves_to_reassign)
         free(self.empty_leaves_ids.elements)
+        pool_free(self.class_histograms,
+                  self.class_histograms_capacity * self.n_classes * sizeof(DOUBLE_t))
         free(self.leaves)
         free(self.leaves_to_reassign)
         free(self.empty_leaves_ids)
@@ -70,8 +97,9 @@ cdef class Observations:
         empty_2d_array = np.empty((1, 1), dtype=np.float32)
         empty_1d_array_int = np.empty(1, dtype=np.intp)
         empty_1d_array = np.empty(1, dtype=np.float32)
-        return (Observations,
-                (empty_2d_array, empty_1d_array_int, empty_1d_array),
+        return (type(self),
+                (empty_2d_array, empty_1d_array_int, empty_1d_array,
+                 np.array(self.classes)),
                 self.__getstate__())
 
     def __getstate__(self):
@@ -85,7 +113,22 @@ cdef class Observations:
             raise ValueError("Pickle observations with leaves_to_reassign "
                              "not empty is not supported")
 
-        # TODO: add pickling of leaves and empty_leaves_ids
+        # observations of all leaves are concatenated into one array
+        cdef SIZE_t i
+        cdef np.ndarray leaves_counts = np.empty(self.leaves.count, dtype=np.intp)
+        for i in range(self.leaves.count):
+            leaves_counts[i] = self.leaves.elements[i].count
+        cdef np.ndarray leaves_observations = np.empty(np.sum(leaves_counts), dtype=self._ids_dtype())
+        cdef SIZE_t start = 0
+        for i in range(self.leaves.count):
+            leaves_observations[start:start + leaves_counts[i]] = \
+                sizet_ptr_to_ndarray(self.leaves.elements[i].elements, leaves_counts[i])
+            start += leaves_counts[i]
+        state["leaves_counts"] = leaves_counts
+        state["leaves_observations"] = leaves_observations
+        state["empty_leaves_ids"] = sizet_ptr_to_ndarray(self.empty_leaves_ids.elements,
+                                                         self.empty_leaves_ids.count)
+        state["class_histograms"] = self._get_class_histograms_ndarray(self.leaves.count)
 
         return state
 
@@ -94,23 +137,88 @@ cdef class Observations:
         self.proper_classified = state["proper_classified"]
         self.n_observations = state["n_observations"]
 
-        # if 'leaves' not in state or 'empty_leaves_ids' not in state:
-        #     raise ValueError('You have loaded Tree version which '
-        #                      'cannot be imported')
+        if 'leaves_counts' not in state or 'empty_leaves_ids' not in state:
+            raise ValueError('You have loaded Observations version which '
+                             'cannot be imported')
+
+        cdef SIZE_t[:] leaves_counts = state["leaves_counts"]
+        cdef SIZE_t[:] leaves_observations = state["leaves_observations"].astype(np.intp)
+        cdef SIZE_t[:] empty_leaves_ids = state["empty_leaves_ids"]
+        cdef SIZE_t n_leaves = leaves_counts.shape[0]
+        cdef SIZE_t i
+        cdef SIZE_t start = 0
+        cdef IntArray* observations
+
+        self.remove_all_leaves()
+        pool_resize(self.leaves, n_leaves)
+        for i in range(n_leaves):
+            observations = &self.leaves.elements[i]
+            observations.elements = NULL
+            observations.count = 0
+            observations.capacity = 0
+            observations.refcount = NULL
+            if leaves_counts[i] > 0:
+                pool_resize(observations, leaves_counts[i])
+                memcpy(observations.elements, &leaves_observations[start], leaves_counts[i] * sizeof(SIZE_t))
+            observations.count = leaves_counts[i]
+            start += leaves_counts[i]
+        self.leaves.count = n_leaves
+
+        for i in range(empty_leaves_ids.shape[0]):
+            self._push_empty_leaves_ids(empty_leaves_ids[i])
+        self._set_class_histograms_ndarray(state["class_histograms"])
+
+    def _ids_dtype(self):
+        return np.uint32 if self.n_observations <= 0xFFFFFFFF else np.intp
+
+    cdef np.ndarray _get_class_histograms_ndarray(self, SIZE_t n_leaves):
+        cdef np.ndarray class_histograms = np.zeros((n_leaves, self.n_classes), dtype=np.float64)
+        if n_leaves > 0 and self.n_classes > 0:
+            memcpy(class_histograms.data, self.class_histograms,
+                   n_leaves * self.n_classes * sizeof(DOUBLE_t))
+        return class_histograms
+
+    cdef void _set_class_histograms_ndarray(self, object class_histograms) except *:
+        cdef np.ndarray histograms = np.ascontiguousarray(class_histograms, dtype=np.float64)
+        cdef SIZE_t n_leaves = histograms.shape[0]
+        if histograms.ndim != 2 or histograms.shape[1] != self.n_classes:
+            raise ValueError("Class histograms do not match classes of observations")
+        self._resize_class_histograms(n_leaves)
+        if n_leaves > 0 and self.n_classes > 0:
+            memcpy(self.class_histograms, histograms.data, n_leaves * self.n_classes * sizeof(DOUBLE_t))
+
+    cdef void remove_all_leaves(self) nogil:
+        cdef SIZE_t i
+        for i in range(self.leaves.count):
+            free_int_array(&self.leaves.elements[i])
+        self.leaves.count = 0
+        self.empty_leaves_ids.count = 0
+        self.weight_to_reassign = 0
+        self._delete_leaves_to_reassign()
 
-        # TODO: add unpickling of leaves and empty_leaves_ids
+    cdef int initialize_observations(self, Node* nodes) nogil except -1:
+        """
+        Assigns all observations to leaves
 
-    cdef void initialize_observations(self, Tree tree):
+        Returns:
+            1 if assigning was stopped, because tree cannot reach racing_cut
+        """
         cdef SIZE_t y_id
         cdef SIZE_t start_from_node_id = 0
+        self.weight_to_reassign = self._get_sample_weight_sum()
         for y_id in range(self.n_observations):
-            self._assign_observation(tree.nodes.elements, y_id, start_from_node_id)
-
-    cdef void remove_observations(self, Node* nodes, SIZE_t below_node_id):
+            self._assign_observation(nodes, y_id, start_from_node_id)
+            self.weight_to_reassign -= self.sample_weight[y_id]
+            if self.cannot_reach_racing_cut():
+                return 1
+        self.weight_to_reassign = 0
+        return 0
+
+    cdef int remove_observations(self, Node* nodes, SIZE_t below_node_id) nogil except -1:
         if nodes[below_node_id].left_child == _TREE_LEAF:
-            if nodes[below_node_id].right_child != TREE_LEAF:  # means there are at least one observation inside node
+            if nodes[below_node_id].right_child != _TREE_LEAF:  # means there are at least one observation inside node
                 self._remove_observations_in_leaf(nodes[below_node_id].right_child, nodes[below_node_id].feature)
-                nodes[below_node_id].right_child = TREE_LEAF
+                nodes[below_node_id].right_child = _TREE_LEAF
 
         else:
             if nodes[below_node_id].left_child != _TREE_LEAF:
@@ -118,40 +226,355 @@ cdef class Observations:
 
             if nodes[below_node_id].right_child != _TREE_LEAF:
                 self.remove_observations(nodes, nodes[below_node_id].right_child)
+        return 0
 
-    cdef void _remove_observations_in_leaf(self, SIZE_t leaves_id, SIZE_t leaf_class):
-        cdef SIZE_t i
-        cdef IntArray observations = self.leaves.elements[leaves_id]
-        for i in range(observations.count):
-            if self.y[observations.elements[i]] == leaf_class:
-                self.proper_classified -= self.sample_weight[observations.elements[i]]
+    cdef int clear_observations(self, Node* nodes) nogil except -1:
+        """
+        Removes all observations from leaves without reassigning them
+        """
+        self.remove_observations(nodes, 0)
+        self._delete_leaves_to_reassign()
+        self.proper_classified = 0
+        self.weight_to_reassign = 0
+        return 0
 
-        self._copy_element_from_leaves_to_leaves_to_reassign(leaves_id)
+    cdef bint cannot_reach_racing_cut(self) nogil:
+        # even if all observations left to assign are proper classified
+        return self.racing_cut > 0 and self.proper_classified + self.weight_to_reassign < self.racing_cut
 
-    cdef void reassign_observations(self, Tree tree, SIZE_t below_node_id):
+    cdef DOUBLE_t _get_sample_weight_sum(self) nogil:
+        cdef DOUBLE_t sample_weight_sum = 0
+        cdef SIZE_t y_id
+        if self.racing_cut > 0:     # needed only during racing
+            for y_id in range(self.n_observations):
+                sample_weight_sum += self.sample_weight[y_id]
+        return sample_weight_sum
+
+    cdef int _remove_observations_in_leaf(self, SIZE_t leaves_id, SIZE_t leaf_class) nogil except -1:
+        cdef DOUBLE_t* class_histogram = self.get_class_histogram(leaves_id)
+        cdef SIZE_t class_id = self.get_class_id(leaf_class)
+        cdef SIZE_t i
+        if class_id != _NOT_CLASSIFIED:
+            self.proper_classified -= class_histogram[class_id]
+        for i in range(self.n_classes):
+            self.weight_to_reassign += class_histogram[i]
+
+        return self._copy_element_from_leaves_to_leaves_to_reassign(leaves_id)
+
+    cdef int change_leaf_class(self, Node* nodes, SIZE_t node_id, SIZE_t new_class) nogil except -1:
+        """
+        Updates proper_classified before the class of leaf is changed to
+        new_class. Observations stay in the leaf, only the class histogram of
+        the leaf is used.
+        """
+        cdef SIZE_t leaves_id = nodes[node_id].right_child
+        cdef DOUBLE_t* class_histogram
+        cdef SIZE_t class_id
+        if leaves_id == _TREE_LEAF:  # there are no observations in leaf
+            return 0
+        class_histogram = self.get_class_histogram(leaves_id)
+        class_id = self.get_class_id(nodes[node_id].feature)
+        if class_id != _NOT_CLASSIFIED:
+            self.proper_classified -= class_histogram[class_id]
+        class_id = self.get_class_id(new_class)
+        if class_id != _NOT_CLASSIFIED:
+            self.proper_classified += class_histogram[class_id]
+        return 0
+
+    cdef DOUBLE_t* get_class_histogram(self, SIZE_t leaves_id) nogil:
+        return &self.class_histograms[leaves_id * self.n_classes]
+
+    cdef SIZE_t get_class_id(self, SIZE_t class_value) nogil:
+        # binary search in sorted classes
+        cdef SIZE_t low = 0
+        cdef SIZE_t high = self.n_classes
+        cdef SIZE_t middle
+        while low < high:
+            middle = (low + high) // 2
+            if self.classes[middle] < class_value:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_classes and self.classes[low] == class_value:
+            return low
+        return _NOT_CLASSIFIED
+
+    cdef int reassign_observations(self, Node* nodes, SIZE_t below_node_id) nogil except -1:
+        """
+        Assigns removed observations to leaves below below_node_id
+
+        Returns:
+            1 if assigning was stopped, because tree cannot reach racing_cut
+        """
         cdef SIZE_t i
         cdef SIZE_t j
+        cdef SIZE_t y_id
         cdef IntArray* observations
         for i in range(self.leaves_to_reassign.count):
             observations = &self.leaves_to_reassign.elements[i]
             for j in range(observations.count):
-                self._assign_observation(tree.nodes.elements, observations.elements[j], below_node_id)
+                y_id = observations.elements[j]
+                self._assign_observation(nodes, y_id, below_node_id)
+                self.weight_to_reassign -= self.sample_weight[y_id]
+                if self.cannot_reach_racing_cut():
+                    return 1
 
+        self.weight_to_reassign = 0
         self._delete_leaves_to_reassign()
         self._resize_empty_leaves_ids()
+        # there could be no observations to reassign
+        return 1 if self.cannot_reach_racing_cut() else 0
+
+    cdef void set_data(self, object X, object y, object sample_weight, object y_class_ids) except *:
+        """
+        Changes arrays of observations to arrays with the same first
+        observations and new observations appended (ids of observations
+        in leaves stay valid)
+        """
+        self.n_observations = X.shape[0]
+        self.X = X
+        self.leaf_finder = LeafFinder(X)
+        self.y = y
+        self.sample_weight = sample_weight
+        self.y_class_ids = y_class_ids
+
+    cdef int expire_observations(self, Node* nodes, SIZE_t start, SIZE_t end, DTYPE_t* weights) nogil except -1:
+        """
+        Subtracts weights of observations with ids in [start, end) (weights
+        they had before they were set to 0) from class histograms of their
+        leaves. Observations stay in leaves with zero weight until they are
+        assigned again.
+        """
+        cdef SIZE_t y_id
+        cdef SIZE_t node_id
+        for y_id in range(start, end):
+            node_id = self.leaf_finder.find_leaf_for_observation(nodes, y_id, 0)
+            if nodes[node_id].right_child == _TREE_LEAF:
+                continue
+            self.get_class_histogram(nodes[node_id].right_child)[self.y_class_ids[y_id]] -= weights[y_id - start]
+            if nodes[node_id].feature == self.y[y_id]:          # feature means class
+                self.proper_classified -= weights[y_id - start]
+        return 0
+
+    cdef int append_observations(self, Node* nodes, SIZE_t start, SIZE_t end) nogil except -1:
+        """
+        Assigns observations with ids in [start, end) to leaves (e.g. appended
+        by set_data or the next block of rows during initialization)
+        """
+        cdef SIZE_t y_id
+        for y_id in range(start, end):
+            self._assign_observation(nodes, y_id, 0)
+        return 0
+
+    cdef void count_proper_classified(self, Node* nodes, SIZE_t n_nodes) nogil:
+        """
+        Counts proper_classified from class histograms of leaves
+        """
+        cdef SIZE_t node_id
+        cdef SIZE_t class_id
+        self.proper_classified = 0
+        for node_id in range(n_nodes):
+            if nodes[node_id].left_child != _TREE_LEAF or nodes[node_id].right_child == _TREE_LEAF:
+                continue
+            class_id = self.get_class_id(nodes[node_id].feature)
+            if class_id != _NOT_CLASSIFIED:
+                self.proper_classified += self.get_class_histogram(nodes[node_id].right_child)[class_id]
+
+    cdef SIZE_t count_observations(self, Node* nodes, SIZE_t below_node_id) nogil:
+        """
+        Returns:
+            number of observations in leaves below below_node_id
+        """
+        if nodes[below_node_id].left_child != _TREE_LEAF:
+            return (self.count_observations(nodes, nodes[below_node_id].left_child) +
+                    self.count_observations(nodes, nodes[below_node_id].right_child))
+        if nodes[below_node_id].right_child == _TREE_LEAF:
+            return 0
+        return self.leaves.elements[nodes[below_node_id].right_child].count
+
+    cdef SIZE_t count_lower_or_equal(self, UINT32_t* sorted_ids, SIZE_t feature, DOUBLE_t threshold) nogil:
+        """
+        Returns:
+            number of observations with value of feature <= threshold \
+            (sorted_ids are ids of all observations sorted by the feature)
+        """
+        cdef SIZE_t low = 0
+        cdef SIZE_t high = self.n_observations
+        cdef SIZE_t middle
+        while low < high:
+            middle = (low + high) >> 1
+            if self.leaf_finder.get_value(sorted_ids[middle], feature) <= threshold:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    cdef int move_observations(self, Node* nodes, SIZE_t node_id, DOUBLE_t new_threshold,
+                               UINT32_t* sorted_ids, SIZE_t start, SIZE_t end) nogil except -1:
+        """
+        Changes threshold of decision node to new_threshold (on the same
+        feature). Only observations sorted_ids[start:end] (with values of the
+        feature between old and new threshold) can change the child of the
+        node, so only those of them that reach the node are removed from
+        leaves of one child and assigned below the other one.
+        """
+        cdef UINT64_t* keys = <UINT64_t*> pool_malloc(max(end - start, 1) * sizeof(UINT64_t), NULL)
+        cdef SIZE_t n_keys = 0
+        cdef SIZE_t y_id
+        cdef SIZE_t leaf_id
+        cdef SIZE_t i
+        cdef SIZE_t j
+        for i in range(start, end):
+            y_id = sorted_ids[i]
+            if self._reaches_node(nodes, y_id, node_id):
+                leaf_id = self.leaf_finder.find_leaf_for_observation(nodes, y_id, node_id)
+                keys[n_keys] = (<UINT64_t> leaf_id << 32) | <UINT64_t> y_id
+                n_keys += 1
+
+        # keys are grouped by leaves and sorted by observation ids inside each leaf
+        qsort(keys, n_keys, sizeof(UINT64_t), _compare_keys)
+        i = 0
+        while i < n_keys:
+            j = i + 1
+            while j < n_keys and keys[j] >> 32 == keys[i] >> 32:
+                j += 1
+            self._remove_keys_from_leaf(nodes, keys[i] >> 32, &keys[i], j - i)
+            i = j
+
+        nodes[node_id].threshold = new_threshold
+        for i in range(n_keys):
+            self._assign_observation(nodes, keys[i] & _ID_MASK, node_id)
+        pool_free(keys, max(end - start, 1) * sizeof(UINT64_t))
+        return 0
+
+    cdef int move_observations_of_child(self, Node* nodes, SIZE_t node_id, DOUBLE_t new_threshold,
+                                        SIZE_t n_child_observations) nogil except -1:
+        """
+        Changes threshold of decision node to new_threshold (on the same
+        feature). Observations with values between old and new threshold are
+        taken from leaves of the child that loses them (it has
+        n_child_observations observations) and assigned below the node.
+        """
+        cdef DOUBLE_t old_threshold = nodes[node_id].threshold
+        cdef SIZE_t child_id = nodes[node_id].left_child
+        if new_threshold > old_threshold:
+            child_id = nodes[node_id].right_child
+        cdef SIZE_t* taken = <SIZE_t*> pool_malloc(max(n_child_observations, 1) * sizeof(SIZE_t), NULL)
+        cdef SIZE_t n_taken = 0
+        cdef SIZE_t i
+        self._take_observations_between(nodes, child_id, nodes[node_id].feature, min(old_threshold, new_threshold),
+                                        max(old_threshold, new_threshold), taken, &n_taken)
+        nodes[node_id].threshold = new_threshold
+        for i in range(n_taken):
+            self._assign_observation(nodes, taken[i], node_id)
+        pool_free(taken, max(n_child_observations, 1) * sizeof(SIZE_t))
+        return 0
+
+    cdef int _take_observations_between(self, Node* nodes, SIZE_t below_node_id, SIZE_t feature,
+                                        DOUBLE_t low, DOUBLE_t high, SIZE_t* taken, SIZE_t* n_taken) nogil except -1:
+        # removes from leaves observations with low < value of feature <= high
+        if nodes[below_node_id].left_child != _TREE_LEAF:
+            self._take_observations_between(nodes, nodes[below_node_id].left_child, feature, low, high,
+                                            taken, n_taken)
+            return self._take_observations_between(nodes, nodes[below_node_id].right_child, feature, low, high,
+                                                   taken, n_taken)
+        if nodes[below_node_id].right_child == _TREE_LEAF:
+            return 0
+
+        cdef SIZE_t leaves_id = nodes[below_node_id].right_child
+        cdef IntArray* observations = &self.leaves.elements[leaves_id]
+        cdef DOUBLE_t* class_histogram = self.get_class_histogram(leaves_id)
+        cdef DTYPE_t value
+        cdef SIZE_t y_id
+        cdef SIZE_t i
+        cdef SIZE_t n_left = 0
+        for i in range(observations.count):
+            y_id = observations.elements[i]
+            value = self.leaf_finder.get_value(y_id, feature)
+            if value <= low or value > high:
+                if n_left != i:
+                    observations.elements[n_left] = y_id
+                n_left += 1
+                continue
+            if n_left == i:     # the first taken observation, array is changed from now
+                make_int_array_private(observations)
+            class_histogram[self.y_class_ids[y_id]] -= self.sample_weight[y_id]
+            if nodes[below_node_id].feature == self.y[y_id]:    # feature means class
+                self.proper_classified -= self.sample_weight[y_id]
+            taken[n_taken[0]] = y_id
+            n_taken[0] += 1
+
+        if n_left < observations.count and n_left == 0:
+            free_int_array(observations)
+            nodes[below_node_id].right_child = _TREE_LEAF
+            return self._push_empty_leaves_ids(leaves_id)
+        observations.count = n_left
+        return 0
+
+    cdef bint _reaches_node(self, Node* nodes, SIZE_t y_id, SIZE_t node_id) nogil:
+        cdef SIZE_t current_node_id = 0
+        while current_node_id != node_id:
+            if nodes[current_node_id].left_child == _TREE_LEAF:
+                return 0
+            if self.leaf_finder.get_value(y_id, nodes[current_node_id].feature) <= nodes[current_node_id].threshold:
+                current_node_id = nodes[current_node_id].left_child
+            else:
+                current_node_id = nodes[current_node_id].right_child
+        return 1
+
+    cdef int _remove_keys_from_leaf(self, Node* nodes, SIZE_t node_id, UINT64_t* keys, SIZE_t n_keys) nogil except -1:
+        # keys are sorted keys of observations in leaf node_id
+        cdef SIZE_t leaves_id = nodes[node_id].right_child
+        cdef IntArray* observations = &self.leaves.elements[leaves_id]
+        cdef DOUBLE_t* class_histogram = self.get_class_histogram(leaves_id)
+        cdef UINT64_t leaf_key = <UINT64_t> node_id << 32
+        cdef SIZE_t y_id
+        cdef SIZE_t i
+        cdef SIZE_t n_left = 0
+        cdef SIZE_t low
+        cdef SIZE_t high
+        cdef SIZE_t middle
+        for i in range(n_keys):
+            y_id = keys[i] & _ID_MASK
+            class_histogram[self.y_class_ids[y_id]] -= self.sample_weight[y_id]
+            if nodes[node_id].feature == self.y[y_id]:          # feature means class
+                self.proper_classified -= self.sample_weight[y_id]
+
+        if n_keys == observations.count:
+            free_int_array(observations)
+            nodes[node_id].right_child = _TREE_LEAF
+            return self._push_empty_leaves_ids(leaves_id)
+
+        make_int_array_private(observations)
+        for i in range(observations.count):
+            # binary search of observation in keys
+            low = 0
+            high = n_keys
+            while low < high:
+                middle = (low + high) >> 1
+                if keys[middle] < (leaf_key | <UINT64_t> observations.elements[i]):
+                    low = middle + 1
+                else:
+                    high = middle
+            if low == n_keys or keys[low] != (leaf_key | <UINT64_t> observations.elements[i]):
+                observations.elements[n_left] = observations.elements[i]
+                n_left += 1
+        observations.count = n_left
+        return 0
 
-    cdef _assign_observation(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id):
-        cdef node_id = self.leaf_finder.find_leaf_for_observation(nodes, y_id, below_node_id)
+    cdef int _assign_observation(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id) nogil except -1:
+        cdef SIZE_t node_id = self.leaf_finder.find_leaf_for_observation(nodes, y_id, below_node_id)
 
-        if nodes[node_id].right_child != TREE_LEAF:         # in right child is leaves_id
+        if nodes[node_id].right_child != _TREE_LEAF:         # in right child is leaves_id
             self._append_observations(nodes[node_id].right_child, y_id)
         else:
             nodes[node_id].right_child = self._append_leaves(y_id)
 
         if nodes[node_id].feature == self.y[y_id]:          # feature means class
             self.proper_classified += self.sample_weight[y_id]
+        return 0
 
-    cdef SIZE_t _append_leaves(self, SIZE_t y_id):
+    cdef SIZE_t _append_leaves(self, SIZE_t y_id) nogil except -1:
         cdef SIZE_t leaves_id = self._pop_empty_leaves_ids()
 
         if leaves_id == -1:  # it means there was anything to pop
@@ -160,78 +583,86 @@ cdef class Observations:
             self.leaves.count -= 1  # minus 1 from counter, because at the end of function it will be added +1
 
         if leaves_id >= self.leaves.capacity:
-            if resize_c(self.leaves) != 0:
-                return SIZE_MAX
+            pool_resize(self.leaves)
+            self._resize_class_histograms(self.leaves.capacity)
 
         cdef IntArray* observations = &self.leaves.elements[leaves_id]
 
         observations.elements = NULL
         observations.count = 0
         observations.capacity = 0
+        observations.refcount = NULL
+
+        cdef DOUBLE_t* class_histogram = self.get_class_histogram(leaves_id)
+        cdef SIZE_t i
+        for i in range(self.n_classes):
+            class_histogram[i] = 0
 
         self._append_observations(leaves_id, y_id)
 
         self.leaves.count += 1
         return leaves_id
 
-    cdef _append_observations(self, SIZE_t leaves_id, SIZE_t y_id):
+    cdef int _append_observations(self, SIZE_t leaves_id, SIZE_t y_id) nogil except -1:
         cdef IntArray* observations = &self.leaves.elements[leaves_id]
 
         cdef SIZE_t observations_id = observations.count
 
+        if observations.refcount != NULL:  # observations shared with other tree
+            make_int_array_private(observations)
+
         if observations_id >= observations.capacity:
-            if resize_c(observations) != 0:
-                return SIZE_MAX
+            pool_resize(observations)
 
         cdef SIZE_t* observation = &observations.elements[observations_id]
         observation[0] = y_id
 
         observations.count += 1
+        self.get_class_histogram(leaves_id)[self.y_class_ids[y_id]] += self.sample_weight[y_id]
+        return 0
 
-    cdef _copy_element_from_leaves_to_leaves_to_reassign(self, SIZE_t leaves_id):
+    cdef int _copy_element_from_leaves_to_leaves_to_reassign(self, SIZE_t leaves_id) nogil except -1:
         cdef SIZE_t leaves_to_reassign_id = self.leaves_to_reassign.count
 
         if leaves_to_reassign_id >= self.leaves_to_reassign.capacity:
-            if resize_c(self.leaves_to_reassign) != 0:
-                return SIZE_MAX
+            pool_resize(self.leaves_to_reassign)
 
         cdef IntArray* observations = &self.leaves_to_reassign.elements[leaves_to_reassign_id]
 
         observations.elements = self.leaves.elements[leaves_id].elements
         observations.count = self.leaves.elements[leaves_id].count
         observations.capacity = self.leaves.elements[leaves_id].capacity
+        observations.refcount = self.leaves.elements[leaves_id].refcount
 
         self.leaves_to_reassign.count += 1
 
         self.leaves.elements[leaves_id].elements = NULL
         self.leaves.elements[leaves_id].count = 0
         self.leaves.elements[leaves_id].capacity = 0
+        self.leaves.elements[leaves_id].refcount = NULL
 
-        self._push_empty_leaves_ids(leaves_id)
+        return self._push_empty_leaves_ids(leaves_id)
 
-    cdef _delete_leaves_to_reassign(self):
+    cdef void _delete_leaves_to_reassign(self) nogil:
         cdef SIZE_t i
         if self.leaves_to_reassign.elements != NULL:
             for i in range(self.leaves_to_reassign.count):
-                free(self.leaves_to_reassign.elements[i].elements)
-        free(self.leaves_to_reassign.elements)
-        self.leaves_to_reassign.elements = NULL
-        self.leaves_to_reassign.count = 0
-        self.leaves_to_reassign.capacity = 0
+                free_int_array(&self.leaves_to_reassign.elements[i])
+        pool_free_array(self.leaves_to_reassign)
 
-    cdef _push_empty_leaves_ids(self, SIZE_t leaves_id):
+    cdef int _push_empty_leaves_ids(self, SIZE_t leaves_id) nogil except -1:
         cdef SIZE_t empty_leaves_ids_id = self.empty_leaves_ids.count
 
         if empty_leaves_ids_id >= self.empty_leaves_ids.capacity:
-            if resize_c(self.empty_leaves_ids) != 0:
-                return SIZE_MAX
+            resize_c(self.empty_leaves_ids)
 
         cdef SIZE_t* leaves_id_ptr = &self.empty_leaves_ids.elements[empty_leaves_ids_id]
         leaves_id_ptr[0] = leaves_id
 
         self.empty_leaves_ids.count += 1
+        return 0
 
-    cdef SIZE_t _pop_empty_leaves_ids(self):
+    cdef SIZE_t _pop_empty_leaves_ids(self) nogil:
         if self.empty_leaves_ids.count == 0:
             return -1
 
@@ -240,15 +671,24 @@ cdef class Observations:
         cdef SIZE_t* leaves_id_ptr = &self.empty_leaves_ids.elements[self.empty_leaves_ids.count]
         return leaves_id_ptr[0]
 
-    cdef _resize_empty_leaves_ids(self):
+    cdef int _resize_class_histograms(self, SIZE_t n_leaves) nogil except -1:
+        cdef size_t row_size = max(self.n_classes, 1) * sizeof(DOUBLE_t)
+        cdef size_t nbytes
+        if self.class_histograms_capacity < n_leaves:
+            self.class_histograms = <DOUBLE_t*> pool_realloc(self.class_histograms,
+                                                             self.class_histograms_capacity * row_size,
+                                                             n_leaves * row_size, &nbytes)
+            self.class_histograms_capacity = nbytes // row_size
+        return 0
+
+    cdef int _resize_empty_leaves_ids(self) nogil except -1:
         cdef SIZE_t new_size = 3
         if self.empty_leaves_ids.count > 3:
             new_size = self.empty_leaves_ids.count
-        if resize(self.empty_leaves_ids, new_size) != 0:
-            return SIZE_MAX
+        return resize(self.empty_leaves_ids, new_size)
 
     cpdef test_initialization(self, Tree tree):
-        self.initialize_observations(tree)
+        self.initialize_observations(tree.nodes.elements)
         assert self.leaves.count > 0
         assert self.leaves.capacity > 0
         assert self.leaves.elements[0].count > 0
@@ -256,14 +696,14 @@ cdef class Observations:
         assert self.leaves.elements[0].elements[0] == 0
 
     cpdef test_removing_and_reassigning(self, Tree tree):
-        self.initialize_observations(tree)
+        self.initialize_observations(tree.nodes.elements)
         cdef DTYPE_t proper_classified = self.proper_classified
         cdef SIZE_t leaves_count = self.leaves.count
         assert self.leaves_to_reassign.count == 0
         self.remove_observations(tree.nodes.elements, 0)
         assert self.leaves_to_reassign.count == self.leaves.count == self.empty_leaves_ids.count == leaves_count
         assert self.proper_classified == 0
-        self.reassign_observations(tree, 0)
+        self.reassign_observations(tree.nodes.elements, 0)
         assert proper_classified == self.proper_classified
         assert self.leaves.count == leaves_count
         assert self.leaves_to_reassign.count == 0
@@ -392,20 +832,253 @@ cdef class Observations:
 
 
 cpdef Observations copy_observations(Observations observations):
-    cdef Observations observations_copied = Observations(observations.X, observations.y, observations.sample_weight)
-    copy_leaves(observations.leaves, observations_copied.leaves)
-    copy_int_array(observations.empty_leaves_ids, observations_copied.empty_leaves_ids)
-    copy_leaves(observations.leaves_to_reassign, observations_copied.leaves_to_reassign)
+    if isinstance(observations, FlatObservations):
+        return _copy_flat_observations(observations)
+    cdef Observations observations_copied = Observations(observations.X, observations.y, observations.sample_weight,
+                                                         observations.classes, observations.y_class_ids)
+    with nogil:
+        # observations in leaves are shared and copied only when changed
+        share_leaves(observations.leaves, observations_copied.leaves)
+        observations_copied._resize_class_histograms(observations_copied.leaves.capacity)
+        if observations.leaves.count > 0:
+            memcpy(observations_copied.class_histograms, observations.class_histograms,
+                   observations.leaves.count * observations.n_classes * sizeof(DOUBLE_t))
+        copy_int_array(observations.empty_leaves_ids, observations_copied.empty_leaves_ids)
+        share_leaves(observations.leaves_to_reassign, observations_copied.leaves_to_reassign)
     observations_copied.proper_classified = observations.proper_classified
     return observations_copied
 
 
+cdef class FlatObservations(Observations):
+    """
+    Observations with all leaves kept in one buffer of observations ids.
+    Each leaf has its range [start, end) in the buffer and leaves of each
+    subtree are next to each other (in order of depth first search). Thanks to
+    it the observations removed from subtree are one range and reassigning
+    them partitions this range in place, without any allocations.
+    """
+    def __cinit__(self,
+                  object X,
+                  SIZE_t[:] y,
+                  DTYPE_t[:] sample_weight,
+                  object classes=None,
+                  object y_class_ids=None):
+        if self.n_observations > 0xFFFFFFFF:
+            raise ValueError("FlatObservations supports at most 2^32 observations")
+        self.samples = <UINT32_t*> pool_malloc(max(self.n_observations, 1) * sizeof(UINT32_t), NULL)
+        self.leaves_start = NULL
+        self.leaves_end = NULL
+        self.leaves_count = 0
+        self.leaves_capacity = 0
+        self.reassign_start = 0
+        self.reassign_end = 0
+
+    def __dealloc__(self):
+        pool_free(self.samples, max(self.n_observations, 1) * sizeof(UINT32_t))
+        pool_free(self.leaves_start, self.leaves_capacity * sizeof(SIZE_t))
+        pool_free(self.leaves_end, self.leaves_capacity * sizeof(SIZE_t))
+
+    def __getstate__(self):
+        """Getstate re-implementation, for pickling."""
+        if self.reassign_start != self.reassign_end:
+            raise ValueError("Pickle observations with observations to reassign "
+                             "is not supported")
+        state = Observations.__getstate__(self)
+        cdef np.ndarray samples = np.empty(self.n_observations, dtype=np.uint32)
+        cdef np.ndarray leaves_start = np.empty(self.leaves_count, dtype=np.intp)
+        cdef np.ndarray leaves_end = np.empty(self.leaves_count, dtype=np.intp)
+        if self.n_observations > 0:
+            memcpy(samples.data, self.samples, self.n_observations * sizeof(UINT32_t))
+        if self.leaves_count > 0:
+            memcpy(leaves_start.data, self.leaves_start, self.leaves_count * sizeof(SIZE_t))
+            memcpy(leaves_end.data, self.leaves_end, self.leaves_count * sizeof(SIZE_t))
+        state["samples"] = samples
+        state["leaves_start"] = leaves_start
+        state["leaves_end"] = leaves_end
+        state["class_histograms"] = self._get_class_histograms_ndarray(self.leaves_count)
+        return state
+
+    def __setstate__(self, state):
+        """Setstate re-implementation, for unpickling."""
+        if 'samples' not in state:
+            raise ValueError('You have loaded Observations version which '
+                             'cannot be imported')
+        cdef np.ndarray samples = np.ascontiguousarray(state["samples"], dtype=np.uint32)
+        cdef np.ndarray leaves_start = np.ascontiguousarray(state["leaves_start"], dtype=np.intp)
+        cdef np.ndarray leaves_end = np.ascontiguousarray(state["leaves_end"], dtype=np.intp)
+        if samples.shape[0] != self.n_observations:
+            raise ValueError("Observations state does not match number of observations")
+        histograms = state["class_histograms"]
+        state = dict(state, class_histograms=np.zeros((0, self.n_classes)))
+        Observations.__setstate__(self, state)
+
+        cdef SIZE_t n_leaves = leaves_start.shape[0]
+        if self.n_observations > 0:
+            memcpy(self.samples, samples.data, self.n_observations * sizeof(UINT32_t))
+        self.leaves_count = 0
+        if n_leaves > self.leaves_capacity:
+            self._resize_leaves_ranges(n_leaves)
+        if n_leaves > 0:
+            memcpy(self.leaves_start, leaves_start.data, n_leaves * sizeof(SIZE_t))
+            memcpy(self.leaves_end, leaves_end.data, n_leaves * sizeof(SIZE_t))
+        self.leaves_count = n_leaves
+        self.reassign_start = 0
+        self.reassign_end = 0
+        self._set_class_histograms_ndarray(histograms)
+
+    cdef int initialize_observations(self, Node* nodes) nogil except -1:
+        cdef SIZE_t i
+        for i in range(self.n_observations):
+            self.samples[i] = i
+        self.reassign_start = 0
+        self.reassign_end = self.n_observations
+        self.weight_to_reassign = self._get_sample_weight_sum()
+        return self.reassign_observations(nodes, 0)
+
+    cdef int clear_observations(self, Node* nodes) nogil except -1:
+        self.remove_observations(nodes, 0)
+        self.reassign_start = 0
+        self.reassign_end = 0
+        self.proper_classified = 0
+        self.weight_to_reassign = 0
+        return 0
+
+    cdef int _remove_observations_in_leaf(self, SIZE_t leaves_id, SIZE_t leaf_class) nogil except -1:
+        cdef DOUBLE_t* class_histogram = self.get_class_histogram(leaves_id)
+        cdef SIZE_t class_id = self.get_class_id(leaf_class)
+        cdef SIZE_t i
+        if class_id != _NOT_CLASSIFIED:
+            self.proper_classified -= class_histogram[class_id]
+        for i in range(self.n_classes):
+            self.weight_to_reassign += class_histogram[i]
+
+        # leaves of removed subtree are next to each other in samples
+        if self.reassign_start == self.reassign_end:
+            self.reassign_start = self.leaves_start[leaves_id]
+            self.reassign_end = self.leaves_end[leaves_id]
+        else:
+            if self.leaves_start[leaves_id] < self.reassign_start:
+                self.reassign_start = self.leaves_start[leaves_id]
+            if self.leaves_end[leaves_id] > self.reassign_end:
+                self.reassign_end = self.leaves_end[leaves_id]
+        return self._push_empty_leaves_ids(leaves_id)
+
+    cdef int reassign_observations(self, Node* nodes, SIZE_t below_node_id) nogil except -1:
+        if self._partition(nodes, below_node_id, self.reassign_start, self.reassign_end) == 1:
+            return 1
+        self.reassign_start = 0
+        self.reassign_end = 0
+        self.weight_to_reassign = 0
+        # there could be no observations to reassign
+        return 1 if self.cannot_reach_racing_cut() else 0
+
+    cdef int _partition(self, Node* nodes, SIZE_t node_id, SIZE_t start, SIZE_t end) nogil except -1:
+        cdef SIZE_t i
+        cdef SIZE_t j
+        cdef SIZE_t leaves_id
+        cdef SIZE_t feature
+        cdef DOUBLE_t threshold
+        cdef UINT32_t y_id
+        cdef DOUBLE_t* class_histogram
+
+        if nodes[node_id].left_child == _TREE_LEAF:
+            if start == end:  # leaf without observations
+                nodes[node_id].right_child = _TREE_LEAF
+                return 0
+            leaves_id = self._new_leaves_id()
+            self.leaves_start[leaves_id] = start
+            self.leaves_end[leaves_id] = end
+            class_histogram = self.get_class_histogram(leaves_id)
+            for i in range(self.n_classes):
+                class_histogram[i] = 0
+            for i in range(start, end):
+                y_id = self.samples[i]
+                class_histogram[self.y_class_ids[y_id]] += self.sample_weight[y_id]
+            i = self.get_class_id(nodes[node_id].feature)   # feature means class
+            if i != _NOT_CLASSIFIED:
+                self.proper_classified += class_histogram[i]
+            nodes[node_id].right_child = leaves_id
+            for i in range(self.n_classes):
+                self.weight_to_reassign -= class_histogram[i]
+            return 1 if self.cannot_reach_racing_cut() else 0
+
+        # observations going to left child are moved to the beginning of range
+        feature = nodes[node_id].feature
+        threshold = nodes[node_id].threshold
+        i = start
+        j = end
+        while i < j:
+            if self.leaf_finder.get_value(self.samples[i], feature) <= threshold:
+                i += 1
+            else:
+                j -= 1
+                y_id = self.samples[i]
+                self.samples[i] = self.samples[j]
+                self.samples[j] = y_id
+
+        if self._partition(nodes, nodes[node_id].left_child, start, i) == 1:
+            return 1
+        return self._partition(nodes, nodes[node_id].right_child, i, end)
+
+    cdef SIZE_t _new_leaves_id(self) nogil except -1:
+        cdef SIZE_t leaves_id = self._pop_empty_leaves_ids()
+        if leaves_id != -1:
+            return leaves_id
+
+        if self.leaves_count >= self.leaves_capacity:
+            self._resize_leaves_ranges(3 if self.leaves_capacity == 0 else 2 * self.leaves_capacity)
+        self.leaves_count += 1
+        return self.leaves_count - 1
+
+    cdef int _resize_leaves_ranges(self, SIZE_t n_leaves) nogil except -1:
+        cdef size_t old_nbytes = self.leaves_capacity * sizeof(SIZE_t)
+        cdef size_t nbytes = n_leaves * sizeof(SIZE_t)
+        self.leaves_start = <SIZE_t*> pool_realloc(self.leaves_start, old_nbytes, nbytes, NULL)
+        self.leaves_end = <SIZE_t*> pool_realloc(self.leaves_end, old_nbytes, nbytes, NULL)
+        self.leaves_capacity = n_leaves
+        return self._resize_class_histograms(n_leaves)
+
+
+cdef FlatObservations _copy_flat_observations(FlatObservations observations):
+    cdef FlatObservations observations_copied = FlatObservations(observations.X, observations.y,
+                                                                 observations.sample_weight,
+                                                                 observations.classes, observations.y_class_ids)
+    cdef SIZE_t n_leaves = observations.leaves_count
+    with nogil:
+        memcpy(observations_copied.samples, observations.samples,
+               observations.n_observations * sizeof(UINT32_t))
+        if n_leaves > 0:
+            observations_copied._resize_leaves_ranges(n_leaves)
+            memcpy(observations_copied.leaves_start, observations.leaves_start, n_leaves * sizeof(SIZE_t))
+            memcpy(observations_copied.leaves_end, observations.leaves_end, n_leaves * sizeof(SIZE_t))
+            memcpy(observations_copied.class_histograms, observations.class_histograms,
+                   n_leaves * observations.n_classes * sizeof(DOUBLE_t))
+        observations_copied.leaves_count = n_leaves
+        copy_int_array(observations.empty_leaves_ids, observations_copied.empty_leaves_ids)
+    observations_copied.reassign_start = observations.reassign_start
+    observations_copied.reassign_end = observations.reassign_end
+    observations_copied.proper_classified = observations.proper_classified
+    return observations_copied
+
+
+cdef int _compare_keys(const void* a, const void* b) nogil:
+    cdef UINT64_t key_a = (<UINT64_t*> a)[0]
+    cdef UINT64_t key_b = (<UINT64_t*> b)[0]
+    return (key_a > key_b) - (key_a < key_b)
+
+
 cdef class LeafFinder:
     def __cinit__(self, object X):
-        cdef DTYPE_t[:, :] X_ndarray
+        cdef const DTYPE_t[:, :] X_ndarray
         if issparse(X):
             self.issparse_X = 1
             self.X = X
+            X = X.tocsr()
+            if not X.has_sorted_indices:
+                X = X.sorted_indices()
+            self.X_data = np.ascontiguousarray(X.data, dtype=np.float32)
+            self.X_indices = np.ascontiguousarray(X.indices, dtype=np.int32)
+            self.X_indptr = np.ascontiguousarray(X.indptr, dtype=np.int32)
         else:
             self.issparse_X = 0
             X_ndarray = X
@@ -418,35 +1091,51 @@ cdef class LeafFinder:
         else:
             return self._find_leaf_for_observation_dense(nodes, y_id, below_node_id)
 
+    cdef DTYPE_t get_value(self, SIZE_t y_id, SIZE_t feature) nogil:
+        if self.issparse_X == 0:
+            return self.X_ndarray[y_id, feature]
+        return self._get_value_sparse(y_id, feature)
+
+    cdef DTYPE_t _get_value_sparse(self, SIZE_t y_id, SIZE_t feature) nogil:
+        # binary search of feature in sorted indices of the row
+        cdef SIZE_t low = self.X_indptr[y_id]
+        cdef SIZE_t end = self.X_indptr[y_id + 1]
+        cdef SIZE_t high = end
+        cdef SIZE_t middle
+        while low < high:
+            middle = (low + high) >> 1
+            if self.X_indices[middle] < feature:
+                low = middle + 1
+            else:
+                high = middle
+        if low < end and self.X_indices[low] == feature:
+            return self.X_data[low]
+        return 0
+
     cdef SIZE_t _find_leaf_for_observation_dense(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id) nogil:
         cdef SIZE_t current_node_id = below_node_id
         cdef SIZE_t feature
         cdef DOUBLE_t threshold
-        with nogil:
-            while nodes[current_node_id].left_child != _TREE_LEAF:
-                feature = nodes[current_node_id].feature
-                threshold = nodes[current_node_id].threshold
-                if self.X_ndarray[y_id, feature] <= threshold:
-                    current_node_id = nodes[current_node_id].left_child
-                else:
-                    current_node_id = nodes[current_node_id].right_child
+        while nodes[current_node_id].left_child != _TREE_LEAF:
+            feature = nodes[current_node_id].feature
+            threshold = nodes[current_node_id].threshold
+            if self.X_ndarray[y_id, feature] <= threshold:
+                current_node_id = nodes[current_node_id].left_child
+            else:
+                current_node_id = nodes[current_node_id].right_child
         return current_node_id
 
     cdef SIZE_t _find_leaf_for_observation_sparse(self, Node* nodes, SIZE_t y_id, SIZE_t below_node_id) nogil:
         cdef SIZE_t current_node_id = below_node_id
         cdef SIZE_t feature
         cdef DOUBLE_t threshold
-        cdef DTYPE_t[:] X_row
-        with gil:
-             X_row = self.X[y_id, :].toarray()[0]
-        with nogil:
-            while nodes[current_node_id].left_child != _TREE_LEAF:
-                feature = nodes[current_node_id].feature
-                threshold = nodes[current_node_id].threshold
-                if X_row[feature] <= threshold:
-                    current_node_id = nodes[current_node_id].left_child
-                else:
-                    current_node_id = nodes[current_node_id].right_child
+        while nodes[current_node_id].left_child != _TREE_LEAF:
+            feature = nodes[current_node_id].feature
+            threshold = nodes[current_node_id].threshold
+            if self._get_value_sparse(y_id, feature) <= threshold:
+                current_node_id = nodes[current_node_id].left_child
+            else:
+                current_node_id = nodes[current_node_id].right_child
         return current_node_id
 
     def test_find_leaf_dense(self, Tree tree):
@@ -470,4 +1159,39 @@ cdef class LeafFinder:
         for i in range(shape):
             node_id = self.find_leaf_for_observation(tree.nodes.elements, i, 0)
             y[i] = node_id
-        return y
\ No newline at end of file
+        return y
+
+
+cdef class FeatureIndex:
+    """
+    Ids of observations sorted by values of each feature of dense X. It is
+    built once per fit and shared by population, so observations with values
+    between two thresholds are found by binary search.
+
+    Args:
+        X: dense array of type float32 (with less than 2**32 observations)
+        n_jobs: number of threads used to sort features
+    """
+    def __cinit__(self, object X, int n_jobs=1):
+        self.X = X
+        self.n_observations = X.shape[0]
+        self.sorted_ids_ndarray = np.empty((X.shape[1], X.shape[0]), dtype=np.uint32)
+        cdef np.ndarray sorted_ids = self.sorted_ids_ndarray
+        self.sorted_ids = <UINT32_t*> sorted_ids.data
+
+        # numpy releases GIL during sorting, so blocks of features are run in threads
+        n_blocks = min(get_n_threads(n_jobs), X.shape[1])
+        bounds = np.linspace(0, X.shape[1], n_blocks + 1).astype(np.intp).tolist()
+        map_in_threads(partial(_sort_features_in_block, X, self.sorted_ids_ndarray),
+                       list(zip(bounds[:n_blocks], bounds[1:])), n_jobs)
+
+    cdef UINT32_t* get_sorted_ids(self, SIZE_t feature) nogil:
+        return self.sorted_ids + feature * self.n_observations
+
+    def get_sorted_ids_ndarray(self, SIZE_t feature):
+        return self.sorted_ids_ndarray[feature]
+
+
+def _sort_features_in_block(X, sorted_ids, block):
+    for i in range(block[0], block[1]):
+        sorted_ids[i] = np.argsort(X[:, i], kind="stable")
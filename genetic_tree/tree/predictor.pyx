@@ -0,0 +1,254 @@
+# cython: boundscheck=False
+# cython: wraparound=False
+
+from functools import partial
+
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+from .tree cimport Tree
+from .observations cimport LeafFinder
+from ..genetic.parallel import get_n_threads, map_in_threads
+
+ctypedef np.npy_int32 INT32_t
+ctypedef np.npy_float32 FLOAT32_t
+ctypedef np.npy_intp SIZE_t
+
+# minimal number of rows processed by one thread
+MIN_BLOCK_SIZE = 10000
+
+
+cdef class CompiledTree:
+    """
+    Inference-only version of fitted tree. Decision nodes are kept in breadth
+    first order in parallel int32/float32 arrays (12 bytes per node instead of
+    48 bytes of Node), children that are leaves are encoded as negative
+    numbers (~leaf_id) and classes and probabilities are kept only for
+    leaves. Rows are split into blocks traversed without GIL in threads.
+
+    Args:
+        tree: Tree prepared to prediction (after prepare_tree_to_prediction)
+
+    Returns:
+        CompiledTree: predictor with the same results as tree
+    """
+    cdef readonly np.ndarray children_left
+    cdef readonly np.ndarray children_right
+    cdef readonly np.ndarray feature
+    cdef readonly np.ndarray threshold
+    cdef readonly np.ndarray leaf_node_ids
+    cdef readonly np.ndarray leaf_classes
+    cdef readonly np.ndarray leaf_probabilities
+    cdef readonly SIZE_t n_features_required     # the greatest feature used + 1
+
+    # pointers to data of arrays above, used in serving path
+    cdef SIZE_t n_decision_nodes
+    cdef INT32_t* _children_left
+    cdef INT32_t* _children_right
+    cdef INT32_t* _feature
+    cdef FLOAT32_t* _threshold
+    cdef SIZE_t* _leaf_classes
+
+    def __init__(self, Tree tree):
+        children_left = tree.children_left
+        children_right = tree.children_right
+        is_leaf = children_left == -1
+
+        # breadth first numbering of decision nodes and leaves
+        node_ids = [0]
+        decision_nodes = []
+        leaves = []
+        for node_id in node_ids:
+            if is_leaf[node_id]:
+                leaves.append(node_id)
+            else:
+                decision_nodes.append(node_id)
+                node_ids.append(children_left[node_id])
+                node_ids.append(children_right[node_id])
+        new_ids = np.empty(children_left.shape[0], dtype=np.int32)
+        new_ids[decision_nodes] = np.arange(len(decision_nodes), dtype=np.int32)
+        new_ids[leaves] = ~np.arange(len(leaves), dtype=np.int32)
+
+        self._set_arrays(new_ids[children_left[decision_nodes]],
+                         new_ids[children_right[decision_nodes]],
+                         tree.feature[decision_nodes].astype(np.int32),
+                         self._to_float32_thresholds(tree.threshold[decision_nodes]),
+                         np.array(leaves, dtype=np.intp),
+                         tree.feature[leaves],
+                         tree.probabilities[leaves])
+
+    def _set_arrays(self, children_left, children_right, feature, threshold,
+                    leaf_node_ids, leaf_classes, leaf_probabilities):
+        self.children_left = np.ascontiguousarray(children_left, dtype=np.int32)
+        self.children_right = np.ascontiguousarray(children_right, dtype=np.int32)
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.leaf_node_ids = np.ascontiguousarray(leaf_node_ids, dtype=np.intp)
+        self.leaf_classes = np.ascontiguousarray(leaf_classes, dtype=np.intp)
+        self.leaf_probabilities = np.ascontiguousarray(leaf_probabilities, dtype=np.float32)
+        # returned rows of probabilities are views, so they cannot be changed
+        self.leaf_probabilities.flags.writeable = False
+        self.n_decision_nodes = self.feature.shape[0]
+        self.n_features_required = np.max(self.feature) + 1 if self.n_decision_nodes > 0 else 0
+
+        self._children_left = <INT32_t*> self.children_left.data
+        self._children_right = <INT32_t*> self.children_right.data
+        self._feature = <INT32_t*> self.feature.data
+        self._threshold = <FLOAT32_t*> self.threshold.data
+        self._leaf_classes = <SIZE_t*> self.leaf_classes.data
+
+    @staticmethod
+    def from_arrays(children_left, children_right, feature, threshold,
+                    leaf_node_ids, leaf_classes, leaf_probabilities):
+        """
+        Creates CompiledTree from its arrays (e.g. memory-mapped from file);
+        arrays with proper dtypes are used without copying
+        """
+        return _rebuild_compiled_tree(children_left, children_right, feature, threshold,
+                                      leaf_node_ids, leaf_classes, leaf_probabilities)
+
+    def __reduce__(self):
+        return (_rebuild_compiled_tree, (self.children_left, self.children_right, self.feature,
+                                         self.threshold, self.leaf_node_ids, self.leaf_classes,
+                                         self.leaf_probabilities))
+
+    @staticmethod
+    def _to_float32_thresholds(thresholds):
+        # the greatest float32 not greater than threshold, so float32 value of
+        # observation x <= threshold exactly as in tree
+        thresholds_float32 = thresholds.astype(np.float32)
+        too_big = thresholds_float32 > thresholds
+        thresholds_float32[too_big] = np.nextafter(thresholds_float32[too_big], np.float32(-np.inf))
+        return thresholds_float32
+
+    @property
+    def n_leaves(self) -> int:
+        return self.leaf_node_ids.shape[0]
+
+    def find_leaves(self, X, n_jobs: int = 1) -> np.ndarray:
+        """
+        Args:
+            X: dataset of type float32 (dense or sparse)
+            n_jobs: number of threads
+
+        Returns:
+            id of leaf (in leaf-only arrays) of each observation in X
+        """
+        cdef SIZE_t n_observations = X.shape[0]
+        leaves = np.zeros(n_observations, dtype=np.int32)
+        if self.n_decision_nodes == 0:  # tree with one leaf
+            return leaves
+        leaf_finder = LeafFinder(X)
+        n_blocks = min(get_n_threads(n_jobs), n_observations // MIN_BLOCK_SIZE)
+        if n_blocks <= 1:
+            self._find_leaves_in_block(leaf_finder, leaves, (0, n_observations))
+        else:
+            bounds = np.linspace(0, n_observations, n_blocks + 1).astype(np.intp).tolist()
+            map_in_threads(partial(self._find_leaves_in_block, leaf_finder, leaves),
+                           list(zip(bounds[:n_blocks], bounds[1:])), n_jobs)
+        return leaves
+
+    cpdef object predict_one(self, object x, bint proba=False):
+        """
+        Predicts class (or probabilities of classes) of one observation
+        without validation of input and without allocations
+
+        Args:
+            x: 1-D vector of features (float32 array avoids conversion)
+            proba: if return row of probabilities instead of class
+
+        Returns:
+            class or read-only row of probabilities
+        """
+        cdef INT32_t leaf_id = self._find_leaf_of_row(self._as_row(x))
+        if proba:
+            return self.leaf_probabilities[leaf_id]
+        return self._leaf_classes[leaf_id]
+
+    cpdef np.ndarray predict_small(self, object X, bint proba=False):
+        """
+        Predicts classes (or probabilities of classes) of small dense batch of
+        observations without validation of input
+
+        Args:
+            X: 2-D array of observations (float32 array avoids conversion)
+            proba: if return probabilities instead of classes
+
+        Returns:
+            array of classes or array of probabilities
+        """
+        cdef const FLOAT32_t[:, :] X_ndarray
+        try:
+            X_ndarray = X
+        except (ValueError, TypeError):
+            X_ndarray = np.asarray(X, dtype=np.float32)
+        if X_ndarray.shape[1] < self.n_features_required:
+            raise ValueError(f"Observations should have at least {self.n_features_required} features")
+        cdef np.ndarray leaves = np.empty(X_ndarray.shape[0], dtype=np.intp)
+        cdef SIZE_t* leaves_ptr = <SIZE_t*> leaves.data
+        cdef SIZE_t i
+        for i in range(X_ndarray.shape[0]):
+            leaves_ptr[i] = self._find_leaf_of_row(X_ndarray[i])
+        if proba:
+            return self.leaf_probabilities[leaves]
+        return self.leaf_classes[leaves]
+
+    cdef const FLOAT32_t[:] _as_row(self, object x) except *:
+        cdef const FLOAT32_t[:] row
+        try:
+            row = x
+        except (ValueError, TypeError):
+            row = np.asarray(x, dtype=np.float32)
+        if row.shape[0] < self.n_features_required:
+            raise ValueError(f"Observation should have at least {self.n_features_required} features")
+        return row
+
+    cdef INT32_t _find_leaf_of_row(self, const FLOAT32_t[:] row) nogil:
+        cdef INT32_t node_id = 0
+        if self.n_decision_nodes == 0:  # tree with one leaf
+            return 0
+        while node_id >= 0:
+            if row[self._feature[node_id]] <= self._threshold[node_id]:
+                node_id = self._children_left[node_id]
+            else:
+                node_id = self._children_right[node_id]
+        return ~node_id
+
+    def _find_leaves_in_block(self, LeafFinder leaf_finder, INT32_t[:] leaves, block):
+        _find_leaves(self.children_left, self.children_right, self.feature, self.threshold,
+                     leaf_finder, leaves, block[0], block[1])
+
+    def apply(self, X, n_jobs: int = 1) -> np.ndarray:
+        """
+        Returns:
+            id of leaf (node id in original tree) of each observation in X
+        """
+        return self.leaf_node_ids[self.find_leaves(X, n_jobs)]
+
+    def predict(self, X, n_jobs: int = 1) -> np.ndarray:
+        return self.leaf_classes[self.find_leaves(X, n_jobs)]
+
+    def predict_proba(self, X, n_jobs: int = 1) -> np.ndarray:
+        return self.leaf_probabilities[self.find_leaves(X, n_jobs)]
+
+def _rebuild_compiled_tree(*arrays):
+    cdef CompiledTree compiled_tree = CompiledTree.__new__(CompiledTree)
+    compiled_tree._set_arrays(*arrays)
+    return compiled_tree
+
+
+cdef void _find_leaves(const INT32_t[:] children_left, const INT32_t[:] children_right,
+                       const INT32_t[:] feature, const FLOAT32_t[:] threshold, LeafFinder leaf_finder,
+                       INT32_t[:] leaves, SIZE_t start, SIZE_t end):
+    cdef SIZE_t y_id
+    cdef INT32_t node_id
+    with nogil:
+        for y_id in range(start, end):
+            node_id = 0
+            while node_id >= 0:
+                if leaf_finder.get_value(y_id, feature[node_id]) <= threshold[node_id]:
+                    node_id = children_left[node_id]
+                else:
+                    node_id = children_right[node_id]
+            leaves[y_id] = ~node_id
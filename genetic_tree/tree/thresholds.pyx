@@ -1,51 +1,180 @@
+# cython: boundscheck=False
+# cython: wraparound=False
+
+from collections import OrderedDict
+from functools import partial
+import hashlib
+
 import numpy as np
 cimport numpy as np
 from scipy.sparse import issparse
 
+from ..genetic.parallel import get_n_threads, get_row_blocks, is_out_of_core, map_in_threads, read_rows
+
 from numpy import float32 as DTYPE
 ctypedef np.npy_float32 DTYPE_t
+ctypedef np.npy_intp SIZE_t
+
+# thresholds of recently used datasets (fingerprint -> thresholds)
+_thresholds_cache = OrderedDict()
+THRESHOLDS_CACHE_SIZE = 8
+# number of rows of X hashed to its fingerprint
+FINGERPRINT_SAMPLE_SIZE = 1024
+# thresholds of out-of-core X with more rows are found in every k-th row of it
+THRESHOLDS_SAMPLE_SIZE = 2**20
+
+
+cpdef DTYPE_t[:, :] prepare_thresholds_array(int n_thresholds, object X,
+                                             int n_jobs=1, bint use_cache=0):
+    """
+    Finds thresholds of each feature as quantiles of its values
+
+    Args:
+        n_thresholds: number of thresholds of each feature
+        X: dataset (dense or sparse)
+        n_jobs: number of threads used to find thresholds of dense X
+        use_cache: if reuse thresholds found previously for the same X \
+        (recognized by fingerprint of sample of its values, see get_fingerprint)
+
+    Returns:
+        array of shape [n_thresholds x n_features]
+    """
+    cdef DTYPE_t[:, :] thresholds
+    if use_cache:
+        key = (get_fingerprint(X), n_thresholds)
+        if key in _thresholds_cache:
+            _thresholds_cache.move_to_end(key)
+            return _thresholds_cache[key]
+    if issparse(X):
+        thresholds = prepare_thresholds_array_sparse(n_thresholds, X)
+    else:
+        thresholds = prepare_thresholds_array_dense(n_thresholds, X, n_jobs)
+    if use_cache:
+        _thresholds_cache[key] = thresholds
+        if len(_thresholds_cache) > THRESHOLDS_CACHE_SIZE:
+            _thresholds_cache.popitem(last=False)
+    return thresholds
+
+
+def clear_thresholds_cache():
+    _thresholds_cache.clear()
+
 
-cpdef DTYPE_t[:, :] prepare_thresholds_array(int n_thresholds, object X):
+def get_fingerprint(object X, bint sample=True) -> str:
+    """
+    Hashes type, shape and dtype of X and its values. With sample the
+    fingerprint is found in constant time, so it does not read the whole X
+    (which can be memory-mapped from disk): only values of
+    FINGERPRINT_SAMPLE_SIZE evenly spaced rows (the first and the last one
+    included) are hashed. For sparse X number of non-zeros and evenly spaced
+    stored values and indices are hashed instead of rows.
+
+    Changes of values of rows that are not sampled are not detected, so
+    sampled fingerprint is only used to find cached thresholds. Without
+    sample all values are hashed (dense X by row blocks), so it can be used
+    to check that data was not changed (as checkpoints do).
+
+    Args:
+        X: dense or sparse array
+        sample: if hash only sample of values of X
+
+    Returns:
+        hash of shape, type and (sample of) values of X
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    fingerprint.update(repr((type(X).__name__, X.shape, X.dtype.str)).encode())
+    get_values = _get_sample if sample else _get_all
     if issparse(X):
-        return prepare_thresholds_array_sparse(n_thresholds, X)
+        if X.format not in ("csr", "csc"):
+            X = X.tocsr()
+        fingerprint.update(repr(X.nnz).encode())
+        arrays = [get_values(X.data), get_values(X.indices), get_values(X.indptr)]
     else:
-        return prepare_thresholds_array_dense(n_thresholds, X)
+        arrays = [get_values(X)]
+    for array in arrays:
+        for block in array:
+            fingerprint.update(np.ascontiguousarray(block).data)
+    return fingerprint.hexdigest()
+
+
+def _get_sample(array):
+    if array.shape[0] > FINGERPRINT_SAMPLE_SIZE:
+        array = array[np.linspace(0, array.shape[0] - 1, FINGERPRINT_SAMPLE_SIZE).astype(np.intp)]
+    return [array]
+
+
+def _get_all(array):
+    # rows are read by blocks, so memory-mapped X is not copied to memory
+    if array.ndim == 1:
+        return [array]
+    return [array[start:end] for start, end in get_row_blocks(array)]
 
 
-cpdef DTYPE_t[:, :] prepare_thresholds_array_dense(int n_thresholds, object X):
+cpdef DTYPE_t[:, :] prepare_thresholds_array_dense(int n_thresholds, object X, int n_jobs=1):
+    # numpy releases GIL during sorting, so blocks of features are run in threads
+    if is_out_of_core(X):
+        # column of X read from disk is spread over the whole file, so
+        # (sampled) rows are copied to memory by blocks
+        X = read_rows(X, max((X.shape[0] + THRESHOLDS_SAMPLE_SIZE - 1) // THRESHOLDS_SAMPLE_SIZE, 1))
     cdef int n_features = X.shape[1]
+    cdef SIZE_t n_observations = X.shape[0]
 
-    cdef DTYPE_t[:, :] thresholds = np.zeros([n_thresholds, n_features], dtype=DTYPE)
-    cdef DTYPE_t[:, :] X_ndarray = X
-    cdef DTYPE_t[:] X_column
+    thresholds = np.zeros([n_thresholds, n_features], dtype=DTYPE)
+    if n_features == 0 or n_thresholds == 0:
+        return thresholds
+    indices = np.array([int(n_observations / (n_thresholds+1) * (j+1)) for j in range(n_thresholds)],
+                       dtype=np.intp)
 
-    cdef int i
-    cdef int j
-    cdef int index
-
-    for i in range(n_features):
-        X_column = X_ndarray[:, i]
-        X_column = np.sort(X_column)
-        for j in range(n_thresholds):
-            index = int(X_column.shape[0] / (n_thresholds+1) * (j+1))
-            thresholds[j, i] = X_column[index]
+    n_blocks = min(get_n_threads(n_jobs), n_features)
+    bounds = np.linspace(0, n_features, n_blocks + 1).astype(np.intp).tolist()
+    blocks = list(zip(bounds[:n_blocks], bounds[1:]))
+    map_in_threads(partial(_find_thresholds_in_block, X, indices, thresholds), blocks, n_jobs)
     return thresholds
 
 
+def _find_thresholds_in_block(X, indices, thresholds, block):
+    for i in range(block[0], block[1]):
+        thresholds[:, i] = np.sort(X[:, i])[indices]
+
+
 cpdef DTYPE_t[:, :] prepare_thresholds_array_sparse(int n_thresholds, object X):
+    # Thresholds are found in sorted non-zero values of each column. Sorted
+    # column (as in dense version) consists of negative values, then implicit
+    # zeros and then other values, so columns are never densified.
     cdef int n_features = X.shape[1]
+    cdef SIZE_t n_observations = X.shape[0]
 
     cdef DTYPE_t[:, :] thresholds = np.zeros([n_thresholds, n_features], dtype=DTYPE)
-    cdef DTYPE_t[:] X_column
+
+    X = X.tocsc()
+    if not X.has_canonical_format:
+        X = X.copy()
+        X.sum_duplicates()
+    cdef SIZE_t[:] indptr = X.indptr.astype(np.intp)
+    columns = np.repeat(np.arange(n_features), np.diff(X.indptr))
+    cdef DTYPE_t[:] data = X.data.astype(DTYPE)
+    data = np.asarray(data)[np.lexsort((data, columns))]     # sorted by values in each column
 
     cdef int i
     cdef int j
-    cdef int index
-
-    for i in range(n_features):
-        X_column = X[:, i].toarray()[:, 0]
-        X_column = np.sort(X_column)
-        for j in range(n_thresholds):
-            index = int(X_column.shape[0] / (n_thresholds+1) * (j+1))
-            thresholds[j, i] = X_column[index]
+    cdef SIZE_t index
+    cdef SIZE_t start
+    cdef SIZE_t n_negatives
+    cdef SIZE_t n_zeros
+
+    with nogil:
+        for i in range(n_features):
+            start = indptr[i]
+            n_zeros = n_observations - (indptr[i+1] - start)
+            n_negatives = 0
+            while start + n_negatives < indptr[i+1] and data[start + n_negatives] < 0:
+                n_negatives += 1
+            for j in range(n_thresholds):
+                index = <SIZE_t> (n_observations / <double> (n_thresholds+1) * (j+1))
+                if index < n_negatives:
+                    thresholds[j, i] = data[start + index]
+                elif index < n_negatives + n_zeros:
+                    thresholds[j, i] = 0
+                else:
+                    thresholds[j, i] = data[start + index - n_zeros]
     return thresholds
@@ -16,7 +16,7 @@
 import numpy as np
 cimport numpy as np
 
-from .observations cimport Observations
+from .observations cimport Observations, LeafFinder, FeatureIndex, UINT32_t
 from .observations import Observations
 from ._utils cimport Node, NodeArray, IntArray, resize, resize_c
 
@@ -41,12 +41,20 @@ cdef class Tree:
     cdef IntArray* removed_nodes
 
     cdef Observations observations      # Class with y array metadata
+    cdef public bint flat_observations  # If observations are kept in FlatObservations
     cdef public object probabilities    # Probabilities of classes in nodes
+    cdef public object fitness_cache    # Cache of fitness of tree structures shared by population (or None)
+    cdef public object feature_index    # FeatureIndex of X shared by population (or None)
+    cdef bint observations_pending      # If observations are not assigned, because fitness was found in cache
+    cdef bint observations_shared       # If observations are shared with other trees (copied before first change)
+    cdef public DOUBLE_t racing_cut     # Changed tree is rejected if it cannot reach this proper_classified (0 - no racing)
+    cdef bint rejected                  # If changed tree was rejected (its observations are not assigned to the end)
 
     cdef public DTYPE_t[:, :] thresholds    # Array with possible thresholds for each feature
     cdef public object X                    # Array with observations features (TODO: possibility of sparse array)
     cdef public SIZE_t[:] y                 # Array with classes of observations
     cdef public SIZE_t[:] classes           # Array with unique classes
+    cdef public object y_class_ids          # Index of class in classes of each observation (shared by population)
     cdef public DTYPE_t[:] sample_weight    # Array with sample_weight of observations
 
     cdef uint64_t seed1
@@ -61,7 +69,7 @@ cdef class Tree:
                           SIZE_t feature, double threshold, SIZE_t depth,
                           SIZE_t class_number) nogil except -1
 
-    cdef SIZE_t mark_nodes_as_removed(self, SIZE_t node_id)
+    cdef int mark_nodes_as_removed(self, SIZE_t node_id) nogil except -1
     cdef SIZE_t compact_removed_nodes(self, SIZE_t crossover_point) nogil
     cdef void _copy_node(self, Node* from_node, SIZE_t from_node_id, Node* to_node, SIZE_t to_node_id) nogil
 
@@ -69,6 +77,7 @@ cdef class Tree:
 
     cdef change_feature_or_class(self, SIZE_t node_id, SIZE_t new_feature)
     cdef change_threshold(self, SIZE_t node_id, DOUBLE_t new_threshold)
+    cdef int move_threshold(self, SIZE_t node_id, DOUBLE_t new_threshold) except -1
 
     # Random functions
     cdef SIZE_t randint_c(self, SIZE_t lb, SIZE_t ub) nogil
@@ -80,14 +89,28 @@ cdef class Tree:
     cdef SIZE_t get_new_random_class(self, SIZE_t last_class)
 
     # Observations functions
+    cdef Observations _create_observations(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight)
     cpdef initialize_observations(self)
+    cpdef initialize_observations_in_rows(self, SIZE_t start, SIZE_t end)
+    cpdef assign_pending_observations(self)
+    cpdef materialize(self)
+    cdef int update_fitness(self, SIZE_t below_node_id) except -1
+    cpdef uint64_t structure_hash(self)
+    cdef uint64_t _hash_subtree(self, SIZE_t node_id, uint64_t hash_value) nogil
 
     # Prediction functions
     cpdef prepare_tree_to_prediction(self)
     cpdef void remove_variables(self)
-    cpdef void prepare_new_fit(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight, DTYPE_t[:, :] thresholds)
+    cdef void _release_observations(self)
+    cpdef void prepare_new_fit(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight, DTYPE_t[:, :] thresholds,
+                               bint assign_observations=*, object y_class_ids=*)
+    cpdef void stream_observations(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight, DTYPE_t[:, :] thresholds,
+                                   SIZE_t[:] y_class_ids, SIZE_t expired_start, DTYPE_t[:] expired_weight,
+                                   SIZE_t new_start)
 
-    cpdef np.ndarray apply(self, object X)
+    cpdef np.ndarray apply(self, object X, int n_jobs=*)
+    cdef void _apply_rows(self, LeafFinder leaf_finder, SIZE_t[:] nodes, SIZE_t start, SIZE_t end)
 
 
-cpdef Tree copy_tree(Tree tree, bint same_seed=*)
+cpdef Tree copy_tree(Tree tree, bint same_seed=*, object seed=*)
+cpdef Tree share_tree(Tree tree, object seed=*)
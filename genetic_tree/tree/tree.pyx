@@ -31,9 +31,13 @@ from libc.string cimport memcpy
 from libc.stdint cimport SIZE_MAX
 
 from ._utils cimport safe_realloc
+from ._utils cimport pool_resize, pool_free_array
 
 from .observations cimport  LeafFinder
-from .observations import Observations, copy_observations
+from .observations import Observations, FlatObservations, copy_observations
+from ..genetic.parallel import get_n_threads, get_row_blocks, is_out_of_core, map_in_threads
+
+from functools import partial
 
 import numpy as np
 cimport numpy as np
@@ -54,10 +58,20 @@ cdef extern from "numpy/arrayobject.h":
 TREE_LEAF = -1
 TREE_UNDEFINED = -2
 NODE_REMOVED = -3
+# observations found in feature_index are read in random order, so they are
+# used only if there are this many times less of them than in the child
+cdef SIZE_t PRESORTED_BAND_COST = 16
 cdef SIZE_t _TREE_LEAF = TREE_LEAF
 cdef SIZE_t _TREE_UNDEFINED = TREE_UNDEFINED
 cdef SIZE_t _NODE_REMOVED = NODE_REMOVED
 
+# minimal number of rows processed by one thread in apply
+MIN_APPLY_BLOCK_SIZE = 10000
+
+# constants of 64-bit FNV-1a hash used in structure_hash
+cdef uint64_t FNV_OFFSET_BASIS = 14695981039346656037ULL
+cdef uint64_t FNV_PRIME = 1099511628211ULL
+
 # Repeat struct definition for numpy
 NODE_DTYPE = np.dtype({
     'names': ['left_child', 'right_child', 'parent', 'feature', 'threshold', 'depth'],
@@ -111,6 +125,18 @@ cdef class Tree:
         def __get__(self):
             return self.observations.proper_classified
 
+    property observations_pending:
+        def __get__(self):
+            return self.observations_pending
+
+    property observations_shared:
+        def __get__(self):
+            return self.observations_shared
+
+    property rejected:
+        def __get__(self):
+            return self.rejected
+
     property seeds:
         def __get__(self):
             return [self.seed1, self.seed2, self.seed3, self.seed4]
@@ -126,8 +152,17 @@ cdef class Tree:
                   SIZE_t[:] y,
                   DTYPE_t[:] sample_weight,
                   DTYPE_t[:, :] thresholds,
-                  uint64_t seed):
-        """Constructor."""
+                  uint64_t seed,
+                  bint flat_observations=0,
+                  object y_class_ids=None,
+                  bint create_observations=1):
+        """
+        Constructor. y_class_ids (index of class of each observation, see
+        get_y_class_ids) should be passed when trees of population are created,
+        so they are found once for y. If create_observations is false, tree
+        has no observations and they have to be set by the caller (as in
+        copy_tree and share_tree).
+        """
         self.n_features = X.shape[1]
         self.n_observations = X.shape[0]
         self.n_classes = classes.shape[0]
@@ -138,6 +173,9 @@ cdef class Tree:
         self.classes = classes
         self.sample_weight = sample_weight
         self.thresholds = thresholds
+        if y_class_ids is None:
+            y_class_ids = get_y_class_ids(classes, y)
+        self.y_class_ids = y_class_ids
 
         # Inner structures
         self.depth = 0
@@ -153,8 +191,18 @@ cdef class Tree:
         self.removed_nodes.count = 0
         self.removed_nodes.capacity = 0
         self.removed_nodes.elements = NULL
+        self.removed_nodes.refcount = NULL
 
-        self.observations = Observations(X, y, sample_weight)
+        self.flat_observations = flat_observations
+        self.observations = None
+        if create_observations:
+            self.observations = self._create_observations(X, y, sample_weight)
+        self.fitness_cache = None
+        self.feature_index = None
+        self.observations_pending = 0
+        self.observations_shared = 0
+        self.racing_cut = 0
+        self.rejected = 0
 
         self.seed1 = seed
         self.seed2 = 987654321
@@ -164,7 +212,7 @@ cdef class Tree:
     def __dealloc__(self):
         """Destructor."""
         # Free all inner structures
-        free(self.nodes.elements)
+        pool_free_array(self.nodes)
         free(self.nodes)
         free(self.removed_nodes.elements)
         free(self.removed_nodes)
@@ -183,6 +231,7 @@ cdef class Tree:
                empty_1d_array,
                empty_2d_array,
                self.seed1,
+               self.flat_observations,
                ), self.__getstate__())
 
     def __getstate__(self):
@@ -230,6 +279,33 @@ cdef class Tree:
 
         self.unpickle_nodes(node_ndarray)
 
+    def get_training_state(self) -> dict:
+        """
+        Returns:
+            state of tree together with its random state and observations \
+            assigned to leaves, which allows to resume training of the tree
+        """
+        self.assign_pending_observations()
+        state = self.__getstate__()
+        # nodes are copied, because the state can be saved after the tree is changed
+        state["nodes"] = state["nodes"].copy()
+        state["seeds"] = self.seeds
+        state["observations"] = self.observations.__getstate__()
+        return state
+
+    def set_training_state(self, state: dict):
+        """
+        Restores state returned by get_training_state. Tree must be created
+        with the same X, y and sample_weight as the tree the state was taken
+        from, because observations are not reassigned.
+        """
+        if state["n_observations"] != self.observations.n_observations:
+            raise ValueError("Training state does not match number of observations")
+        self.__setstate__(state)
+        self.seeds = state["seeds"]
+        self.materialize()
+        self.observations.__setstate__(state["observations"])
+
     def unpickle_nodes(self, node_ndarray):
         self.nodes.capacity = node_ndarray.shape[0]
         if resize_c(self.nodes, self.nodes.capacity) != 0:
@@ -237,6 +313,31 @@ cdef class Tree:
         nodes = memcpy(self.nodes.elements, (<np.ndarray> node_ndarray).data,
                        self.nodes.capacity * sizeof(Node))
 
+    def export_nodes(self):
+        """
+        Returns a copy of nodes as numpy structured array with NODE_DTYPE.
+        In leaves right_child (pointing to observations during fit) is set to
+        TREE_LEAF, so the array can be loaded by load_nodes in other tree.
+        """
+        node_ndarray = self._get_node_ndarray().copy()
+        is_leaf = node_ndarray['left_child'] == _TREE_LEAF
+        node_ndarray['right_child'][is_leaf] = _TREE_LEAF
+        return node_ndarray
+
+    def load_nodes(self, node_ndarray):
+        """
+        Sets nodes of empty tree to nodes from array returned by export_nodes.
+        Observations are not assigned, so after loading nodes there should be
+        called prepare_new_fit or initialize_observations.
+        """
+        if (node_ndarray.ndim != 1 or node_ndarray.shape[0] == 0 or
+                node_ndarray.dtype != NODE_DTYPE):
+            raise ValueError('Did not recognise loaded array layout')
+        node_ndarray = np.ascontiguousarray(node_ndarray)
+        self.nodes.count = node_ndarray.shape[0]
+        self.unpickle_nodes(node_ndarray)
+        self.depth = np.max(node_ndarray['depth'])
+
     cpdef resize_by_initial_depth(self, int initial_depth):
         if initial_depth <= 10:
             init_capacity = (2 ** (initial_depth + 1)) - 1
@@ -260,7 +361,7 @@ cdef class Tree:
             self.nodes.count -= 1  # because it will be added 1 at the end
 
         if node_id >= self.nodes.capacity:
-            if resize_c(self.nodes) != 0:
+            if pool_resize(self.nodes) != 0:
                 return SIZE_MAX
 
         cdef Node* node = &self.nodes.elements[node_id]
@@ -289,10 +390,9 @@ cdef class Tree:
 
         return node_id
 
-    cdef SIZE_t mark_nodes_as_removed(self, SIZE_t below_node_id):
+    cdef int mark_nodes_as_removed(self, SIZE_t below_node_id) nogil except -1:
         if self.removed_nodes.count >= self.removed_nodes.capacity:
-            if resize_c(self.removed_nodes) != 0:
-                return SIZE_MAX
+            resize_c(self.removed_nodes)
 
         self.removed_nodes.elements[self.removed_nodes.count] = below_node_id
         self.nodes.elements[below_node_id].parent = _NODE_REMOVED
@@ -302,6 +402,7 @@ cdef class Tree:
         if self.nodes.elements[below_node_id].left_child != _TREE_LEAF:
             self.mark_nodes_as_removed(self.nodes.elements[below_node_id].left_child)
             self.mark_nodes_as_removed(self.nodes.elements[below_node_id].right_child)
+        return 0
 
     cdef SIZE_t compact_removed_nodes(self, SIZE_t crossover_point) nogil:
         cdef SIZE_t i
@@ -378,6 +479,53 @@ cdef class Tree:
     def change_threshold_test(self, SIZE_t node_id, DOUBLE_t new_threshold):
         self.change_threshold(node_id, new_threshold)
 
+    cdef int move_threshold(self, SIZE_t node_id, DOUBLE_t new_threshold) except -1:
+        """
+        Changes threshold of decision node (on the same feature) and moves
+        only observations with values between old and new threshold between
+        children of the node. They are taken from leaves of the child that
+        loses them or, if there are much less of them in the whole dataset,
+        found in feature_index.
+
+        Returns:
+            1 if threshold was changed and fitness updated, 0 if observations \
+            of subtree have to be removed and assigned again
+        """
+        if self.observations is None or self.observations_pending or self.flat_observations:
+            return 0
+        self.materialize()
+        cdef Observations observations = self.observations
+        cdef Node* nodes = self.nodes.elements
+        cdef DOUBLE_t old_threshold = nodes[node_id].threshold
+        cdef SIZE_t child_id = nodes[node_id].right_child if new_threshold > old_threshold else nodes[node_id].left_child
+        cdef SIZE_t n_child_observations = observations.count_observations(nodes, child_id)
+        cdef FeatureIndex feature_index = None
+        cdef UINT32_t* sorted_ids = NULL
+        cdef SIZE_t start = 0
+        cdef SIZE_t end = 0
+        if self.feature_index is not None and self.feature_index.X is observations.X:
+            feature_index = self.feature_index
+            sorted_ids = feature_index.get_sorted_ids(nodes[node_id].feature)
+            with nogil:
+                start = observations.count_lower_or_equal(sorted_ids, nodes[node_id].feature,
+                                                          min(old_threshold, new_threshold))
+                end = observations.count_lower_or_equal(sorted_ids, nodes[node_id].feature,
+                                                        max(old_threshold, new_threshold))
+        with nogil:
+            if sorted_ids != NULL and (end - start) * PRESORTED_BAND_COST < n_child_observations:
+                observations.move_observations(nodes, node_id, new_threshold, sorted_ids, start, end)
+            else:
+                observations.move_observations_of_child(nodes, node_id, new_threshold, n_child_observations)
+        # the same condition as at the end of reassigning observations
+        if self.racing_cut > 0 and observations.proper_classified < self.racing_cut:
+            self.rejected = 1
+            return 1
+        self.update_fitness(-1)
+        return 1
+
+    def move_threshold_test(self, SIZE_t node_id, DOUBLE_t new_threshold):
+        return self.move_threshold(node_id, new_threshold)
+
 # ===========================================================================================================
 # Random functions
 # ===========================================================================================================
@@ -449,71 +597,268 @@ cdef class Tree:
 # Observations functions
 # ===========================================================================================================
     # initialization of observations
+    cdef Observations _create_observations(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight):
+        if self.flat_observations:
+            return FlatObservations(X, y, sample_weight, self.classes, self.y_class_ids)
+        return Observations(X, y, sample_weight, self.classes, self.y_class_ids)
+
     cpdef initialize_observations(self):
-        self.observations.initialize_observations(self)
+        self.materialize()
+        cdef Observations observations = self.observations
+        with nogil:
+            observations.initialize_observations(self.nodes.elements)
+        self.observations_pending = 0
+
+    cpdef initialize_observations_in_rows(self, SIZE_t start, SIZE_t end):
+        """
+        Assigns observations with ids in [start, end) to leaves, calling it for
+        consecutive blocks of rows of new tree is the same as calling
+        initialize_observations
+        """
+        self.materialize()
+        cdef Observations observations = self.observations
+        with nogil:
+            observations.append_observations(self.nodes.elements, start, end)
+        self.observations_pending = 0
+
+    cpdef assign_pending_observations(self):
+        """
+        Assigns observations to tree whose fitness was taken from fitness_cache
+        """
+        if self.observations_pending == 0:
+            return
+        self.materialize()
+        cdef Observations observations = self.observations
+        with nogil:
+            observations.clear_observations(self.nodes.elements)
+            observations.initialize_observations(self.nodes.elements)
+        self.observations_pending = 0
+
+    cpdef materialize(self):
+        """
+        Copies observations shared with other trees (by share_tree), it has to
+        be called before the tree is changed in place
+        """
+        if self.observations_shared == 0:
+            return
+        self.observations = copy_observations(self.observations)
+        self.observations_shared = 0
+
+    cdef int update_fitness(self, SIZE_t below_node_id) except -1:
+        """
+        Reassigns observations removed from subtree below below_node_id after
+        the tree was changed (-1 means that no observations were removed).
+        If fitness of the same tree structure is in fitness_cache, the
+        observations are not assigned until they are needed (e.g. the tree is
+        changed again or prepared to prediction).
+        If the tree cannot reach racing_cut, assigning of observations is
+        stopped and the tree is marked as rejected (it should be discarded).
+        """
+        self.materialize()
+        cdef Observations observations = self.observations
+        cdef uint64_t key = 0
+        cdef int rejected = 0
+        proper_classified = None
+        if self.fitness_cache is not None:
+            key = self.structure_hash()
+            proper_classified = self.fitness_cache.get(key)
+            if proper_classified is not None and (below_node_id != -1 or self.observations_pending):
+                with nogil:
+                    observations.clear_observations(self.nodes.elements)
+                observations.proper_classified = proper_classified
+                self.observations_pending = 1
+                return 0
+
+        observations.racing_cut = self.racing_cut
+        if self.observations_pending:
+            with nogil:
+                observations.clear_observations(self.nodes.elements)
+                rejected = observations.initialize_observations(self.nodes.elements)
+            self.observations_pending = 0
+        elif below_node_id != -1:
+            with nogil:
+                rejected = observations.reassign_observations(self.nodes.elements, below_node_id)
+        observations.racing_cut = 0
+        if rejected == 1:
+            self.rejected = 1
+            return 0
+
+        if self.fitness_cache is not None and proper_classified is None:
+            self.fitness_cache.put(key, observations.proper_classified)
+        return 0
+
+    cpdef uint64_t structure_hash(self):
+        """
+        Returns hash of features, thresholds and classes of nodes in depth
+        first order, so it does not depend on the order of nodes in memory
+        """
+        if self.nodes.count == 0:
+            return 0
+        cdef uint64_t hash_value
+        with nogil:
+            hash_value = self._hash_subtree(0, FNV_OFFSET_BASIS ^ <uint64_t> self.nodes.count)
+        return hash_value
+
+    cdef uint64_t _hash_subtree(self, SIZE_t node_id, uint64_t hash_value) nogil:
+        cdef Node* node = &self.nodes.elements[node_id]
+        cdef uint64_t threshold_bits = 0
+        hash_value = (hash_value ^ <uint64_t> (node.left_child == _TREE_LEAF)) * FNV_PRIME
+        hash_value = (hash_value ^ <uint64_t> node.feature) * FNV_PRIME
+        if node.left_child == _TREE_LEAF:
+            return hash_value
+        memcpy(&threshold_bits, &node.threshold, sizeof(DOUBLE_t))
+        hash_value = (hash_value ^ threshold_bits) * FNV_PRIME
+        hash_value = self._hash_subtree(node.left_child, hash_value)
+        return self._hash_subtree(node.right_child, hash_value)
 
 # ===========================================================================================================
 # Prediction functions
 # ===========================================================================================================
 
     cpdef prepare_tree_to_prediction(self):
-        cdef DTYPE_t[:] observations_in_class
-        cdef IntArray observations
+        cdef DTYPE_t[:, :] probabilities
+        cdef DOUBLE_t* class_histogram
+        cdef DOUBLE_t max_value
+        cdef DOUBLE_t sum_value
+        cdef SIZE_t max_class_id
         cdef SIZE_t node_id
         cdef SIZE_t i
+        self.assign_pending_observations()
+        cdef Observations observations = self.observations
+        cdef Node* nodes = self.nodes.elements
         self.probabilities = np.empty([self.nodes.count, self.n_classes], dtype=np.float32)
+        probabilities = self.probabilities
 
-        classes_ids = {}
-        for i, c in enumerate(self.classes):
-            classes_ids[c] = i
-
-        # for each node (f the node is leaf) change class for the most occurring
+        # for each node (if the node is leaf) change class for the most occurring
+        # weighted class in leaf (taken from class histogram of the leaf)
         for node_id in range(self.nodes.count):
-            # if it is leaf and has one or more observation
-            if self.nodes.elements[node_id].left_child == _TREE_LEAF:
-                if self.nodes.elements[node_id].right_child != _TREE_LEAF:
-                    observations_in_class = np.zeros(self.n_classes, dtype=np.float32)
-                    observations = self.observations.leaves.elements[self.nodes.elements[node_id].right_child]
-                    for i in range(observations.count):
-                        class_value = self.y[observations.elements[i]]
-                        observations_in_class[classes_ids[class_value]] += 1
-                    # change class if it is not the maximum value
-                    if observations_in_class[classes_ids[self.nodes.elements[node_id].feature]] != np.max(observations_in_class):
-                        self.nodes.elements[node_id].feature = self.classes[np.argmax(observations_in_class)]
-                else:
-                    observations_in_class = np.ones(self.n_classes, dtype=np.float32)
-
-                self.probabilities[node_id, :] = observations_in_class / np.sum(observations_in_class)
+            if nodes[node_id].left_child != _TREE_LEAF:
+                continue
+            # if leaf has one or more observation
+            if nodes[node_id].right_child != _TREE_LEAF:
+                class_histogram = observations.get_class_histogram(nodes[node_id].right_child)
+                max_class_id = 0
+                sum_value = 0
+                for i in range(self.n_classes):
+                    sum_value += class_histogram[i]
+                    if class_histogram[i] > class_histogram[max_class_id]:
+                        max_class_id = i
+                max_value = class_histogram[max_class_id]
+                # change class if it is not the maximum value
+                i = observations.get_class_id(nodes[node_id].feature)
+                if i == -1 or class_histogram[i] != max_value:
+                    nodes[node_id].feature = self.classes[max_class_id]
+                if sum_value > 0:
+                    for i in range(self.n_classes):
+                        probabilities[node_id, i] = class_histogram[i] / sum_value
+                    continue
+            for i in range(self.n_classes):
+                probabilities[node_id, i] = 1. / self.n_classes
 
     cpdef void remove_variables(self):
-        self.observations.remove_observations(self.nodes.elements, 0)
+        self._release_observations()
         self.observations = None
+        self.feature_index = None
         self.X = None
         self.y = None
+        self.y_class_ids = None
         self.sample_weight = None
         self.thresholds = None
 
-    cpdef void prepare_new_fit(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight, DTYPE_t[:, :] thresholds):
+    cpdef void prepare_new_fit(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight, DTYPE_t[:, :] thresholds,
+                               bint assign_observations=1, object y_class_ids=None):
+        """
+        Moves tree to new observations. If assign_observations is false,
+        observations are left pending (e.g. to be assigned by row blocks).
+        y_class_ids of y are found if they are not passed.
+        """
         if self.observations is not None:
-            self.observations.remove_observations(self.nodes.elements, 0)
-        self.observations = Observations(X, y, sample_weight)
-        self.initialize_observations()
+            self._release_observations()
+        if y_class_ids is None:
+            y_class_ids = get_y_class_ids(self.classes, y)
+        self.y_class_ids = y_class_ids
+        self.observations = self._create_observations(X, y, sample_weight)
+        if assign_observations:
+            self.initialize_observations()
+        else:
+            self.observations_pending = 1
         self.X = X
         self.y = y
         self.sample_weight = sample_weight
         self.thresholds = thresholds
+        self.n_observations = X.shape[0]
+        self.n_thresholds = thresholds.shape[0]
+
+    cpdef void stream_observations(self, object X, SIZE_t[:] y, DTYPE_t[:] sample_weight, DTYPE_t[:, :] thresholds,
+                                   SIZE_t[:] y_class_ids, SIZE_t expired_start, DTYPE_t[:] expired_weight,
+                                   SIZE_t new_start):
+        """
+        Moves tree to X, y and sample_weight, which are arrays the tree was
+        trained on with new observations appended (from new_start). Weights of
+        expired observations (from expired_start, in sample_weight they are
+        already set to 0) are subtracted from leaves and only new observations
+        are assigned. If observations cannot be changed in place (they were
+        removed, are pending or kept in FlatObservations) all observations are
+        assigned again by prepare_new_fit.
+        """
+        if self.observations is None or self.observations_pending or self.flat_observations:
+            self.prepare_new_fit(X, y, sample_weight, thresholds, True, y_class_ids)
+            return
+        self.materialize()
+        cdef Observations observations = self.observations
+        cdef SIZE_t n_expired = expired_weight.shape[0]
+        observations.set_data(X, y, sample_weight, y_class_ids)
+        self.y_class_ids = y_class_ids
+        with nogil:
+            # classes of leaves could be changed when the tree was prepared to prediction
+            observations.count_proper_classified(self.nodes.elements, self.nodes.count)
+            if n_expired > 0:
+                observations.expire_observations(self.nodes.elements, expired_start, expired_start + n_expired,
+                                                 &expired_weight[0])
+            observations.append_observations(self.nodes.elements, new_start, observations.n_observations)
+        self.X = X
+        self.y = y
+        self.sample_weight = sample_weight
+        self.thresholds = thresholds
+        self.n_observations = X.shape[0]
+        self.n_thresholds = thresholds.shape[0]
 
-    cpdef np.ndarray apply(self, object X):
-        cdef n_observations = X.shape[0]
+    cdef void _release_observations(self):
+        # shared observations are still used by other trees, so only ids of
+        # leaves in nodes are removed
+        cdef SIZE_t node_id
+        if self.observations_shared:
+            for node_id in range(self.nodes.count):
+                if self.nodes.elements[node_id].left_child == _TREE_LEAF:
+                    self.nodes.elements[node_id].right_child = _TREE_LEAF
+            self.observations_shared = 0
+        else:
+            self.observations.remove_observations(self.nodes.elements, 0)
+
+    cpdef np.ndarray apply(self, object X, int n_jobs=1):
+        """
+        Finds leaf of each observation in X; rows are split into blocks
+        processed in n_jobs threads without GIL
+        """
+        cdef SIZE_t n_observations = X.shape[0]
         cdef np.ndarray nodes = np.empty(n_observations, dtype=np.intp)
-        cdef SIZE_t y_id
         cdef LeafFinder leaf_finder = LeafFinder(X)
 
-        for y_id in range(n_observations):
-            nodes[y_id] = leaf_finder.find_leaf_for_observation(self.nodes.elements, y_id, 0)
-
+        n_blocks = min(get_n_threads(n_jobs), n_observations // MIN_APPLY_BLOCK_SIZE)
+        if n_blocks <= 1:
+            self._apply_rows(leaf_finder, nodes, 0, n_observations)
+        else:
+            bounds = np.linspace(0, n_observations, n_blocks + 1).astype(np.intp).tolist()
+            map_in_threads(partial(_apply_block, self, leaf_finder, nodes),
+                           list(zip(bounds[:n_blocks], bounds[1:])), n_jobs)
         return nodes
 
+    cdef void _apply_rows(self, LeafFinder leaf_finder, SIZE_t[:] nodes, SIZE_t start, SIZE_t end):
+        cdef SIZE_t y_id
+        with nogil:
+            for y_id in range(start, end):
+                nodes[y_id] = leaf_finder.find_leaf_for_observation(self.nodes.elements, y_id, 0)
+
     def test_predict(self, object X) -> np.ndarray:
         classes = self.feature
         node_ids = self.apply(X)
@@ -524,19 +869,114 @@ cdef class Tree:
         return self.probabilities[node_ids]
 
 
-cpdef Tree copy_tree(Tree tree, bint same_seed=0):
-    seed = tree.seed1
-    if same_seed == 0:
-        seed = tree.randint(0, 10**8)
-    cdef Tree tree_copied = Tree(tree.classes, tree.X, tree.y, tree.sample_weight, tree.thresholds, seed)
+def _apply_block(Tree tree, LeafFinder leaf_finder, SIZE_t[:] nodes, block):
+    tree._apply_rows(leaf_finder, nodes, block[0], block[1])
+
+
+def initialize_observations_of_trees(list trees, int n_jobs=1):
+    """
+    Assigns all observations to new trees. Observations of out-of-core X
+    (np.memmap) are assigned by row blocks: each block is assigned to all
+    trees before the next one is read, so the file is read once and
+    sequentially instead of by each thread in other place.
+    """
+    if len(trees) == 0:
+        return
+    X = trees[0].X
+    if not is_out_of_core(X) or any(tree.flat_observations or tree.X is not X for tree in trees):
+        map_in_threads(Tree.initialize_observations, trees, n_jobs)
+        return
+    for start, end in get_row_blocks(X):
+        map_in_threads(lambda tree: tree.initialize_observations_in_rows(start, end), trees, n_jobs)
+
+
+def prepare_new_fit_of_trees(list trees, object X, object y, object sample_weight, object thresholds,
+                             int n_jobs=1):
+    """
+    Calls prepare_new_fit of each tree, observations are assigned by
+    initialize_observations_of_trees
+    """
+    if len(trees) == 0:
+        return
+    y_class_ids = get_y_class_ids(trees[0].classes, y)
+    map_in_threads(lambda tree: tree.prepare_new_fit(X, y, sample_weight, thresholds, False, y_class_ids),
+                   trees, n_jobs)
+    initialize_observations_of_trees(trees, n_jobs)
+
+
+def get_y_class_ids(classes, y):
+    """
+    Returns index of class in sorted classes of each observation. It is
+    O(n_observations), so it should be found once for y and shared by all
+    observations of trees trained on it.
+    """
+    return np.searchsorted(classes, y).astype(np.intp)
+
+
+cpdef Tree copy_tree(Tree tree, bint same_seed=0, object seed=None):
+    """
+    Copy tree together with its observations
+
+    Args:
+        tree: Tree to copy
+        same_seed: if copied tree should have the same random state as tree
+        seed: seed of copied tree; if None it is drawn from tree random state \
+        (it allows to draw seeds before copying trees in many threads)
+
+    Returns:
+        Copied tree
+    """
+    if seed is None:
+        seed = tree.seed1
+        if same_seed == 0:
+            seed = tree.randint(0, 10**8)
+    cdef Tree tree_copied = _copy_nodes(tree, seed)
     if same_seed == 1:
         tree_copied.seeds = tree.seeds
-    tree_copied.depth = tree.depth
-    tree_copied.nodes.count = tree.nodes.count
-
-    tree_copied.unpickle_nodes(tree._get_node_ndarray())
     tree_copied.observations = copy_observations(tree.observations)
+    return tree_copied
+
+
+cpdef Tree share_tree(Tree tree, object seed=None):
+    """
+    Copy tree without copying its observations - both trees share the same
+    observations until one of them is changed in place (then it copies them
+    in materialize). Nodes and random state of copied tree are its own, so it
+    can be used as a parent of crossing without copying observations. No
+    observations are created for the copy and class ids of y are shared, so
+    it does not depend on the number of observations.
+
+    Args:
+        tree: Tree to copy
+        seed: seed of copied tree; if None it is drawn from tree random state
+
+    Returns:
+        Copied tree
+    """
+    if seed is None:
+        seed = tree.randint(0, 10**8)
+    cdef Tree tree_copied = _copy_nodes(tree, seed)
+    tree_copied.observations = tree.observations
+    tree_copied.observations_shared = 1
+    tree.observations_shared = 1
+    return tree_copied
+
+
+cdef Tree _copy_nodes(Tree tree, object seed):
+    # observations of copy are set by the caller, so they are not created
+    cdef Tree tree_copied = Tree(tree.classes, tree.X, tree.y, tree.sample_weight, tree.thresholds, seed,
+                                 tree.flat_observations, tree.y_class_ids, False)
+    tree_copied.depth = tree.depth
 
+    with nogil:
+        pool_resize(tree_copied.nodes, tree.nodes.count)
+        memcpy(tree_copied.nodes.elements, tree.nodes.elements,
+               tree.nodes.count * sizeof(Node))
+        tree_copied.nodes.count = tree.nodes.count
+    tree_copied.fitness_cache = tree.fitness_cache
+    tree_copied.feature_index = tree.feature_index
+    tree_copied.observations_pending = tree.observations_pending
+    tree_copied.racing_cut = tree.racing_cut
     return tree_copied
 
 cpdef void test_independence_of_copied_tree(Tree tree):
@@ -36,6 +36,8 @@ MODULE_NAMES = [
     "genetic_tree.tree.crosser",
     "genetic_tree.tree.builder",
     "genetic_tree.tree._utils",
+    "genetic_tree.tree.predictor",
+    "genetic_tree.tree.forest",
 ]
 
 
@@ -19,6 +19,44 @@ def test_crossing_tree(n: int = 2, depth: int = 10):
     return time.time() - start
 
 
+def build_random_tree(n_observations: int, depth: int = 5):
+    X = np.random.rand(n_observations, 4).astype(np.float32)
+    y = np.random.randint(0, 3, n_observations).astype(np.intp)
+    sample_weight = np.ones(n_observations, dtype=np.float32)
+    tree: Tree = Tree(np.unique(y), X, y, sample_weight, prepare_thresholds_array(10, X), 1)
+    tree.resize_by_initial_depth(depth)
+    full_tree_builder(tree, depth)
+    tree.initialize_observations()
+    return tree
+
+
+def check_copy_tree_time(n_observations: int, n: int = 50, copy_function=copy_tree):
+    tree: Tree = build_random_tree(n_observations)
+    times = []
+    for i in range(n):
+        start = time.perf_counter()
+        copy_function(tree)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@pytest.mark.parametrize("copy_function", [copy_tree, share_tree])
+def test_copy_shares_class_ids(copy_function):
+    tree: Tree = build_random_tree(1000)
+    tree_copied: Tree = copy_function(tree)
+    assert tree_copied.y_class_ids is tree.y_class_ids
+    assert_array_equal(tree_copied.proper_classified, tree.proper_classified)
+
+
+@pytest.mark.parametrize("copy_function", [copy_tree, share_tree])
+def test_copy_time_does_not_grow_with_observations(copy_function):
+    # leaves and class ids of y are shared with the copy, so a tree with 1000
+    # times more observations is copied in comparable time
+    small_time = check_copy_tree_time(1000, copy_function=copy_function)
+    large_time = check_copy_tree_time(1000000, copy_function=copy_function)
+    assert large_time < 10 * small_time + 1e-4
+
+
 if __name__ == "__main__":
     n = 10
     for depth in [2, 5, 7, 10, 12, 15, 18, 20]:
@@ -28,4 +66,8 @@ if __name__ == "__main__":
         cross_time = test_crossing_tree(n, depth=depth)
         print(f"Cross time {cross_time}")
         print(f"Factor = {cross_time/copy_time}")
+    for n_observations in [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]:
+        print(f"\n Observations {n_observations}")
+        print(f"copy_tree:  {check_copy_tree_time(n_observations) * 1e6:.2f} us")
+        print(f"share_tree: {check_copy_tree_time(n_observations, copy_function=share_tree) * 1e6:.2f} us")
 
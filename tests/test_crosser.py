@@ -74,3 +74,35 @@ def test_set_is_both_wrong_type(crosser, is_both):
 # ==============================================================================
 # Cross low level
 # ==============================================================================
+
+
+@pytest.mark.parametrize("n_jobs", ["string", 1.5])
+def test_set_n_jobs_wrong_type(crosser, n_jobs):
+    with pytest.raises(TypeError):
+        crosser.set_params(n_jobs=n_jobs)
+
+
+def test_set_n_jobs_zero(crosser):
+    with pytest.raises(ValueError):
+        crosser.set_params(n_jobs=0)
+
+
+# ==============================================================================
+# Cross population
+# ==============================================================================
+
+@pytest.mark.parametrize("cross_both", [True, False])
+def test_cross_population_in_many_threads(cross_both):
+    trees = build_trees(5, 20)
+    trees_copied = [copy_tree(tree, same_seed=1) for tree in trees]
+    crosser = Crosser(0.6, cross_both, n_jobs=1)
+    np.random.seed(123)
+    children = crosser.cross_population(trees)
+    crosser.set_params(n_jobs=4)
+    np.random.seed(123)
+    children_copied = crosser.cross_population(trees_copied)
+    assert len(children) == len(children_copied)
+    for child, child_copied in zip(children, children_copied):
+        assert_array_equal(child.feature, child_copied.feature)
+        assert_array_equal(child.threshold, child_copied.threshold)
+        assert child.proper_classified == child_copied.proper_classified
@@ -124,3 +124,91 @@ def test_get_depths(evaluator, trees):
 
 def test_get_n_leaves(evaluator, trees):
     assert_array_equal(evaluator.get_n_leaves(trees), get_trees_n_leaves(trees))
+
+
+# +++++++++++++++
+# Fitness cache
+# +++++++++++++++
+
+def test_fitness_cache_lru():
+    cache = FitnessCache(2)
+    cache.put(1, 10.)
+    cache.put(2, 20.)
+    assert cache.get(1) == 10.
+    cache.put(3, 30.)
+    assert cache.get(2) is None
+    assert cache.get(1) == 10.
+    assert cache.get(3) == 30.
+    assert len(cache) == 2
+    assert len(pickle.loads(pickle.dumps(cache))) == 0
+
+
+def test_fitness_cache_in_mutated_trees(trees):
+    evaluator = Evaluator(fitness_cache_size=1000)
+    evaluator.set_fitness_cache(trees)
+    for _ in range(20):
+        for tree in trees:
+            mutate_random_node(tree)
+            tree2 = copy_tree(tree)
+            mutate_random_class_or_threshold(tree2)
+            mutate_random_node(tree2)
+            for changed_tree in (tree, tree2):
+                fresh_tree = initialize_iris_tree()
+                fresh_tree.load_nodes(changed_tree.export_nodes())
+                fresh_tree.initialize_observations()
+                assert changed_tree.proper_classified == fresh_tree.proper_classified
+    assert evaluator.fitness_cache.hits > 0
+
+
+def test_fitness_cache_size_wrong_value():
+    with pytest.raises(ValueError):
+        Evaluator(fitness_cache_size=-1)
+    with pytest.raises(TypeError):
+        Evaluator(fitness_cache_size=1.5)
+
+
+# +++++++++++++++
+# Population stats
+# +++++++++++++++
+
+@pytest.mark.parametrize("metric", [Metric.Accuracy, Metric.AccuracyMinusDepth, Metric.AccuracyMinusLeavesNumber])
+def test_population_stats(metric, trees):
+    evaluator = Evaluator(metric)
+    population_stats = evaluator.get_population_stats(trees)
+    assert len(population_stats) == len(trees)
+    assert_array_equal(population_stats.accuracy, get_accuracies(trees))
+    assert_array_equal(population_stats.depth, get_trees_depths(trees))
+    assert_array_equal(population_stats.n_leaves, get_trees_n_leaves(trees))
+    assert_array_equal(population_stats.node_count, [tree.node_count for tree in trees])
+    assert_array_equal(population_stats.metric, metric.evaluate(trees))
+    assert population_stats.best_index == np.argmax(population_stats.metric)
+
+
+@pytest.mark.parametrize("metric", [Metric.AccuracyMinusDepth, Metric.AccuracyMinusLeavesNumber])
+def test_racing_cut_of_metric(metric, trees):
+    # penalties are large, so quantile of accuracies would reject offspring
+    # that reach quantile of metric
+    evaluator = Evaluator(metric, racing_quantile=0.5, depth_factor=0.03, n_leaves_factor=0.005)
+    population_stats = evaluator.get_population_stats(trees)
+    metric_cut = np.quantile(population_stats.metric, 0.5)
+    racing_cut = evaluator.get_racing_cut(population_stats, sample_weight)
+    assert_almost_equal(racing_cut, metric_cut * np.sum(sample_weight))
+    seeds = np.random.randint(10 ** 8, size=len(trees))
+
+    def create_children():
+        children = []
+        for tree, seed in zip(trees, seeds):
+            child = copy_tree(tree, 0, seed)
+            mutate_random_threshold(child)
+            children.append(child)
+        return children
+
+    children = create_children()
+    evaluator.set_racing_cut(trees, population_stats)
+    children_raced = create_children()
+    evaluator.set_racing_cut(trees)
+    children_metric = evaluator.evaluate(children)
+    for child, child_raced, child_metric in zip(children, children_raced, children_metric):
+        assert child_raced.rejected == (child.proper_classified < racing_cut)
+        if child_metric >= metric_cut:
+            assert not child_raced.rejected
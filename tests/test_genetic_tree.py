@@ -33,6 +33,53 @@ def test_seed():
     assert_trees_equal(tree, tree2)
 
 
+def test_seed_with_many_threads():
+    """
+    Assert that number of threads does not change created trees
+    """
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=n_trees, max_iter=3, n_jobs=1)
+    gt.fit(X, y)
+    tree: Tree = gt._best_tree
+
+    gt2 = GeneticTree(random_state=seed, n_trees=n_trees, max_iter=3, n_jobs=4)
+    gt2.fit(X, y)
+    tree2: Tree = gt2._best_tree
+
+    assert_trees_equal(tree, tree2)
+    assert_array_equal(gt.acc_mean, gt2.acc_mean)
+
+
+@pytest.mark.parametrize("forest_population", [False, True])
+def test_threads_created_once_per_fit(monkeypatch, forest_population):
+    created = []
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr("genetic_tree.genetic.parallel.ThreadPoolExecutor", CountingExecutor)
+    gt = GeneticTree(n_trees=n_trees, max_iter=5, n_jobs=4, forest_population=forest_population)
+    gt.fit(X, y)
+    assert len(created) == 1
+    assert created[0]._shutdown
+    gt.predict(X)
+
+
+def test_seed_with_flat_observations():
+    """
+    Assert that layout of observations does not change created trees
+    """
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=n_trees, max_iter=3)
+    gt.fit(X, y)
+    gt2 = GeneticTree(random_state=seed, n_trees=n_trees, max_iter=3, flat_observations=True)
+    gt2.fit(X, y)
+    assert_trees_equal(gt._best_tree, gt2._best_tree)
+    assert_array_equal(gt.acc_mean, gt2.acc_mean)
+
+
 def test_none_seed():
     """
     test if seed can be None -> and then np won't set seed
@@ -247,3 +294,338 @@ def test_usage_of_previous_best_tree(genetic_tree, X_converted):
     assert genetic_tree._best_tree.X.shape[0] == 10
     assert genetic_tree._trees[0].X.shape[0] == 10
 
+
+
+# +++++++++++++++
+# Island model
+# +++++++++++++++
+
+def test_fit_on_islands(X_converted):
+    gt = GeneticTree(n_trees=20, max_iter=5, n_islands=2, migration_interval=2,
+                     keep_last_population=True, remove_variables=False)
+    gt.fit(X_converted, y)
+    assert len(gt.acc_best) == 6
+    assert len(gt._trees) >= 2
+    assert gt._trees[0].X.shape[0] == 150
+    assert gt.predict(X_converted).shape[0] == 150
+    gt.partial_fit(X_converted, y)
+    assert len(gt.acc_best) == 12
+
+
+def test_fit_on_islands_with_seed():
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=20, max_iter=4, n_islands=2)
+    gt.fit(X, y)
+    gt2 = GeneticTree(random_state=seed, n_trees=20, max_iter=4, n_islands=2)
+    gt2.fit(X, y)
+    assert_trees_equal(gt._best_tree, gt2._best_tree)
+    assert_array_equal(gt.acc_mean, gt2.acc_mean)
+
+
+@pytest.mark.parametrize("param", ["n_islands", "migration_interval"])
+def test_set_migrator_params_wrong_value(param):
+    with pytest.raises(ValueError):
+        GeneticTree(**{param: 0})
+    with pytest.raises(TypeError):
+        GeneticTree(**{param: 1.5})
+
+
+def test_seed_with_buffer_pool():
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=20, max_iter=5, buffer_pool_size=0)
+    gt.fit(X, y)
+    gt2 = GeneticTree(random_state=seed, n_trees=20, max_iter=5, buffer_pool_size=1)
+    gt2.fit(X, y)
+    assert_trees_equal(gt._best_tree, gt2._best_tree)
+    assert_array_equal(gt.acc_mean, gt2.acc_mean)
+
+
+def test_buffer_pool_shared_by_running_fits():
+    # fit running in other thread keeps the pool when this fit ends
+    acquire_buffer_pool(2**20)
+    try:
+        GeneticTree(n_trees=20, max_iter=5, buffer_pool_size=1).fit(X, y)
+        assert get_buffer_pool_size() > 0
+    finally:
+        release_buffer_pool(2**20)
+    assert get_buffer_pool_size() == 0
+
+
+def test_set_buffer_pool_size_wrong_value():
+    with pytest.raises(ValueError):
+        GeneticTree(buffer_pool_size=-1)
+    with pytest.raises(TypeError):
+        GeneticTree(buffer_pool_size=1.5)
+
+
+def test_fit_with_cached_thresholds():
+    clear_thresholds_cache()
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=20, max_iter=5, cache_thresholds=True)
+    gt.fit(X, y)
+    gt2 = GeneticTree(random_state=seed, n_trees=20, max_iter=5, cache_thresholds=True)
+    gt2.fit(X, y)
+    assert_trees_equal(gt._best_tree, gt2._best_tree)
+    with pytest.raises(TypeError):
+        GeneticTree(cache_thresholds=1)
+    clear_thresholds_cache()
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load(genetic_tree_fitted, X_sparse, tmp_path, mmap):
+    path = tmp_path / "model.npz"
+    genetic_tree_fitted.save(path)
+    gt = GeneticTree.load(path, mmap=mmap, n_trees=20, max_iter=5)
+    if mmap:
+        assert isinstance(gt._predictor.leaf_probabilities.base, np.memmap)
+    assert_array_equal(gt.predict(X), genetic_tree_fitted.predict(X))
+    assert_array_equal(gt.predict_proba(X), genetic_tree_fitted.predict_proba(X))
+    assert_array_equal(gt.apply(X_sparse), genetic_tree_fitted.apply(X))
+    assert gt.predict_one(X[0].astype(np.float32)) == genetic_tree_fitted.predict(X[:1])[0]
+    with pytest.raises(ValueError):
+        gt.predict(X[:, :2])
+    gt.partial_fit(X, y)
+    assert gt.predict(X).shape[0] == 150
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_resume_from_checkpoint(tmp_path, monkeypatch, flat_observations):
+    # changed label and row are not in sample of fingerprint of thresholds cache
+    monkeypatch.setattr("genetic_tree.tree.thresholds.FINGERPRINT_SAMPLE_SIZE", 3)
+    seed = np.random.randint(0, 10**8)
+    path = str(tmp_path / "checkpoint.pkl")
+    gt = GeneticTree(random_state=seed, n_trees=20, max_iter=10, flat_observations=flat_observations,
+                     checkpoint_path=path, checkpoint_interval=5)
+    gt.fit(X, y)
+    gt2 = GeneticTree(random_state=seed, n_trees=20, max_iter=15, flat_observations=flat_observations)
+    gt2.fit(X, y)
+    gt3 = GeneticTree(n_trees=20, max_iter=15, flat_observations=flat_observations)
+    gt3.resume(X, y, checkpoint_path=path)
+    assert_trees_equal(gt2._best_tree, gt3._best_tree)
+    assert_array_equal(gt2.acc_mean, gt3.acc_mean)
+    with pytest.raises(ValueError):
+        gt3.resume(X[:, ::-1].copy(), y, checkpoint_path=path)
+    y_changed = y.copy()
+    y_changed[1] = (y_changed[1] + 1) % 3
+    with pytest.raises(ValueError):
+        gt3.resume(X, y_changed, checkpoint_path=path)
+    X_changed = X.copy()
+    X_changed[1, 0] += 1
+    with pytest.raises(ValueError):
+        gt3.resume(X_changed, y, checkpoint_path=path)
+
+
+def test_set_checkpointer_params_wrong_value():
+    with pytest.raises(ValueError):
+        GeneticTree(checkpoint_interval=0)
+    with pytest.raises(TypeError):
+        GeneticTree(checkpoint_interval=1.5)
+    with pytest.raises(TypeError):
+        GeneticTree(checkpoint_path=1)
+
+
+def test_stratified_indices():
+    indices = get_stratified_indices(y, 0.2)
+    assert_array_equal(indices, np.unique(indices))
+    assert_array_equal(np.bincount(y[indices]), np.round(np.bincount(y) * 0.2))
+    assert_array_equal(np.unique(y[get_stratified_indices(y, 0.001)]), np.unique(y))
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_fit_on_subsample(tmp_path, flat_observations):
+    seed = np.random.randint(0, 10**8)
+    path = str(tmp_path / "checkpoint.pkl")
+    gt = GeneticTree(random_state=seed, n_trees=20, max_iter=10, flat_observations=flat_observations,
+                     subsample=0.3, subsample_interval=3, keep_last_population=True, remove_variables=False,
+                     checkpoint_path=path, checkpoint_interval=5)
+    gt.fit(X, y)
+    # all trees of last population are evaluated on all observations
+    # (classes in leaves of the best tree are changed to predict, so it is skipped)
+    for tree in gt._trees:
+        assert tree.X.shape[0] == 150
+        if tree is not gt._best_tree:
+            tree_copied = copy_tree(tree)
+            tree_copied.prepare_new_fit(X, y, sample_weight, thresholds)
+            assert tree.proper_classified == tree_copied.proper_classified
+    assert gt.subsampler.subsample_indices is None
+
+    gt2 = GeneticTree(random_state=seed, n_trees=20, max_iter=15, flat_observations=flat_observations,
+                      subsample=0.3, subsample_interval=3)
+    gt2.fit(X, y)
+    gt3 = GeneticTree(n_trees=20, max_iter=15, flat_observations=flat_observations,
+                      subsample=0.3, subsample_interval=3)
+    gt3.resume(X, y, checkpoint_path=path)
+    assert_trees_equal(gt2._best_tree, gt3._best_tree)
+    assert_array_equal(gt2.acc_mean, gt3.acc_mean)
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_fit_on_memmap(monkeypatch, flat_observations):
+    # a few rows in each block, so observations are assigned by many blocks
+    monkeypatch.setattr("genetic_tree.genetic.parallel.ROW_BLOCK_BYTES", 7 * X.shape[1] * 4)
+    X_converted = X.astype(np.float32)
+    X_memmap = create_memmap_backed_data(X_converted)
+    seed = np.random.randint(0, 10**8)
+    results = []
+    for X_train in [X_converted, X_memmap]:
+        gt = GeneticTree(random_state=seed, n_trees=20, max_iter=5, n_jobs=2, keep_last_population=True,
+                         remove_variables=False, flat_observations=flat_observations)
+        gt.fit(X_train, y)
+        gt.partial_fit(X_train, y)
+        results.append(gt)
+    assert results[1]._trees[0].X is X_memmap
+    assert_array_equal(results[0].acc_mean, results[1].acc_mean)
+    assert_array_equal(results[0].predict(X), results[1].predict(X_memmap))
+
+
+def test_fit_on_subsample_on_islands():
+    gt = GeneticTree(n_trees=20, max_iter=4, n_islands=2, migration_interval=2, subsample=0.5,
+                     keep_last_population=True, remove_variables=False)
+    gt.fit(X, y)
+    assert gt._trees[0].X.shape[0] == 150
+
+
+def test_set_subsampler_params_wrong_value():
+    with pytest.raises(ValueError):
+        GeneticTree(subsample=0)
+    with pytest.raises(ValueError):
+        GeneticTree(subsample=1.5)
+    with pytest.raises(TypeError):
+        GeneticTree(subsample="0.5")
+    with pytest.raises(ValueError):
+        GeneticTree(subsample_interval=0)
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_fit_with_racing(flat_observations):
+    gt = GeneticTree(n_trees=50, max_iter=10, flat_observations=flat_observations, racing_quantile=0.5,
+                     keep_last_population=True, remove_variables=False)
+    gt.fit(X, y)
+    for tree in gt._trees:
+        assert not tree.rejected
+        if tree is not gt._best_tree:
+            tree_copied = copy_tree(tree)
+            tree_copied.prepare_new_fit(X, y, sample_weight, thresholds)
+            assert tree.proper_classified == tree_copied.proper_classified
+
+
+def test_racing_keeps_population_size():
+    # on digits many offspring are rejected, so population would be smaller than n_trees
+    digits = datasets.load_digits()
+    gt = GeneticTree(n_trees=60, max_iter=10, racing_quantile=0.5, keep_last_population=True,
+                     remove_variables=False, random_state=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", UserWarning)
+        gt.fit(digits.data, digits.target)
+    assert len(gt._trees) >= 60
+    assert len(set(id(tree) for tree in gt._trees)) == len(gt._trees)
+
+
+def test_set_racing_quantile_wrong_value():
+    with pytest.raises(ValueError):
+        GeneticTree(racing_quantile=1)
+    with pytest.raises(ValueError):
+        GeneticTree(racing_quantile=-0.1)
+    with pytest.raises(TypeError):
+        GeneticTree(racing_quantile="0.5")
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_partial_fit_on_stream(flat_observations):
+    gt = GeneticTree(n_trees=20, max_iter=3, stream_window=60, flat_observations=flat_observations,
+                     keep_last_population=True, remove_variables=False)
+    gt.fit(X[:50], y[:50])
+    # buffers are moved when the window does not fit, so both ways of updating trees are used
+    for start in range(50, 150, 20):
+        gt.partial_fit(X[start:start + 20], y[start:start + 20])
+        tree_X = gt._trees[0].X
+        tree_sample_weight = np.asarray(gt._trees[0].sample_weight)
+        window = tree_sample_weight > 0
+        assert np.sum(window) == 60
+        assert_array_equal(np.asarray(tree_X)[window], X[start - 40:start + 20])
+        for tree in gt._trees:
+            if tree is not gt._best_tree:
+                tree_copied = copy_tree(tree)
+                tree_copied.prepare_new_fit(tree_X, np.asarray(tree.y), tree_sample_weight, thresholds)
+                assert tree.proper_classified == tree_copied.proper_classified
+
+
+def test_partial_fit_on_stream_without_observations():
+    gt = GeneticTree(n_trees=20, max_iter=3, stream_window=60)
+    gt.fit(X[:50], y[:50])
+    for start in range(50, 150, 20):
+        gt.partial_fit(X[start:start + 20], y[start:start + 20])
+        assert gt._best_tree.X is None
+    assert gt.predict(X).shape[0] == 150
+
+
+def test_set_stream_window_wrong_value():
+    with pytest.raises(ValueError):
+        GeneticTree(stream_window=-1)
+    with pytest.raises(TypeError):
+        GeneticTree(stream_window=0.5)
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_seed_with_fitness_cache(flat_observations):
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=50, max_iter=20, flat_observations=flat_observations)
+    gt.fit(X, y)
+    gt2 = GeneticTree(random_state=seed, n_trees=50, max_iter=20, flat_observations=flat_observations,
+                      fitness_cache_size=100)
+    gt2.fit(X, y)
+    assert_trees_equal(gt._best_tree, gt2._best_tree)
+    assert_array_equal(gt.acc_mean, gt2.acc_mean)
+    assert gt2.evaluator.fitness_cache.hits > 0
+
+
+@pytest.mark.parametrize("params", [{}, {"racing_quantile": 0.5},
+                                    {"mutation_replace": True, "leave_selected_parents": True},
+                                    {"mutations_additional": [(Mutation.Feature, 0.3), (Mutation.Class, 0.3)]}])
+def test_fit_with_forest_population(params):
+    gt = GeneticTree(n_trees=50, max_iter=10, forest_population=True, keep_last_population=True,
+                     remove_variables=False, n_jobs=2, **params)
+    gt.fit(X, y)
+    assert len(gt._trees) >= 50
+    assert gt.acc_best[-1] == np.max(Evaluator.get_accuracies(gt._trees))
+    assert_almost_equal(gt.acc_mean[-1], np.mean(Evaluator.get_accuracies(gt._trees)), 5)
+    assert gt.predict(X).shape == y.shape
+
+
+def test_seed_with_forest_population():
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=n_trees, max_iter=10, forest_population=True, n_jobs=1)
+    gt.fit(X, y)
+    gt2 = GeneticTree(random_state=seed, n_trees=n_trees, max_iter=10, forest_population=True, n_jobs=4)
+    gt2.fit(X, y)
+    assert_trees_equal(gt._best_tree, gt2._best_tree)
+    assert_array_equal(gt.acc_mean, gt2.acc_mean)
+
+
+def test_partial_fit_with_forest_population():
+    gt = GeneticTree(n_trees=n_trees, max_iter=3, forest_population=True, keep_last_population=True,
+                     remove_variables=False)
+    gt.fit(X, y)
+    gt.partial_fit(X, y)
+    gt.set_params(keep_last_population=False)
+    gt.partial_fit(X, y)
+    assert gt._trees is None
+    assert gt._best_tree.proper_classified / 150 == gt.acc_best[-1]
+
+
+@pytest.mark.parametrize("params", [{"n_islands": 2}, {"subsample": 0.5}, {"stream_window": 10},
+                                    {"fitness_cache_size": 10}, {"presort_features": True}])
+def test_forest_population_with_unsupported_params(params):
+    gt = GeneticTree(n_trees=n_trees, max_iter=3, forest_population=True, **params)
+    with pytest.raises(ValueError):
+        gt.fit(X, y)
+
+
+def test_forest_population_with_unsupported_mutation():
+    Mutation.add_new("ForestTestMutation", lambda tree: None)
+    gt = GeneticTree(n_trees=n_trees, max_iter=3, forest_population=True,
+                     mutations_additional=[(Mutation.ForestTestMutation, 0.5)])
+    with pytest.raises(ValueError):
+        gt.fit(X, y)
+    with pytest.raises(TypeError):
+        GeneticTree(forest_population=1)
@@ -10,6 +10,8 @@ def test_initialize_full():
     assert isinstance(trees[0], Tree)
     assert len(trees) == 20
     assert max(trees[0].nodes_depth) == 5
+    # class ids of y are found once for whole population
+    assert all(tree.y_class_ids is trees[0].y_class_ids for tree in trees)
     return trees
 
 
@@ -0,0 +1,42 @@
+from tests.utils_testing import *
+
+
+def fit_genetic_tree(depth: int = 10):
+    X_random = np.random.rand(2000, 20).astype(np.float32)
+    y_random = (X_random[:, 0] + X_random[:, 1] * X_random[:, 2] > 0.6).astype(np.intp)
+    gt = GeneticTree(n_trees=20, max_iter=3, initial_depth=depth, n_jobs=1)
+    gt.fit(X_random, y_random)
+    return gt, X_random
+
+
+def check_predict_latency(n: int = 100, depth: int = 10):
+    gt, X_random = fit_genetic_tree(depth)
+    start = time.time()
+    for i in range(n):
+        gt.predict(X_random[i % 1000:i % 1000 + 1])
+    return (time.time() - start) / n
+
+
+def check_predict_one_latency(n: int = 100, depth: int = 10):
+    gt, X_random = fit_genetic_tree(depth)
+    start = time.time()
+    for i in range(n):
+        gt.predict_one(X_random[i % 1000])
+    return (time.time() - start) / n
+
+
+def check_predict_small_latency(n: int = 100, depth: int = 10, batch_size: int = 16):
+    gt, X_random = fit_genetic_tree(depth)
+    start = time.time()
+    for i in range(n):
+        gt.predict_small(X_random[i % 1000:i % 1000 + batch_size])
+    return (time.time() - start) / n
+
+
+if __name__ == "__main__":
+    n = 10000
+    for depth in [2, 5, 10, 15]:
+        print(f"\n Depth {depth}")
+        print(f"predict of one row:       {check_predict_latency(n, depth) * 1e6:.2f} us")
+        print(f"predict_one:              {check_predict_one_latency(n, depth) * 1e6:.2f} us")
+        print(f"predict_small (16 rows):  {check_predict_small_latency(n, depth) * 1e6:.2f} us")
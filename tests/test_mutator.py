@@ -77,6 +77,49 @@ def test_mutation(tree, function):
         assert_array_equal(tree.threshold, copied_tree.threshold)
 
 
+def test_mutate_class_proper_classified():
+    weights = np.ascontiguousarray(np.random.random(150), dtype=np.float32)
+    tree = build_trees(3, 1)[0]
+    tree.prepare_new_fit(X, y, weights, thresholds)
+    for i in range(50):
+        mutate_random_class(tree)
+    proper_classified = tree.proper_classified
+    tree.prepare_new_fit(X, y, weights, thresholds)
+    assert_almost_equal(proper_classified, tree.proper_classified, decimal=3)
+
+
+@pytest.mark.parametrize("presort_features", [False, True])
+def test_move_threshold(presort_features):
+    # with many thresholds observations between neighbouring ones are found in index
+    random_state = np.random.RandomState(3)
+    X_random = random_state.rand(3000, 4).astype(np.float32)
+    y_random = random_state.randint(0, 3, 3000).astype(np.intp)
+    weights = np.ones(3000, dtype=np.float32)
+    thresholds_random = np.asarray(prepare_thresholds_array(500, X_random))
+    tree = Tree(np.unique(y_random), X_random, y_random, weights, thresholds_random, 1, False)
+    tree.resize_by_initial_depth(4)
+    full_tree_builder(tree, 4)
+    tree.initialize_observations()
+    Mutator(presort_features=presort_features).set_feature_index([tree])
+    assert (tree.feature_index is not None) == presort_features
+    for i in range(40):
+        node_id = tree.get_random_decision_node_test()
+        feature = tree.feature[node_id]
+        threshold_id = np.searchsorted(thresholds_random[:, feature], tree.threshold[node_id])
+        if i % 2 == 0:
+            threshold_id = min(threshold_id + 1, 499)
+        else:
+            threshold_id = random_state.randint(0, 500)
+        assert tree.move_threshold_test(node_id, thresholds_random[threshold_id, feature]) == 1
+        tree_copied = copy_tree(tree)
+        tree_copied.prepare_new_fit(X_random, y_random, weights, thresholds_random)
+        assert tree.proper_classified == tree_copied.proper_classified
+    tree.prepare_tree_to_prediction()
+    tree_copied.prepare_tree_to_prediction()
+    leaves = tree.children_left == -1
+    assert_array_equal(tree.probabilities[leaves], tree_copied.probabilities[leaves])
+
+
 # ==============================================================================
 # Mutator
 # ==============================================================================
@@ -244,3 +287,34 @@ def test_mutate(trees, mutator):
     trees_mutated = mutator.mutate(trees)
     assert len(trees) * 3 == len(trees_mutated)
 
+
+
+@pytest.mark.parametrize("mutation_replace", [True, False])
+def test_mutate_in_many_threads(mutation_replace):
+    trees = build_trees(5, 20)
+    trees_copied = [copy_tree(tree, same_seed=1) for tree in trees]
+    mutator = Mutator(mutation_prob=0.5, mutation_replace=mutation_replace, n_jobs=1)
+    np.random.seed(123)
+    trees_mutated = mutator.mutate(trees)
+    mutator.set_params(n_jobs=4)
+    np.random.seed(123)
+    trees_copied_mutated = mutator.mutate(trees_copied)
+    if mutation_replace:
+        trees_mutated, trees_copied_mutated = trees, trees_copied
+    assert len(trees_mutated) == len(trees_copied_mutated)
+    for tree, tree_copied in zip(trees_mutated, trees_copied_mutated):
+        assert_array_equal(tree.feature, tree_copied.feature)
+        assert_array_equal(tree.threshold, tree_copied.threshold)
+        assert tree.proper_classified == tree_copied.proper_classified
+
+
+@pytest.mark.parametrize("presort_features", ["string", 1])
+def test_set_presort_features_wrong_type(mutator, presort_features):
+    with pytest.raises(TypeError):
+        mutator.set_params(presort_features=presort_features)
+
+
+@pytest.mark.parametrize("n_jobs", ["string", 1.5])
+def test_set_n_jobs_wrong_type(mutator, n_jobs):
+    with pytest.raises(TypeError):
+        mutator.set_params(n_jobs=n_jobs)
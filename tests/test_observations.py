@@ -92,6 +92,68 @@ def test_copy_leaves_():
     test_copy_leaves()
 
 
+def test_share_int_array_():
+    test_share_int_array()
+
+
+def test_buffer_pool_():
+    test_buffer_pool()
+
+
+# ==============================================================================
+# Flat observations
+# ==============================================================================
+
+def build_trees_with_both_layouts(X_input, depth: int = 5):
+    seed = np.random.randint(10 ** 8)
+    trees = []
+    for flat_observations in [0, 1]:
+        tree = Tree(np.unique(y), X_input, y, sample_weight, thresholds, seed, flat_observations)
+        tree.resize_by_initial_depth(depth)
+        np.random.seed(seed)
+        full_tree_builder(tree, depth)
+        tree.initialize_observations()
+        trees.append(tree)
+    return trees
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_flat_observations_proper_classified(X_converted, X_sparse, sparse):
+    tree, flat_tree = build_trees_with_both_layouts(X_sparse if sparse else X_converted)
+    assert flat_tree.flat_observations
+    assert tree.proper_classified == flat_tree.proper_classified
+    for i in range(20):
+        mutate_random_node(tree)
+        mutate_random_node(flat_tree)
+        assert_array_equal(tree.threshold, flat_tree.threshold)
+        assert tree.proper_classified == flat_tree.proper_classified
+
+
+def test_copy_flat_observations(X_converted):
+    tree, flat_tree = build_trees_with_both_layouts(X_converted)
+    flat_tree_copied = copy_tree(flat_tree)
+    assert flat_tree_copied.flat_observations
+    for i in range(20):
+        mutate_random_threshold(flat_tree_copied)
+    proper_classified = flat_tree_copied.proper_classified
+    flat_tree_copied.prepare_new_fit(X_converted, y, sample_weight, thresholds)
+    assert proper_classified == flat_tree_copied.proper_classified
+    assert tree.proper_classified == flat_tree.proper_classified
+
+
+def test_cross_flat_observations(X_converted):
+    tree, flat_tree = build_trees_with_both_layouts(X_converted)
+    tree2, flat_tree2 = build_trees_with_both_layouts(X_converted)
+    child = cross_trees(tree, tree2, 3, 1, 1)
+    flat_child = cross_trees(flat_tree, flat_tree2, 3, 1, 1)
+    assert_array_equal(child.feature, flat_child.feature)
+    assert child.proper_classified == flat_child.proper_classified
+    child.prepare_tree_to_prediction()
+    flat_child.prepare_tree_to_prediction()
+    leaves = child.children_left == -1
+    assert_array_equal(child.probabilities[leaves], flat_child.probabilities[leaves])
+
+
 # ==============================================================================
 # LeafFinder
 # ==============================================================================
@@ -117,3 +179,14 @@ def test_find_leaf_sparse_and_dense_equal(X_converted, X_sparse, tree):
     leaf_finder = LeafFinder(X_sparse)
     y_sparse = leaf_finder.test_find_leaves(tree)
     assert_array_equal(y_dense, y_sparse)
+
+
+@pytest.mark.parametrize("sparse_format", ["csr", "csc", "dok"])
+def test_find_leaf_sparse_with_zeros(X_converted, tree, sparse_format):
+    X_with_zeros = X_converted.copy()
+    X_with_zeros[X_with_zeros < np.median(X_with_zeros, axis=0)] = 0
+    leaf_finder = LeafFinder(X_with_zeros)
+    y_dense = leaf_finder.test_find_leaves(tree)
+    leaf_finder = LeafFinder(dok_matrix(X_with_zeros).asformat(sparse_format))
+    y_sparse = leaf_finder.test_find_leaves(tree)
+    assert_array_equal(y_dense, y_sparse)
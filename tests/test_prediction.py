@@ -48,3 +48,53 @@ if __name__ == "__main__":
     gt.fit(iris.data, iris.target)
     tree = gt._best_tree
     print(tree.proper_classified)
+
+
+def test_compiled_predictor_equal_to_tree():
+    gt = GeneticTree(n_trees=20, max_iter=10, initial_depth=5)
+    gt.fit(iris.data, iris.target)
+    X_converted = GeneticTree._check_X(gt, iris.data, True)
+    predictor = CompiledTree(gt._best_tree)
+    assert_array_equal(predictor.predict(X_converted), gt.predict(iris.data))
+    assert_array_equal(predictor.predict_proba(X_converted), gt.predict_proba(iris.data))
+    assert_array_equal(predictor.apply(X_converted), gt.apply(iris.data))
+    assert_array_equal(predictor.apply(dok_matrix(X_converted).tocsr()), gt.apply(iris.data))
+    X_big = np.repeat(X_converted, 200, axis=0)
+    assert_array_equal(predictor.apply(X_big, n_jobs=2), gt._best_tree.apply(X_big))
+
+
+def test_fit_with_compiled_predictor():
+    seed = np.random.randint(0, 10**8)
+    gt = GeneticTree(random_state=seed, n_trees=20, max_iter=5)
+    gt.fit(iris.data, iris.target)
+    gt2 = GeneticTree(random_state=seed, n_trees=20, max_iter=5, compiled_predictor=True)
+    gt2.fit(iris.data, iris.target)
+    assert isinstance(gt2._predictor, CompiledTree)
+    assert_array_equal(gt.predict(iris.data), gt2.predict(iris.data))
+    assert_array_equal(gt.predict_proba(iris.data), gt2.predict_proba(iris.data))
+    assert_array_equal(gt.apply(iris.data), gt2.apply(iris.data))
+
+
+def test_predict_one_and_small():
+    gt = GeneticTree(n_trees=20, max_iter=10, initial_depth=5)
+    gt.fit(iris.data, iris.target)
+    X_float32 = iris.data.astype(np.float32)
+    classes = gt.predict(iris.data)
+    probabilities = gt.predict_proba(iris.data)
+    for i in range(0, 150, 7):
+        assert gt.predict_one(X_float32[i]) == classes[i]
+        assert gt.predict_one(iris.data[i]) == classes[i]
+        assert_array_equal(gt.predict_one(X_float32[i], proba=True), probabilities[i])
+    assert_array_equal(gt.predict_small(X_float32[:5]), classes[:5])
+    assert_array_equal(gt.predict_small(iris.data[:5], proba=True), probabilities[:5])
+    if gt._predictor.n_features_required > 0:
+        with pytest.raises(ValueError):
+            gt.predict_one(X_float32[0, :0])
+
+
+def test_compiled_tree_pickle():
+    gt = GeneticTree(n_trees=20, max_iter=10, initial_depth=5)
+    gt.fit(iris.data, iris.target)
+    predictor = CompiledTree(gt._best_tree)
+    predictor_unpickled = pickle.loads(pickle.dumps(predictor))
+    assert_array_equal(predictor_unpickled.predict_small(iris.data), gt.predict(iris.data))
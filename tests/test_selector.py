@@ -82,6 +82,24 @@ def test_tournament_selection_with_size_1(metrics):
     tournament_selection(metrics, 10, 1, proper_array)
 
 
+@pytest.mark.parametrize("tournament_size", [2, 3, 7])
+def test_tournament_selection_same_as_tournaments_one_by_one(tournament_size):
+    metrics = np.random.random(1000)
+    metrics[::4] = 0.5
+    seed = np.random.randint(10**8)
+    np.random.seed(seed)
+    selected_indices = get_selected_indices_by_tournament_selection(metrics, 1000, tournament_size)
+
+    np.random.seed(seed)
+    random_indices = np.empty([1000, tournament_size], dtype=np.intp)
+    for i in range(tournament_size):
+        random_indices[:, i] = np.random.randint(0, metrics.shape[0] - i, 1000)
+    for row, selected_index in zip(random_indices, selected_indices):
+        for j in range(1, tournament_size):
+            row[j] += np.sum(row[:j] <= row[j])
+        assert selected_index == row[np.argmax(metrics[row])]
+
+
 # +++++++++++++++
 # Roulette selection
 # +++++++++++++++
@@ -140,6 +158,15 @@ def test_roulette_selection(metrics, n_individuals):
     assert_array_equal(selected_indices, selected_indices_manually)
 
 
+@pytest.mark.parametrize("n_individuals", [100, 10000, 100001])
+def test_stochastic_uniform_selection_of_many_individuals(metrics, n_individuals):
+    selected_indices = get_selected_indices_by_stochastic_uniform_selection(metrics, n_individuals)
+    expected_counts = metrics / np.sum(metrics) * n_individuals
+    counts = np.bincount(selected_indices, minlength=metrics.shape[0])
+    assert np.sum(counts) == n_individuals
+    assert np.all(np.abs(counts - expected_counts) < 1 + 1e-6)
+
+
 # ==============================================================================
 # Selector
 # ==============================================================================
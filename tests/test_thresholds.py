@@ -16,3 +16,76 @@ def test_thresholds_sparse_and_dense(X_sparse, X_converted, n_thresholds):
     thresholds_sparse = prepare_thresholds_array(n_thresholds, X_sparse)
     thresholds_dense = prepare_thresholds_array(n_thresholds, X_converted)
     assert_array_equal(thresholds_dense, thresholds_sparse)
+
+
+@pytest.mark.parametrize("n_thresholds", [2, 5, 13])
+@pytest.mark.parametrize("density", [0.05, 0.5, 1.0])
+def test_thresholds_sparse_with_zeros_and_negatives(n_thresholds, density):
+    random_state = np.random.RandomState(1)
+    X_random = random_state.rand(200, 30).astype(np.float32) - 0.5
+    X_random[random_state.rand(200, 30) > density] = 0
+    thresholds_sparse = prepare_thresholds_array(n_thresholds, dok_matrix(X_random).tocsr())
+    thresholds_dense = prepare_thresholds_array(n_thresholds, X_random)
+    assert_array_equal(thresholds_dense, thresholds_sparse)
+
+
+@pytest.mark.parametrize("n_thresholds", [1, 4, 10])
+@pytest.mark.parametrize("n_jobs", [1, 3])
+def test_thresholds_dense_equal_to_sorted_columns(n_thresholds, n_jobs):
+    random_state = np.random.RandomState(2)
+    X_random = random_state.randint(0, 20, size=(101, 17)).astype(np.float32)
+    thresholds = prepare_thresholds_array(n_thresholds, X_random, n_jobs)
+    X_sorted = np.sort(X_random, axis=0)
+    for j in range(n_thresholds):
+        index = int(X_random.shape[0] / (n_thresholds+1) * (j+1))
+        assert_array_equal(thresholds[j], X_sorted[index])
+
+
+def test_thresholds_cache(X_converted):
+    clear_thresholds_cache()
+    thresholds = np.asarray(prepare_thresholds_array(10, X_converted, use_cache=True))
+    cached = np.asarray(prepare_thresholds_array(10, X_converted.copy(), use_cache=True))
+    assert np.shares_memory(thresholds, cached)
+    not_cached = np.asarray(prepare_thresholds_array(10, X_converted))
+    assert not np.shares_memory(thresholds, not_cached)
+    assert_array_equal(thresholds, not_cached)
+    other_n_thresholds = np.asarray(prepare_thresholds_array(5, X_converted, use_cache=True))
+    assert not np.shares_memory(thresholds, other_n_thresholds)
+    X_changed = X_converted.copy()
+    X_changed[0, 0] += 1
+    other_X = np.asarray(prepare_thresholds_array(10, X_changed, use_cache=True))
+    assert not np.shares_memory(thresholds, other_X)
+    clear_thresholds_cache()
+
+
+def test_fingerprint_sample(X_converted, X_sparse, monkeypatch):
+    monkeypatch.setattr("genetic_tree.tree.thresholds.FINGERPRINT_SAMPLE_SIZE", 3)
+    X_changed = X_converted.copy()
+    X_changed[-1, 0] += 1
+    assert get_fingerprint(X_changed) != get_fingerprint(X_converted)
+    assert get_fingerprint(X_sparse) == get_fingerprint(X_sparse.copy())
+    assert get_fingerprint(X_sparse) != get_fingerprint(X_sparse[1:])
+
+
+def test_fingerprint_full(X_converted, X_sparse, monkeypatch):
+    monkeypatch.setattr("genetic_tree.tree.thresholds.FINGERPRINT_SAMPLE_SIZE", 3)
+    monkeypatch.setattr("genetic_tree.genetic.parallel.ROW_BLOCK_BYTES", 10 * X_converted.shape[1] * 4)
+    X_changed = X_converted.copy()
+    X_changed[1, 0] += 1
+    assert get_fingerprint(X_changed, sample=False) != get_fingerprint(X_converted, sample=False)
+    X_memmap = create_memmap_backed_data(X_converted)
+    assert get_fingerprint(X_memmap, sample=False) != get_fingerprint(X_converted, sample=False)
+    assert get_fingerprint(np.asarray(X_memmap), sample=False) == get_fingerprint(X_converted, sample=False)
+    X_sparse_changed = X_sparse.copy()
+    X_sparse_changed.data[1] += 1
+    assert get_fingerprint(X_sparse_changed, sample=False) != get_fingerprint(X_sparse, sample=False)
+    assert get_fingerprint(X_sparse.copy(), sample=False) == get_fingerprint(X_sparse, sample=False)
+
+
+def test_thresholds_memmap(X_converted, monkeypatch):
+    monkeypatch.setattr("genetic_tree.genetic.parallel.ROW_BLOCK_BYTES", 10 * X_converted.shape[1] * 4)
+    X_memmap = create_memmap_backed_data(X_converted)
+    assert isinstance(X_memmap, np.memmap) and not X_memmap.flags.writeable
+    assert_array_equal(prepare_thresholds_array(10, X_memmap), prepare_thresholds_array(10, X_converted))
+    monkeypatch.setattr("genetic_tree.tree.thresholds.THRESHOLDS_SAMPLE_SIZE", 40)
+    assert_array_equal(prepare_thresholds_array(10, X_memmap), prepare_thresholds_array(10, X_converted[::4]))
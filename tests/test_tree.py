@@ -135,6 +135,109 @@ def test_independence_of_copied_tree_():
     test_independence_of_copied_tree(tree)
 
 
+def test_independence_of_shared_observations():
+    tree: Tree = build_trees(5, 1)[0]
+    proper_classified = tree.proper_classified
+    trees_copied = [copy_tree(tree) for i in range(5)]
+    for tree_copied in trees_copied:
+        for i in range(20):
+            mutate_random_threshold(tree_copied)
+    del trees_copied
+    assert tree.proper_classified == proper_classified
+    # reassigning uses observations which were shared with copied trees
+    for i in range(20):
+        mutate_random_threshold(tree)
+    tree_copied = copy_tree(tree)
+    tree_copied.prepare_new_fit(X, y, sample_weight, thresholds)
+    assert tree.proper_classified == tree_copied.proper_classified
+
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_share_tree(flat_observations):
+    tree = Tree(np.unique(y), X, y, sample_weight, thresholds, np.random.randint(10 ** 8), flat_observations)
+    tree.resize_by_initial_depth(5)
+    full_tree_builder(tree, 5)
+    tree.initialize_observations()
+    proper_classified = tree.proper_classified
+    trees_shared = [share_tree(tree) for i in range(5)]
+    assert tree.observations_shared and trees_shared[0].observations_shared
+    for tree_shared in trees_shared:
+        for i in range(20):
+            mutate_random_threshold(tree_shared)
+        assert not tree_shared.observations_shared
+        tree_copied = copy_tree(tree_shared)
+        tree_copied.prepare_new_fit(X, y, sample_weight, thresholds)
+        assert tree_shared.proper_classified == tree_copied.proper_classified
+    assert tree.proper_classified == proper_classified
+    tree.materialize()
+    assert not tree.observations_shared
+    assert tree.proper_classified == proper_classified
+
+
+def test_stream_observations():
+    classes = np.unique(y)
+    X_stream = np.zeros((200, X.shape[1]), dtype=np.float32)
+    y_stream = np.zeros(200, dtype=np.intp)
+    sample_weight_stream = np.zeros(200, dtype=np.float32)
+    X_stream[:150], y_stream[:150] = X, y
+    sample_weight_stream[:150] = np.random.random(150)
+    y_class_ids = np.searchsorted(classes, y_stream).astype(np.intp)
+    tree = Tree(classes, X_stream[:100], y_stream[:100], sample_weight_stream[:100], thresholds,
+                np.random.randint(10 ** 8))
+    tree.resize_by_initial_depth(4)
+    full_tree_builder(tree, 4)
+    tree.initialize_observations()
+    for i in range(5):
+        mutate_random_node(tree)
+
+    expired_weight = sample_weight_stream[:30].copy()
+    sample_weight_stream[:30] = 0
+    tree.stream_observations(X_stream[:150], y_stream[:150], sample_weight_stream[:150], thresholds,
+                             y_class_ids[:150], 0, expired_weight, 100)
+    tree_copied = copy_tree(tree)
+    tree_copied.prepare_new_fit(X_stream[:150], y_stream[:150], sample_weight_stream[:150], thresholds)
+    assert_almost_equal(tree.proper_classified, tree_copied.proper_classified, decimal=4)
+
+    # expired observations stay in leaves with zero weight
+    for i in range(10):
+        mutate_random_node(tree)
+        mutate_random_threshold(tree)
+    tree_copied = copy_tree(tree)
+    tree_copied.prepare_new_fit(X_stream[:150], y_stream[:150], sample_weight_stream[:150], thresholds)
+    assert_almost_equal(tree.proper_classified, tree_copied.proper_classified, decimal=4)
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_racing_rejects_trees(flat_observations):
+    tree = Tree(np.unique(y), X, y, sample_weight, thresholds, np.random.randint(10 ** 8), flat_observations)
+    tree.resize_by_initial_depth(5)
+    full_tree_builder(tree, 5)
+    tree.initialize_observations()
+    seeds = np.random.randint(10 ** 8, size=30)
+
+    def create_children():
+        children = []
+        for i, seed in enumerate(seeds):
+            if i % 2 == 0:
+                children.append(cross_trees(tree, tree, 0, seed % tree.node_count, seed))
+            else:
+                child = copy_tree(tree, 0, seed)
+                mutate_random_threshold(child)
+                children.append(child)
+        return children
+
+    children = create_children()
+    assert not any(child.rejected for child in children)
+    tree.racing_cut = np.median([child.proper_classified for child in children])
+    children_raced = create_children()
+    tree.racing_cut = 0
+    for child, child_raced in zip(children, children_raced):
+        assert child_raced.rejected == (child.proper_classified < child_raced.racing_cut)
+        if not child_raced.rejected:
+            assert child_raced.proper_classified == child.proper_classified
+
+
 # ==============================================================================
 # Tree functions
 # ==============================================================================
@@ -261,3 +364,180 @@ def test_tree_copied_not_same_seed(tree):
     tree_copied = copy_tree(tree, same_seed=0)
     assert tree_copied.seeds[0] != tree.seeds[0]
 
+
+# ++++++++++++++++++++++++++
+# Exporting nodes
+# ++++++++++++++++++++++++++
+
+def test_export_and_load_nodes():
+    tree = build_trees(3, 1)[0]
+    tree2 = initialize_iris_tree()
+    tree2.load_nodes(tree.export_nodes())
+    tree2.initialize_observations()
+    assert_array_equal(tree.feature, tree2.feature)
+    assert_array_equal(tree.threshold, tree2.threshold)
+    assert_array_equal(tree.proper_classified, tree2.proper_classified)
+
+
+@pytest.mark.parametrize("n_jobs", [2, -1])
+def test_apply_in_threads(n_jobs):
+    tree = build_trees(5, 1)[0]
+    X_big = np.repeat(X, 200, axis=0).astype(np.float32)
+    assert_array_equal(tree.apply(X_big, n_jobs), tree.apply(X_big))
+    assert_array_equal(tree.apply(X_big[:10], n_jobs), tree.apply(X_big[:10]))
+
+
+@pytest.mark.parametrize("flat_observations", [False, True])
+def test_training_state(flat_observations):
+    tree = Tree(np.unique(y), X, y, sample_weight, thresholds, np.random.randint(10 ** 8), flat_observations)
+    tree.resize_by_initial_depth(4)
+    full_tree_builder(tree, 4)
+    tree.initialize_observations()
+    state = pickle.loads(pickle.dumps(tree.get_training_state()))
+    tree2 = Tree(np.unique(y), X, y, sample_weight, thresholds, 0, flat_observations)
+    tree2.set_training_state(state)
+    assert_array_equal(tree.feature, tree2.feature)
+    assert_array_equal(tree.threshold, tree2.threshold)
+    assert_array_equal(tree.proper_classified, tree2.proper_classified)
+    assert tree.seeds == tree2.seeds
+
+    # trees should be mutated in the same way without reassigning observations
+    mutate_random_node(tree)
+    mutate_random_node(tree2)
+    assert_array_equal(tree.feature, tree2.feature)
+    assert_array_equal(tree.proper_classified, tree2.proper_classified)
+    tree3 = initialize_iris_tree()
+    tree3.load_nodes(tree2.export_nodes())
+    tree3.initialize_observations()
+    assert_array_equal(tree3.proper_classified, tree2.proper_classified)
+
+
+def test_structure_hash():
+    tree = build_trees(3, 1)[0]
+    tree_copied = copy_tree(tree)
+    assert tree.structure_hash() == tree_copied.structure_hash()
+
+    # the same tree with nodes in other order
+    nodes = tree.export_nodes()
+    order = np.concatenate([[0], np.arange(1, nodes.shape[0])[::-1]])
+    new_ids = np.argsort(order)
+    nodes = nodes[order]
+    for field in ["left_child", "right_child", "parent"]:
+        is_node = nodes[field] >= 0
+        nodes[field][is_node] = new_ids[nodes[field][is_node]]
+    tree2 = initialize_iris_tree()
+    tree2.load_nodes(nodes)
+    assert tree.structure_hash() == tree2.structure_hash()
+    test_mutate_threshold(tree_copied, 0)
+    assert tree.structure_hash() != tree_copied.structure_hash()
+
+
+# ==============================================================================
+# Forest
+# ==============================================================================
+
+def assert_forest_tree_is_valid(nodes):
+    # nodes are in preorder with consistent links and depths
+    assert nodes[0]['parent'] == TREE_UNDEFINED and nodes[0]['depth'] == 0
+    for node_id, node in enumerate(nodes):
+        if node['left_child'] != -1:
+            assert node['left_child'] == node_id + 1
+            for child in [node['left_child'], node['right_child']]:
+                assert nodes[child]['parent'] == node_id
+                assert nodes[child]['depth'] == node['depth'] + 1
+
+
+def assert_forest_memberships_are_valid(forest):
+    # proper_classified found by kernels is the same as after assigning all observations again
+    forest_assigned = Forest(forest.nodes, forest.offsets)
+    forest_assigned.assign_observations(X, y, sample_weight, thresholds)
+    is_accepted = forest.rejected == 0
+    assert_array_almost_equal(forest.proper_classified[is_accepted],
+                              forest_assigned.proper_classified[is_accepted])
+    for i in range(len(forest)):
+        assert_forest_tree_is_valid(forest[i])
+
+
+def test_forest_from_trees():
+    trees = build_trees(3, 5) + build_trees(1, 5)
+    for tree in trees:
+        mutate_random_node(tree)
+    forest = Forest.from_trees(trees)
+    assert len(forest) == 10
+    assert_array_equal(forest.node_counts, [tree.node_count for tree in trees])
+    assert_array_equal(forest.depths, [tree.depth for tree in trees])
+    assert_array_equal(forest.seeds, [tree.seeds for tree in trees])
+    forest.assign_observations(X, y, sample_weight, thresholds, n_jobs=2)
+    assert_array_almost_equal(forest.accuracies, [tree.proper_classified / 150 for tree in trees])
+
+    forest = pickle.loads(pickle.dumps(forest))
+    assert forest.samples is None
+    trees_loaded = forest.to_trees(X, y, sample_weight, thresholds)
+    for i, (tree, tree_loaded) in enumerate(zip(trees, trees_loaded)):
+        assert_forest_tree_is_valid(forest[i])
+        assert tree.structure_hash() == tree_loaded.structure_hash()
+        assert tree.proper_classified == tree_loaded.proper_classified
+
+
+def test_forest_take_and_concatenate():
+    trees = build_trees(2, 3) + build_trees(4, 3)
+    forest = Forest.from_trees(trees)
+    indices = [5, 0, 0, 3]
+    forest_taken = forest.take(indices)
+    assert len(forest_taken) == 4
+    for i, index in enumerate(indices):
+        assert_array_equal(forest_taken[i], forest[index])
+    forest_concatenated = Forest.concatenate([forest_taken, Forest(), forest])
+    assert len(forest_concatenated) == 10
+    assert_array_equal(forest_concatenated[5], forest[1])
+    assert len(Forest.from_trees([])) == 0
+    with pytest.raises(ValueError):
+        Forest(forest.nodes, forest.offsets[:3])
+
+
+@pytest.mark.parametrize("kind", [MUTATE_RANDOM_NODE, MUTATE_CLASS, MUTATE_THRESHOLD,
+                                  MUTATE_FEATURE, MUTATE_CLASS_OR_THRESHOLD])
+def test_forest_mutate(kind):
+    forest = Forest.from_trees(build_trees(4, 20))
+    forest.assign_observations(X, y, sample_weight, thresholds)
+    indices = np.random.choice(20, 10, replace=False)
+    nodes = forest.nodes.copy()
+    mutated = forest.mutate(indices, kind, n_jobs=3)
+    assert len(mutated) == 10
+    assert_array_equal(forest.nodes, nodes)
+    assert_array_equal(mutated.node_counts, forest.node_counts[indices])
+    assert_forest_memberships_are_valid(mutated)
+    assert np.sum(mutated.nodes != forest.take(indices).nodes) > 0
+
+    # only trees with indices are changed in place
+    other_indices = np.setdiff1d(np.arange(20), indices)
+    other_nodes = forest.take(other_indices).nodes
+    forest.mutate(indices, kind, n_jobs=3, in_place=True)
+    assert_array_equal(forest.take(other_indices).nodes, other_nodes)
+    assert np.sum(forest.nodes != nodes) > 0
+    assert_forest_memberships_are_valid(forest)
+
+
+@pytest.mark.parametrize("cross_both", [False, True])
+def test_forest_cross(cross_both):
+    forest = Forest.from_trees(build_trees(4, 10) + build_trees(2, 10))
+    forest.assign_observations(X, y, sample_weight, thresholds)
+    for _ in range(5):
+        first_parents = np.arange(len(forest))
+        children = forest.cross(first_parents, np.random.permutation(first_parents), cross_both, n_jobs=2)
+        assert len(children) == len(forest) * (2 if cross_both else 1)
+        assert_forest_memberships_are_valid(children)
+        forest = Forest.concatenate([forest, children]).take(np.arange(20), draw_seeds=True)
+    assert np.all(forest.rejected == 0)
+
+
+def test_forest_cross_with_racing():
+    forest = Forest.from_trees(build_trees(4, 30))
+    forest.assign_observations(X, y, sample_weight, thresholds)
+    racing_cut = np.quantile(forest.proper_classified, 0.5)
+    children = forest.cross(np.arange(30), np.arange(30)[::-1], True, racing_cut)
+    assert 0 < np.sum(children.rejected) < len(children)
+    assert_forest_memberships_are_valid(children)
+    children_assigned = Forest(children.nodes, children.offsets)
+    children_assigned.assign_observations(X, y, sample_weight, thresholds)
+    assert np.all(children_assigned.proper_classified[children.rejected == 1] < racing_cut)
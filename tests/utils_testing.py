@@ -6,9 +6,11 @@ from scipy.sparse import dok_matrix
 import pickle
 import psutil
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 import time
 import math
+import warnings
 
 # sklearn imports (mainly assertions)
 from sklearn import datasets
@@ -22,10 +24,11 @@ from sklearn.utils._testing import create_memmap_backed_data
 from sklearn.utils._testing import ignore_warnings
 
 # low level (Cython) imports
-from genetic_tree.tree._utils import test_copy_int_array, test_copy_leaves
-from genetic_tree.tree.tree import Tree, copy_tree, test_independence_of_copied_tree
-from genetic_tree.tree.thresholds import prepare_thresholds_array
-from genetic_tree.tree.observations import Observations, copy_observations, LeafFinder
+from genetic_tree.tree._utils import test_copy_int_array, test_copy_leaves, test_share_int_array
+from genetic_tree.tree._utils import test_buffer_pool, acquire_buffer_pool, release_buffer_pool, get_buffer_pool_size
+from genetic_tree.tree.tree import Tree, copy_tree, share_tree, test_independence_of_copied_tree
+from genetic_tree.tree.thresholds import prepare_thresholds_array, clear_thresholds_cache, get_fingerprint
+from genetic_tree.tree.observations import Observations, FlatObservations, copy_observations, LeafFinder
 from genetic_tree.tree.builder import full_tree_builder, split_tree_builder, test_add_node, test_add_leaf
 from genetic_tree.tree.mutator import mutate_random_node, mutate_random_class_or_threshold
 from genetic_tree.tree.mutator import mutate_random_feature, mutate_random_threshold
@@ -33,6 +36,9 @@ from genetic_tree.tree.mutator import mutate_random_class
 from genetic_tree.tree.mutator import test_mutate_feature, test_mutate_class, test_mutate_threshold
 from genetic_tree.tree.crosser import cross_trees
 from genetic_tree.tree.evaluation import get_accuracies, get_trees_depths, get_trees_n_leaves
+from genetic_tree.tree.predictor import CompiledTree
+from genetic_tree.tree.forest import Forest, MUTATE_RANDOM_NODE, MUTATE_CLASS, MUTATE_THRESHOLD
+from genetic_tree.tree.forest import MUTATE_FEATURE, MUTATE_CLASS_OR_THRESHOLD
 
 
 # high level (Python) imports
@@ -40,6 +46,7 @@ from genetic_tree import Initializer, Initialization
 from genetic_tree import Mutator, Mutation
 from genetic_tree import Crosser
 from genetic_tree import Evaluator, Metric
+from genetic_tree.genetic.evaluator import FitnessCache, PopulationStats
 from genetic_tree.genetic.evaluator import get_accuracy, get_accuracy_and_n_leaves, get_accuracy_and_depth
 from genetic_tree import Selection, Selector
 from genetic_tree.genetic.selector import metrics_greater_than_zero
@@ -48,6 +55,7 @@ from genetic_tree.genetic.selector import get_selected_indices_by_tournament_sel
 from genetic_tree.genetic.selector import get_selected_indices_by_roulette_selection
 from genetic_tree.genetic.selector import get_selected_indices_by_stochastic_uniform_selection
 from genetic_tree import Stopper
+from genetic_tree.genetic.subsampler import get_stratified_indices
 
 # package interface
 from genetic_tree import GeneticTree